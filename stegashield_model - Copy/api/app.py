@@ -1,22 +1,65 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import json
 import os
 import traceback
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from stegashield_profiles import embed_image, verify_image
+from api import metrics
+from api.uploads import METADATA_HEADER, encode_metadata_header, read_image_request
+from api.verify_cache import VerificationCache, file_digest, metadata_digest
+from api.workers import LaneSaturated, LaneTimeout, WorkerPool
+from stegashield_profiles import (
+    VERIFIER_VERSION,
+    embed_bytes,
+    embed_image,
+    load_metadata,
+    verify_blind_bytes,
+    verify_bytes,
+    verify_image,
+)
+from utils.metadata_store import WatermarkAmbiguous, WatermarkNotFound
 
 
-app = FastAPI(title="StegaShield Model Service", version="1.0.0")
+# Embeds and verifies run on separate warm worker lanes instead of Starlette's
+# shared threadpool; see api/workers.py for the MODEL_SERVICE_* settings.
+worker_pool = WorkerPool.from_env()
+
+# Repeat verifications of the same bytes against the same metadata are served
+# from here; concurrent identical requests share one worker job.
+verify_cache = VerificationCache.from_env()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    worker_pool.start()
+    try:
+        yield
+    finally:
+        worker_pool.shutdown()
+
+
+app = FastAPI(title="StegaShield Model Service", version="1.0.0", lifespan=lifespan)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_OUTPUT_ROOT = PROJECT_ROOT / "artifacts"
 DEFAULT_OUTPUT_ROOT.mkdir(parents=True, exist_ok=True)
 
+BATCH_MAX_JOBS = int(os.environ.get("MODEL_SERVICE_BATCH_MAX_JOBS", "1000"))
+
+# SQLite metadata store for /v2 embeds and blind verification; unset disables both
+METADATA_DB = os.environ.get("MODEL_SERVICE_METADATA_DB") or None
+
 
 def _resolve_existing(path_str: str, description: str) -> Path:
     try:
@@ -42,6 +85,41 @@ def _resolve_output_dir(path_str: Optional[str]) -> Path:
     return output_dir
 
 
+async def _run_in_lane(lane: str, action: str, fn, **kwargs):
+    """
+    Run a stegashield_profiles entry point on `lane`. Its per-stage `timings`
+    block feeds /metrics and is dropped from the result, so cached reports and
+    responses look the same as before.
+    """
+    try:
+        result = await worker_pool.run(lane, fn, timings=True, **kwargs)
+        timings = result.pop("timings", None)
+        if timings is not None:
+            metrics.observe(fn.__name__, result.get("mode") or kwargs.get("mode"), timings)
+        return result
+    except LaneSaturated as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=f"{action} queue is full, retry later",
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+    except LaneTimeout as exc:
+        raise HTTPException(
+            status_code=504, detail=f"{action} timed out after {exc.timeout:g}s"
+        ) from exc
+    except WatermarkAmbiguous as exc:
+        raise HTTPException(
+            status_code=409, detail={"message": str(exc), "candidates": exc.candidates}
+        ) from exc
+    except WatermarkNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception as exc:
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500, detail=f"{action} failed: {exc}"
+        ) from exc
+
+
 class EmbedRequest(BaseModel):
     image_path: str = Field(..., description="Absolute path to the uploaded media file.")
     mode: str = Field("hybrid", description="Watermark profile mode.")
@@ -58,49 +136,235 @@ class VerifyRequest(BaseModel):
     mode: Optional[str] = Field(None, description="Override profile mode.")
 
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok", "message": "StegaShield FastAPI service is running"}
+class EmbedBatchRequest(BaseModel):
+    jobs: List[EmbedRequest] = Field(..., min_length=1, max_length=BATCH_MAX_JOBS)
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Jobs in flight at once; defaults to the embed lane's worker count."
+    )
 
 
-@app.post("/embed")
-def embed_media(payload: EmbedRequest):
+class VerifyBatchRequest(BaseModel):
+    jobs: List[VerifyRequest] = Field(..., min_length=1, max_length=BATCH_MAX_JOBS)
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Jobs in flight at once; defaults to the verify lane's worker count."
+    )
+
+
+async def _embed_job(payload: EmbedRequest) -> Dict[str, Any]:
     image_path = _resolve_existing(payload.image_path, "image")
     output_dir = _resolve_output_dir(payload.output_dir)
 
-    try:
-        result = embed_image(
-            image_path=str(image_path),
-            message=payload.message or "",
-            mode=payload.mode,
-            user_key=payload.user_key,
-            output_dir=str(output_dir),
-        )
-        return {"success": True, "data": result}
-    except Exception as exc:
-        traceback.print_exc()
-        raise HTTPException(
-            status_code=500, detail=f"Embed failed: {exc}"
-        ) from exc
+    return await _run_in_lane(
+        "embed",
+        "Embed",
+        embed_image,
+        image_path=str(image_path),
+        message=payload.message or "",
+        mode=payload.mode,
+        user_key=payload.user_key,
+        output_dir=str(output_dir),
+    )
 
 
-@app.post("/verify")
-def verify_media(payload: VerifyRequest):
+def _verify_cache_key(image_sha256: str, metadata: Dict[str, Any], mode: Optional[str]):
+    return (image_sha256, metadata_digest(metadata), (mode or "").strip().lower(), VERIFIER_VERSION)
+
+
+async def _verify_job(payload: VerifyRequest) -> Dict[str, Any]:
     image_path = _resolve_existing(payload.image_path, "image")
     metadata_path = _resolve_existing(payload.metadata_path, "metadata")
 
     try:
-        result = verify_image(
+        metadata = await asyncio.to_thread(load_metadata, metadata_path)
+        image_sha256 = await asyncio.to_thread(file_digest, str(image_path))
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Could not read verification inputs: {exc}") from exc
+
+    return await verify_cache.get_or_compute(
+        _verify_cache_key(image_sha256, metadata, payload.mode),
+        lambda: _run_in_lane(
+            "verify",
+            "Verification",
+            verify_image,
             image_path=str(image_path),
             metadata_path=str(metadata_path),
             mode=payload.mode,
+        ),
+    )
+
+
+def _stream_batch(
+    lane: str,
+    jobs: List[BaseModel],
+    concurrency: Optional[int],
+    run_job: Callable[[Any], Awaitable[Dict[str, Any]]],
+) -> StreamingResponse:
+    """
+    Fan `jobs` out over a worker lane and stream one NDJSON line per job, in
+    completion order. Each line carries the job's `index` in the request, and
+    a failing job yields an error line instead of failing the batch.
+    """
+    stats = worker_pool.stats()[lane]
+    # Never hold more slots than the lane can admit, so a batch cannot shut out other callers entirely
+    limit = min(concurrency or stats["workers"], stats["workers"] + stats["queue_size"])
+
+    async def run_one(index: int, job: BaseModel, gate: asyncio.Semaphore) -> Dict[str, Any]:
+        async with gate:
+            try:
+                return {"index": index, "success": True, "data": await run_job(job)}
+            except HTTPException as exc:
+                line = {"index": index, "success": False, "status_code": exc.status_code, "error": exc.detail}
+                if exc.headers and "Retry-After" in exc.headers:
+                    line["retry_after"] = int(exc.headers["Retry-After"])
+                return line
+            except Exception as exc:
+                traceback.print_exc()
+                return {"index": index, "success": False, "status_code": 500, "error": str(exc)}
+
+    async def lines():
+        gate = asyncio.Semaphore(limit)
+        tasks = [asyncio.ensure_future(run_one(i, job, gate)) for i, job in enumerate(jobs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(jsonable_encoder(await next_done)) + "\n"
+        finally:
+            # Client went away: drop the jobs that have not been handed to a worker yet
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok", "message": "StegaShield FastAPI service is running"}
+
+
+@app.get("/workers")
+def worker_stats():
+    """Queue-depth and in-flight gauges for each worker lane."""
+    return worker_pool.stats()
+
+
+@app.get("/cache")
+def cache_stats():
+    """Hit/miss, coalescing and eviction counters for the verification cache."""
+    return verify_cache.stats()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Per-stage embed/verify latency histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/embed")
+async def embed_media(payload: EmbedRequest):
+    return {"success": True, "data": await _embed_job(payload)}
+
+
+@app.post("/verify")
+async def verify_media(payload: VerifyRequest):
+    return {"success": True, "data": await _verify_job(payload)}
+
+
+@app.post("/v2/embed")
+async def embed_upload(request: Request):
+    """
+    Embed an image sent as a multipart `image` part or as the raw request body;
+    `mode`, `message`, `user_key` and `response` come from form fields or the
+    query string. Returns the watermarked PNG with its metadata in the
+    X-StegaShield-Metadata header (base64url JSON), or a JSON document with
+    base64 images when `response=json`. With MODEL_SERVICE_METADATA_DB set the
+    metadata is also recorded there and its id returned as X-StegaShield-Watermark-Id.
+    """
+    upload = await read_image_request(request)
+    fields = upload.fields
+    result = await _run_in_lane(
+        "embed",
+        "Embed",
+        embed_bytes,
+        data=upload.data,
+        message=fields.get("message", ""),
+        mode=fields.get("mode", "hybrid"),
+        user_key=fields.get("user_key") or None,
+        store=METADATA_DB,
+    )
+    # Hash of the watermarked PNG returned, the same key the metadata store indexes
+    content_sha256 = result.get("content_sha256") or hashlib.sha256(result["image_bytes"]).hexdigest()
+
+    if fields.get("response") == "json":
+        heatmap = result["heatmap_bytes"]
+        return {
+            "success": True,
+            "data": {
+                "mode": result["mode"],
+                "content_sha256": content_sha256,
+                "metadata": result["metadata"],
+                "watermark_id": result.get("watermark_id"),
+                "image_base64": base64.b64encode(result["image_bytes"]).decode("ascii"),
+                "heatmap_base64": base64.b64encode(heatmap).decode("ascii") if heatmap is not None else None,
+            },
+        }
+
+    headers = {
+        METADATA_HEADER: encode_metadata_header(result["metadata"]),
+        "X-StegaShield-Mode": result["mode"],
+        "X-Content-SHA256": content_sha256,
+    }
+    if result.get("watermark_id"):
+        headers["X-StegaShield-Watermark-Id"] = result["watermark_id"]
+    return Response(content=result["image_bytes"], media_type="image/png", headers=headers)
+
+
+@app.post("/v2/verify")
+async def verify_upload(request: Request):
+    """
+    Verify an image sent as a multipart `image` part or as the raw request body.
+    Metadata comes from a multipart `metadata` part or the X-StegaShield-Metadata
+    header; `mode` from a form field or the query string. Without metadata the
+    image is verified blindly against MODEL_SERVICE_METADATA_DB, when configured.
+    """
+    upload = await read_image_request(request)
+    mode = upload.fields.get("mode") or None
+    if upload.metadata is None:
+        if METADATA_DB is None:
+            raise HTTPException(
+                status_code=400, detail=f"Send metadata as a 'metadata' part or the {METADATA_HEADER} header."
+            )
+        # Not cached: the answer depends on which records the store holds right now
+        result = await _run_in_lane(
+            "verify",
+            "Verification",
+            verify_blind_bytes,
+            data=upload.data,
+            store=METADATA_DB,
+            mode=mode,
         )
-        return {"success": True, "data": result}
-    except Exception as exc:
-        traceback.print_exc()
-        raise HTTPException(
-            status_code=500, detail=f"Verification failed: {exc}"
-        ) from exc
+        return {"success": True, "content_sha256": upload.sha256, "data": result}
+
+    result = await verify_cache.get_or_compute(
+        _verify_cache_key(upload.sha256, upload.metadata, mode),
+        lambda: _run_in_lane(
+            "verify",
+            "Verification",
+            verify_bytes,
+            data=upload.data,
+            metadata=upload.metadata,
+            mode=mode,
+        ),
+    )
+    return {"success": True, "content_sha256": upload.sha256, "data": result}
+
+
+@app.post("/embed/batch")
+async def embed_batch(payload: EmbedBatchRequest):
+    return _stream_batch("embed", payload.jobs, payload.concurrency, _embed_job)
+
+
+@app.post("/verify/batch")
+async def verify_batch(payload: VerifyBatchRequest):
+    return _stream_batch("verify", payload.jobs, payload.concurrency, _verify_job)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Seconds; spans a cached small verify up to a 48 MP embed on a slow host
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Upper bounds in megapixels for the `size` label
+SIZE_BUCKETS: Tuple[float, ...] = (0.25, 1.0, 4.0, 12.0, 48.0)
+
+
+def size_bucket(megapixels: Optional[float]) -> str:
+    """Label for an image size, e.g. `le_4mp`; `gt_48mp` above the largest bucket."""
+    if megapixels is None:
+        return "unknown"
+    for bound in SIZE_BUCKETS:
+        if megapixels <= bound:
+            return f"le_{bound:g}mp"
+    return f"gt_{SIZE_BUCKETS[-1]:g}mp"
+
+
+def _format_float(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """A labelled Prometheus histogram (cumulative buckets plus _sum and _count)."""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str], buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key in sorted(snapshot):
+            series = snapshot[key]
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_float(bound)}"}} {cumulative:g}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]!r}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]:g}")
+        return lines
+
+
+stage_duration = Histogram(
+    "stegashield_stage_duration_seconds",
+    "Wall time per embed/verify stage; stage=\"total\" is the whole call.",
+    ("op", "mode", "stage", "size"),
+    LATENCY_BUCKETS,
+)
+
+
+def observe(op: str, mode: Optional[str], timings: Dict[str, Any]) -> None:
+    """Record one call's `timings` block (see utils/timing.py)."""
+    labels = {"op": op, "mode": mode or "unknown", "size": size_bucket(timings.get("megapixels"))}
+    stage_duration.observe(timings["total_s"], stage="total", **labels)
+    for name, seconds in timings.get("stages", {}).items():
+        stage_duration.observe(seconds, stage=name, **labels)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    return "\n".join(stage_duration.render()) + "\n"
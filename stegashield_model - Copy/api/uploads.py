@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MODEL_SERVICE_MAX_UPLOAD_BYTES", str(64 * 1024 * 1024)))
+CHUNK_BYTES = 1024 * 1024
+METADATA_HEADER = "X-StegaShield-Metadata"
+
+
+@dataclass
+class Upload:
+    """
+    An uploaded image read into memory, its SHA-256, and the request's other fields.
+
+    `data` is the receive buffer itself; the decoders and the process pool take
+    any bytes-like object, so it is handed on without another copy.
+    """
+
+    data: bytearray
+    sha256: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class _HashingBuffer:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.buf = bytearray()
+        self.digest = hashlib.sha256()
+
+    def feed(self, chunk: bytes) -> None:
+        if len(self.buf) + len(chunk) > self.limit:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.limit} bytes.")
+        self.digest.update(chunk)
+        self.buf += chunk
+
+
+def encode_metadata_header(metadata: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(metadata, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_metadata_header(value: str) -> Dict[str, Any]:
+    try:
+        return json.loads(base64.urlsafe_b64decode(value.encode("ascii") + b"=" * (-len(value) % 4)))
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid {METADATA_HEADER} header: {exc}") from exc
+
+
+def _parse_metadata(raw: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(raw)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid metadata JSON: {exc}") from exc
+
+
+async def read_image_request(request: Request, image_field: str = "image") -> Upload:
+    """
+    Read the image from a multipart form (`image_field` part) or from the raw
+    request body, hashing it chunk by chunk as it arrives. Nothing is written
+    to disk beyond Starlette's own spooling of multipart parts.
+
+    Plain fields come from the query string, overridden by multipart form
+    fields. Metadata, when sent, comes from a `metadata` part (file or JSON
+    string) or from the base64url JSON `X-StegaShield-Metadata` header.
+    """
+    fields = dict(request.query_params)
+    metadata = None
+    reader = _HashingBuffer(MAX_UPLOAD_BYTES)
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        try:
+            image = form.get(image_field)
+            if not isinstance(image, UploadFile):
+                raise HTTPException(status_code=400, detail=f"Multipart body needs a '{image_field}' file part.")
+            while chunk := await image.read(CHUNK_BYTES):
+                reader.feed(chunk)
+
+            for key, value in form.multi_items():
+                if key == "metadata":
+                    metadata = _parse_metadata(await value.read() if isinstance(value, UploadFile) else value)
+                elif key != image_field and isinstance(value, str):
+                    fields[key] = value
+        finally:
+            await form.close()
+    else:
+        async for chunk in request.stream():
+            reader.feed(chunk)
+
+    if not reader.buf:
+        raise HTTPException(status_code=400, detail="Empty image upload.")
+    if metadata is None and METADATA_HEADER in request.headers:
+        metadata = decode_metadata_header(request.headers[METADATA_HEADER])
+
+    return Upload(data=reader.buf, sha256=reader.digest.hexdigest(), fields=fields, metadata=metadata)
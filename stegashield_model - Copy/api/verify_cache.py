@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+CacheKey = Tuple[str, str, str, int]
+
+
+def metadata_digest(metadata: Dict[str, Any]) -> str:
+    """SHA-256 of the metadata's canonical JSON, so key order and whitespace do not matter."""
+    canonical = json.dumps(metadata, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str, chunk_bytes: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class VerificationCache:
+    """
+    LRU + TTL cache of verification reports with single-flight coalescing.
+
+    Keys are (image SHA-256, metadata digest, mode, verifier version). Entries
+    expire `ttl` seconds after they are stored, and the least recently used
+    ones are evicted once either `max_entries` or `max_bytes` (measured as the
+    report's JSON size) is exceeded. Concurrent misses on the same key share
+    one computation; failures are handed to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, int, float]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls, environ: Optional[Dict[str, str]] = None) -> "VerificationCache":
+        env = os.environ if environ is None else environ
+        return cls(
+            max_entries=int(env.get("MODEL_SERVICE_VERIFY_CACHE_ENTRIES", "1024")),
+            ttl=float(env.get("MODEL_SERVICE_VERIFY_CACHE_TTL", "300")),
+            max_bytes=int(env.get("MODEL_SERVICE_VERIFY_CACHE_BYTES", str(64 * 1024 * 1024))),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    def _drop(self, key: CacheKey) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _lookup(self, key: CacheKey) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[2] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def _store(self, key: CacheKey, value: Any) -> None:
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    async def _fill(self, key: CacheKey, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_compute(self, key: CacheKey, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await compute()
+
+        found, value = self._lookup(key)
+        if found:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            with self._lock:
+                self.misses += 1
+            task = asyncio.ensure_future(self._fill(key, compute))
+            # Mark the outcome as retrieved even if every waiter has gone away
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            with self._lock:
+                self.coalesced += 1
+        # Shield so one caller disconnecting does not cancel the work others are waiting on
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "in_flight": len(self._inflight),
+            }
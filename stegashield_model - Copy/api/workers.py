@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+BACKENDS = ("process", "thread")
+
+
+class LaneSaturated(Exception):
+    """Raised when a lane's bounded queue is full; maps to HTTP 429."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"{lane} queue is full, retry in {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class LaneTimeout(Exception):
+    """Raised when a job does not finish within its lane timeout; maps to HTTP 504."""
+
+    def __init__(self, lane: str, timeout: float):
+        super().__init__(f"{lane} job exceeded {timeout:g}s")
+        self.lane = lane
+        self.timeout = timeout
+
+
+@dataclass
+class LaneConfig:
+    workers: int = 1
+    queue_size: int = 8       # jobs allowed to wait beyond the ones running
+    timeout: float = 60.0     # seconds, per request
+
+
+def _warm_worker() -> None:
+    # Pay the heavy imports once per worker process, not on the first request
+    import stegashield_profiles  # noqa: F401
+
+
+def _noop() -> None:
+    return None
+
+
+class Lane:
+    """
+    One executor plus admission control. A lane admits at most
+    `workers + queue_size` jobs; anything beyond that is rejected up front
+    instead of queueing without bound. A process pool that breaks because a
+    worker died (e.g. killed for memory) is replaced; only the jobs it was
+    running fail. Executors are built off the event loop and outside the lock.
+
+    A job that times out before a worker picks it up is cancelled. One that is
+    already running cannot be interrupted without killing its worker, which
+    would take the pool's other jobs with it, so it runs to completion and
+    keeps its slot (and a worker) until then.
+    """
+
+    def __init__(self, name: str, config: LaneConfig, backend: str = "process"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown worker backend '{backend}'. Expected one of {BACKENDS}.")
+        self.name = name
+        self.config = config
+        self.backend = backend
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._restarts = 0
+        self._avg_seconds = 1.0   # EWMA of job duration, seeds the Retry-After estimate
+
+    @property
+    def capacity(self) -> int:
+        return self.config.workers + self.config.queue_size
+
+    def _new_executor(self) -> Executor:
+        if self.backend == "process":
+            executor = ProcessPoolExecutor(max_workers=self.config.workers, initializer=_warm_worker)
+            # Spawn every worker now so the first requests do not pay process start-up
+            for future in [executor.submit(_noop) for _ in range(self.config.workers)]:
+                future.result()
+            return executor
+        _warm_worker()
+        return ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix=f"{self.name}-lane")
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        # Spawning and warming the workers takes seconds; build first, then swap in
+        executor = self._new_executor()
+        with self._lock:
+            installed = self._executor is None
+            if installed:
+                self._executor = executor
+        if not installed:
+            executor.shutdown(wait=False)
+
+    def _replace_broken(self, broken: Executor) -> None:
+        if self._executor is not broken:
+            return  # another request already replaced it
+        executor = self._new_executor()
+        with self._lock:
+            installed = self._executor is broken
+            if installed:
+                self._executor = executor
+                self._restarts += 1
+        if installed:
+            broken.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _retry_after(self) -> int:
+        # Time for the backlog ahead of a new job to drain across the workers
+        return max(1, math.ceil(self._avg_seconds * self._pending / self.config.workers))
+
+    def _release(self, started: float, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled():
+                self._completed += 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            await loop.run_in_executor(None, self.start)
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise LaneSaturated(self.name, self._retry_after())
+            self._pending += 1
+
+        started = time.monotonic()
+        executor = self._executor
+        try:
+            try:
+                future = executor.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                await loop.run_in_executor(None, self._replace_broken, executor)
+                executor = self._executor
+                future = executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # The slot is released when the job really ends, so a timed-out job that
+        # is already running keeps counting against the lane until it finishes.
+        future.add_done_callback(lambda f: self._release(started, f))
+
+        try:
+            # On timeout wait_for cancels the wrapper, which cancels the job if it
+            # has not been picked up by a worker yet.
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.config.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise LaneTimeout(self.name, self.config.timeout) from None
+        except BrokenProcessPool:
+            # A worker died mid-job; this request fails, the next gets a fresh pool
+            await loop.run_in_executor(None, self._replace_broken, executor)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = min(self._pending, self.config.workers)
+            return {
+                "backend": self.backend,
+                "workers": self.config.workers,
+                "queue_size": self.config.queue_size,
+                "timeout_seconds": self.config.timeout,
+                "in_flight": in_flight,
+                "queue_depth": self._pending - in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "restarts": self._restarts,
+            }
+
+
+class WorkerPool:
+    """Named lanes, so cheap verifies never wait behind large embeds."""
+
+    def __init__(self, lanes: Dict[str, LaneConfig], backend: str = "process"):
+        self.backend = backend
+        self.lanes = {name: Lane(name, config, backend) for name, config in lanes.items()}
+
+    @classmethod
+    def from_env(cls, environ: Optional[Dict[str, str]] = None) -> "WorkerPool":
+        """
+        Build the embed and verify lanes from MODEL_SERVICE_* variables, e.g.
+        MODEL_SERVICE_BACKEND=process, MODEL_SERVICE_EMBED_WORKERS=2,
+        MODEL_SERVICE_VERIFY_QUEUE=32, MODEL_SERVICE_EMBED_TIMEOUT=120.
+        """
+        env = os.environ if environ is None else environ
+        cpus = os.cpu_count() or 1
+        defaults = {
+            "embed": LaneConfig(workers=max(1, cpus // 2), queue_size=8, timeout=120.0),
+            "verify": LaneConfig(workers=max(1, cpus - cpus // 2), queue_size=32, timeout=30.0),
+        }
+        lanes = {}
+        for name, default in defaults.items():
+            prefix = f"MODEL_SERVICE_{name.upper()}_"
+            lanes[name] = LaneConfig(
+                workers=int(env.get(prefix + "WORKERS", default.workers)),
+                queue_size=int(env.get(prefix + "QUEUE", default.queue_size)),
+                timeout=float(env.get(prefix + "TIMEOUT", default.timeout)),
+            )
+        return cls(lanes, backend=env.get("MODEL_SERVICE_BACKEND", "process").lower())
+
+    def start(self) -> None:
+        for lane in self.lanes.values():
+            lane.start()
+
+    def shutdown(self) -> None:
+        for lane in self.lanes.values():
+            lane.shutdown()
+
+    async def run(self, lane: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await self.lanes[lane].run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
@@ -0,0 +1,91 @@
+"""
+Compare per-image attack calls with the batched (N,H,W,3) kernels.
+
+Mirrors an attack sweep over many same-size crops: every per-image call is
+timed in a loop over the stack, every batched kernel in one call, and each
+pair is checked to produce identical pixels (noise only for shape, since the
+batched kernel draws from its own Generator).
+
+Usage:
+    python benchmarks/bench_batch_attacks.py --count 2000 --size 128
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from training.attacks import AttackSimulator, BatchAttackSimulator
+
+
+def _legacy_gamma(img, gamma=1.0):
+    # Per-call LUT rebuild, as AttackSimulator.gamma did before the cached table
+    import cv2
+
+    inv_gamma = 1.0 / float(gamma)
+    table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype("uint8")
+    return cv2.LUT(img, table)
+
+
+def _time(fn, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched attack kernel benchmark")
+    parser.add_argument("--count", type=int, default=2000, help="Images in the stack")
+    parser.add_argument("--size", type=int, default=128, help="Side length of each square crop")
+    parser.add_argument("--workers", type=int, default=None, help="Threads for per-slice kernels")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    args = parser.parse_args()
+
+    stack = np.random.default_rng(0).integers(0, 256, (args.count, args.size, args.size, 3), dtype=np.uint8)
+    A, B = AttackSimulator, BatchAttackSimulator
+
+    cases = [
+        ("gamma 1.2", lambda: np.stack([_legacy_gamma(x, 1.2) for x in stack]), lambda: B.gamma(stack, 1.2)),
+        (
+            "brightness +25",
+            lambda: np.stack([A.brightness_contrast(x, 1.0, 25) for x in stack]),
+            lambda: B.brightness_contrast(stack, 1.0, 25),
+        ),
+        (
+            "noise 10",
+            lambda: np.stack([A.noise(x, 10.0) for x in stack]),
+            lambda: B.noise(stack, 10.0, rng=np.random.default_rng(5)),
+        ),
+        (
+            "blur k5",
+            lambda: np.stack([A.blur(x, 5) for x in stack]),
+            lambda: B.blur(stack, 5, workers=args.workers),
+        ),
+        (
+            "jpeg q70",
+            lambda: np.stack([A.jpeg_compression(x, 70) for x in stack]),
+            lambda: B.jpeg_compression(stack, 70, workers=args.workers),
+        ),
+    ]
+
+    print(f"{args.count} x {args.size}x{args.size}x3")
+    print(f"{'attack':<20} {'per-image ms':>13} {'batched ms':>11} {'speedup':>8}")
+    for name, per_image, batched in cases:
+        t_single, expected = _time(per_image, args.repeat)
+        t_batch, got = _time(batched, args.repeat)
+        same = expected.shape == got.shape if name.startswith("noise") else np.array_equal(expected, got)
+        if not same:
+            raise AssertionError(f"{name}: batched output differs from per-image output")
+        print(f"{name:<20} {t_single * 1e3:>13.1f} {t_batch * 1e3:>11.1f} {t_single / t_batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Microbenchmark the shared bit codec against the legacy pure-Python loops.
+
+Payloads range from 16 B up to the full Y-plane LSB capacity of the chosen
+image size (one bit per pixel, minus the 4-byte length header).
+
+Usage:
+    python benchmarks/bench_bitcodec.py --megapixels 12
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from utils.bitcodec import bits_to_bytes, bytes_to_bits, embed_lsb, extract_lsb
+
+
+def _legacy_roundtrip(plane: np.ndarray, payload: bytes) -> bytes:
+    bits = []
+    for byte in payload:
+        for i in range(8):
+            bits.append((byte >> (7 - i)) & 1)
+    bits = np.array(bits, dtype=np.uint8)
+
+    flat = plane.flatten()
+    flat[: bits.size] = (flat[: bits.size] & 0xFE) | bits
+    flat = flat.reshape(plane.shape).flatten()
+    extracted = [int(flat[i] & 1) for i in range(bits.size)]
+
+    out = bytearray()
+    for i in range(0, len(extracted), 8):
+        byte = 0
+        for j in range(8):
+            byte = (byte << 1) | (extracted[i + j] & 1)
+        out.append(byte)
+    return bytes(out)
+
+
+def _codec_roundtrip(plane: np.ndarray, payload: bytes) -> bytes:
+    bits = bytes_to_bits(payload)
+    embed_lsb(plane, bits)
+    return bits_to_bytes(extract_lsb(plane, bits.size))
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bit codec microbenchmark")
+    parser.add_argument("--megapixels", type=float, default=12, help="Y-plane size in megapixels")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    parser.add_argument(
+        "--legacy-max-bytes",
+        type=int,
+        default=1 << 16,
+        help="Skip the legacy loops above this payload size (they take seconds per MB)",
+    )
+    args = parser.parse_args()
+
+    n_pixels = int(args.megapixels * 1e6)
+    plane = np.random.default_rng(0).integers(0, 256, n_pixels, dtype=np.uint8).reshape(-1, 1000)
+    capacity = plane.size // 8 - 4
+
+    sizes = []
+    size = 16
+    while size < capacity:
+        sizes.append(size)
+        size *= 16
+    sizes.append(capacity)
+
+    print(f"{'payload':>12} {'legacy ms':>10} {'codec ms':>10} {'speedup':>8}")
+    for size in sizes:
+        payload = np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8).tobytes()
+        if _codec_roundtrip(plane.copy(), payload) != payload:
+            raise AssertionError(f"Codec roundtrip failed at {size} bytes")
+        codec = _time(lambda: _codec_roundtrip(plane, payload), args.repeat)
+        if size <= args.legacy_max_bytes:
+            legacy = _time(lambda: _legacy_roundtrip(plane, payload), args.repeat)
+            print(f"{size:>10d} B {legacy * 1e3:>10.2f} {codec * 1e3:>10.2f} {legacy / codec:>7.0f}x")
+        else:
+            print(f"{size:>10d} B {'skipped':>10} {codec * 1e3:>10.2f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
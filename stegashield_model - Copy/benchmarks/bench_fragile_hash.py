@@ -0,0 +1,52 @@
+"""
+Benchmark the fragile-hash schemes: PNG-encode + SHA-256 (v1) vs raw-pixel BLAKE2b (v2).
+
+Usage:
+    python benchmarks/bench_fragile_hash.py --sizes 1 12 48
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from utils.fragile_hash import FRAGILE_HASH_PNG_SHA256, FRAGILE_HASH_RAW_BLAKE2B, compute_fragile_hash
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fragile hash benchmark")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 12, 48], help="Image sizes in megapixels")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'png+sha256 ms':>14} {'raw blake2b ms':>15} {'speedup':>8}")
+    for mp in args.sizes:
+        w = int((mp * 1e6 * 4 / 3) ** 0.5)
+        h = int(mp * 1e6 / w)
+        # Smooth content with mild noise so zlib does representative work
+        gradient = np.tile(np.linspace(0, 255, w, dtype=np.float32), (h, 1))
+        noise = np.random.default_rng(0).normal(0, 3, (h, w)).astype(np.float32)
+        plane = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+        bgr = np.stack([plane, 255 - plane, plane // 2], axis=-1)
+
+        v1 = _time(lambda: compute_fragile_hash(bgr, FRAGILE_HASH_PNG_SHA256), args.repeat)
+        v2 = _time(lambda: compute_fragile_hash(bgr, FRAGILE_HASH_RAW_BLAKE2B), args.repeat)
+        print(f"{mp:>6g}MP {v1 * 1e3:>14.1f} {v2 * 1e3:>15.1f} {v1 / v2:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark LSB payload extraction: full decode + full-frame YCrCb vs prefix-only rows.
+
+Usage:
+    python benchmarks/bench_lsb_prefix.py --sizes 12 48 --payload-bytes 64
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from models.hybrid_multidomain_verify_det import HybridMultiDomainVerifierDet
+from utils.bitcodec import extract_lsb
+from utils.frame import DecodedFrame
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _legacy_extract(data: bytes, max_bits: int) -> np.ndarray:
+    bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    y = cv2.split(cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb))[0]
+    return extract_lsb(y.flatten(), max_bits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LSB prefix extraction benchmark")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 12, 48], help="Image sizes in megapixels")
+    parser.add_argument("--payload-bytes", type=int, default=64, help="Payload size incl. 4-byte header")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    args = parser.parse_args()
+
+    verifier = HybridMultiDomainVerifierDet()
+    max_bits = args.payload_bytes * 8
+
+    print(f"{'size':>8} {'full decode ms':>15} {'prefix ms':>10} {'speedup':>8}")
+    for mp in args.sizes:
+        w = int((mp * 1e6 * 4 / 3) ** 0.5)
+        h = int(mp * 1e6 / w)
+        gradient = np.tile(np.linspace(0, 255, w, dtype=np.float32), (h, 1)).astype(np.uint8)
+        bgr = np.stack([gradient, 255 - gradient, gradient // 2], axis=-1)
+        data = cv2.imencode(".png", bgr)[1].tobytes()
+
+        expected = _legacy_extract(data, max_bits)
+        actual = verifier.read_payload_bits(DecodedFrame.from_bytes(data), max_bits)
+        if not np.array_equal(expected, actual):
+            raise AssertionError(f"Prefix extraction diverged at {mp}MP")
+
+        full = _time(lambda: _legacy_extract(data, max_bits), args.repeat)
+        prefix = _time(lambda: verifier.read_payload_bits(DecodedFrame.from_bytes(data), max_bits), args.repeat)
+        print(f"{mp:>6g}MP {full * 1e3:>15.1f} {prefix * 1e3:>10.2f} {full / prefix:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+End-to-end benchmark suite for `embed_image` / `verify_image`.
+
+Runs every (mode, size, texture) case in a fresh process and records wall
+time (best of N), a per-stage breakdown and peak RSS. Results are written as
+JSON; with `--baseline` the run is compared against a stored result file and
+the script exits non-zero when any stage regresses past `--threshold`.
+
+The stage breakdown is the `timings` block the profiles return with
+`timings=True` (see `utils.timing`): exclusive seconds per stage, so a stage
+nested inside another (e.g. the lazy decode triggered by a verifier) is not
+counted twice, and the uncovered remainder under `other`.
+
+Usage:
+    python benchmarks/bench_profiles.py --output bench.json
+    python benchmarks/bench_profiles.py --sizes 0.25 1 --modes robust --output new.json --baseline bench.json
+    python benchmarks/bench_profiles.py --results new.json --baseline bench.json --threshold 0.15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+MODES = ("robust", "semi_fragile", "hybrid")
+SIZES = (0.25, 1, 12, 48)
+TEXTURES = ("synthetic", "natural")
+MESSAGE = "bench"
+
+
+def _dims(megapixels: float):
+    w = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    return int(megapixels * 1e6 / w), w
+
+
+def make_image(megapixels: float, texture: str) -> np.ndarray:
+    """Deterministic BGR test input: a smooth gradient, or multi-octave value noise with edges."""
+    h, w = _dims(megapixels)
+    if texture == "synthetic":
+        gradient = np.tile(np.linspace(0, 255, w, dtype=np.float32), (h, 1))
+        return np.stack([gradient, gradient * 0.8 + 20, 255 - gradient], axis=-1).astype(np.uint8)
+
+    rng = np.random.default_rng(2025)
+    out = np.zeros((h, w, 3), dtype=np.float32)
+    amplitude, cells = 96.0, 4
+    while cells < max(h, w) // 2:
+        grid = rng.random((cells * h // max(h, w) + 2, cells * w // max(h, w) + 2, 3), dtype=np.float32)
+        out += amplitude * (cv2.resize(grid, (w, h), interpolation=cv2.INTER_CUBIC) - 0.5)
+        amplitude *= 0.55
+        cells *= 2
+    out += 128
+    # A few hard edges, as in photos of objects against a background
+    for _ in range(12):
+        x0, y0 = int(rng.integers(0, w)), int(rng.integers(0, h))
+        color = tuple(float(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(out, (x0, y0), (x0 + w // 8, y0 + h // 8), color, thickness=-1)
+    out += rng.normal(0, 3, out.shape).astype(np.float32)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def _rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _prepare_input(workdir: str, megapixels: float, texture: str) -> str:
+    path = Path(workdir) / f"input_{texture}_{megapixels:g}mp.png"
+    if not path.exists():
+        tmp = path.with_suffix(".tmp.png")
+        cv2.imwrite(str(tmp), make_image(megapixels, texture))
+        os.replace(tmp, path)
+    return str(path)
+
+
+def _run_case(workdir: str, op: str, mode: str, megapixels: float, texture: str, repeat: int) -> dict:
+    """Runs in a fresh process, so ru_maxrss is this case's own peak."""
+    import stegashield_profiles as profiles
+
+    image_path = _prepare_input(workdir, megapixels, texture)
+    out_dir = Path(workdir) / f"out_{mode}_{texture}_{megapixels:g}mp"
+    if op == "verify":
+        embedded = out_dir / f"{Path(image_path).stem}_{mode}.png"
+        sidecar = embedded.with_name(embedded.stem + "_metadata.json")
+        if not sidecar.exists():
+            profiles.embed_image(image_path, message=MESSAGE, mode=mode, output_dir=str(out_dir))
+        call = lambda: profiles.verify_image(str(embedded), str(sidecar), timings=True)
+    else:
+        call = lambda: profiles.embed_image(
+            image_path, message=MESSAGE, mode=mode, output_dir=str(out_dir), timings=True
+        )
+
+    rss_before = _rss_mb()
+    best, best_stages = float("inf"), {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        timings = call()["timings"]
+        wall = time.perf_counter() - start
+        if wall < best:
+            best, best_stages = wall, timings["stages"]
+
+    stages = dict(sorted(best_stages.items()))
+    return {
+        "op": op,
+        "mode": mode,
+        "megapixels": megapixels,
+        "texture": texture,
+        "wall_s": round(best, 6),
+        "stages": stages,
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+    }
+
+
+def case_key(result: dict) -> str:
+    return f"{result['op']}/{result['mode']}/{result['megapixels']:g}mp/{result['texture']}"
+
+
+def run_suite(args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="stegashield-bench-") as workdir:
+        for megapixels in args.sizes:
+            for texture in args.textures:
+                # Generate the input in its own process so its buffers never count towards a case's peak RSS
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    pool.submit(_prepare_input, workdir, megapixels, texture).result()
+                for mode in args.modes:
+                    for op in ("embed", "verify"):
+                        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                            future = pool.submit(_run_case, workdir, op, mode, megapixels, texture, args.repeat)
+                            try:
+                                result = future.result()
+                            except Exception as exc:
+                                result = {"op": op, "mode": mode, "megapixels": megapixels, "texture": texture,
+                                          "error": f"{type(exc).__name__}: {exc}"}
+                        results.append(result)
+                        _print_result(result)
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def _print_result(result: dict) -> None:
+    if "error" in result:
+        print(f"{case_key(result):<40} ERROR {result['error']}")
+        return
+    top = sorted(result["stages"].items(), key=lambda kv: -kv[1])[:3]
+    breakdown = ", ".join(f"{name} {seconds * 1e3:.0f}" for name, seconds in top)
+    print(f"{case_key(result):<40} {result['wall_s'] * 1e3:>9.1f} ms  peak {result['peak_rss_mb']:>7.0f} MB  ({breakdown})")
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """
+    Regressions of `current` against `baseline`: a stage (or the total wall
+    time) that is slower by more than `threshold` (fractional) and by more
+    than `min_delta_ms`, so sub-millisecond jitter never fails the check.
+    """
+    base = {case_key(r): r for r in baseline["results"] if "error" not in r}
+    regressions = []
+    for result in current["results"]:
+        key = case_key(result)
+        if "error" in result or key not in base:
+            continue
+        old = base[key]
+        pairs = [("wall", old["wall_s"], result["wall_s"])]
+        pairs += [(name, old["stages"].get(name), seconds) for name, seconds in result["stages"].items()]
+        for stage, before, after in pairs:
+            if before is None:
+                continue
+            delta_ms = (after - before) * 1e3
+            if after > before * (1 + threshold) and delta_ms > min_delta_ms:
+                regressions.append({
+                    "case": key,
+                    "stage": stage,
+                    "baseline_s": before,
+                    "current_s": after,
+                    "change": (after / before - 1) if before > 0 else float("inf"),
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="embed_image / verify_image benchmark suite")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--sizes", type=float, nargs="+", default=list(SIZES), help="Image sizes in megapixels")
+    parser.add_argument("--textures", nargs="+", default=list(TEXTURES), choices=TEXTURES)
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions per case")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--results", help="Compare an existing results JSON instead of running the suite")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed fractional slowdown per stage")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    if args.results:
+        current = json.loads(Path(args.results).read_text())
+    else:
+        current = run_suite(args)
+        if args.output:
+            Path(args.output).write_text(json.dumps(current, indent=2))
+            print(f"Wrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['case']} {r['stage']}: "
+                f"{r['baseline_s'] * 1e3:.1f} ms -> {r['current_s'] * 1e3:.1f} ms ({r['change']:+.0%})"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No stage regressed by more than {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
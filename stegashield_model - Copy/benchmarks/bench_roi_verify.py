@@ -0,0 +1,78 @@
+"""
+Benchmark semi-fragile verification: full-frame DWT vs region-of-interest DWT.
+
+The ROI path converts and transforms only the 2bs x 2bs pixel windows of the
+blocks the permutation assigned to the payload. Each size is embedded once,
+then both verify paths run on a fresh DecodedFrame over the already decoded
+buffer (so decode cost is excluded), and their reports must be identical.
+
+Usage:
+    python benchmarks/bench_roi_verify.py --sizes 12 48 --payload-bytes 48
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from models.semi_fragile_dwt_svd import DwtSvdParams, SemiFragileEmbedderDwtSvd, SemiFragileVerifierDwtSvd
+from utils.frame import DecodedFrame
+
+
+PARAMS = DwtSvdParams(redundancy=8, q_step=9.0, block_size=12, wavelet="haar", band="LH")
+
+
+def _shape_for_megapixels(mp: float):
+    # 4:3 frame, rounded to even dimensions so the Haar band is exactly half size
+    h = int(round((mp * 1e6 * 3 / 4) ** 0.5)) // 2 * 2
+    w = int(round(h * 4 / 3)) // 2 * 2
+    return h, w
+
+
+def _best_of(fn, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def bench(mp: float, payload_bytes: int, repeat: int):
+    h, w = _shape_for_megapixels(mp)
+    gradient = np.tile(np.linspace(0, 255, w, dtype=np.float32), (h, 1))
+    rgb = np.stack([gradient, gradient * 0.8 + 20, 255 - gradient], axis=-1).astype(np.uint8)
+    embedder = SemiFragileEmbedderDwtSvd(PARAMS)
+    capacity = (h // 2 // PARAMS.block_size) * (w // 2 // PARAMS.block_size) // PARAMS.redundancy // 8
+    message = "x" * min(payload_bytes, capacity)
+    wm_rgb, metadata, _ = embedder.embed_rgb_sparse(rgb, message)
+    bgr = np.ascontiguousarray(wm_rgb[:, :, ::-1])
+
+    verifier = SemiFragileVerifierDwtSvd(PARAMS)
+    full, full_report = _best_of(lambda: verifier.verify(DecodedFrame(bgr=bgr), metadata, roi=False), repeat)
+    roi, roi_report = _best_of(lambda: verifier.verify(DecodedFrame(bgr=bgr), metadata), repeat)
+    if roi_report != full_report:
+        raise AssertionError(f"ROI verification diverged from the full-frame path at {mp}MP")
+    return (h, w), len(message) * 8 * PARAMS.redundancy, full, roi
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semi-fragile ROI verification benchmark")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[12, 48], help="Image sizes in megapixels")
+    parser.add_argument("--payload-bytes", type=int, default=48, help="Embedded payload size in bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'blocks':>8} {'full ms':>9} {'roi ms':>8} {'speedup':>8}")
+    for mp in args.sizes:
+        (h, w), n_assigned, full, roi = bench(mp, args.payload_bytes, args.repeat)
+        print(f"{mp:>6g}MP {n_assigned:>8d} {full * 1e3:>9.1f} {roi * 1e3:>8.1f} {full / roi:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
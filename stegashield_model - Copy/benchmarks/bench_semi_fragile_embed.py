@@ -0,0 +1,110 @@
+"""
+Benchmark the semi-fragile block engine: legacy per-block SVD loop vs batched SVD,
+and (with --full) the whole-frame embed vs the sparse footprint-only embed.
+
+Usage:
+    python benchmarks/bench_semi_fragile_embed.py --sizes 1 12 48 --payload-bytes 48
+    python benchmarks/bench_semi_fragile_embed.py --sizes 1 12 --full
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from models.semi_fragile_dwt_svd import DwtSvdParams, SemiFragileEmbedderDwtSvd, _embed_blocks
+
+
+PARAMS = DwtSvdParams(redundancy=8, q_step=9.0, block_size=12, wavelet="haar", band="LH")
+
+
+def _shape_for_megapixels(mp: float):
+    # 4:3 frame, rounded to even dimensions so the Haar band is exactly half size
+    h = int(round((mp * 1e6 * 3 / 4) ** 0.5)) // 2 * 2
+    w = int(round(h * 4 / 3)) // 2 * 2
+    return h, w
+
+
+def _legacy_embed_blocks(band, block_ids, bits, nbw, bs, q):
+    for block_id, bit in zip(block_ids, bits):
+        by = (block_id // nbw) * bs
+        bx = (block_id % nbw) * bs
+        block = band[by:by+bs, bx:bx+bs]
+        U, S, Vt = np.linalg.svd(block, full_matrices=False)
+        base = np.floor(S[0] / q) * q
+        S[0] = base + 0.25 * q if bit == 0 else base + 0.75 * q
+        band[by:by+bs, bx:bx+bs] = (U @ np.diag(S) @ Vt).astype(np.float32)
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_block_engine(mp: float, payload_bytes: int, repeat: int):
+    h, w = _shape_for_megapixels(mp)
+    bs = PARAMS.block_size
+    rng = np.random.default_rng(0)
+    band = rng.normal(0, 20, (h // 2, w // 2)).astype(np.float32)
+    nbw = band.shape[1] // bs
+    num_blocks = (band.shape[0] // bs) * nbw
+
+    n_assigned = min(payload_bytes * 8 * PARAMS.redundancy, num_blocks)
+    block_ids = rng.permutation(num_blocks)[:n_assigned]
+    bits = rng.integers(0, 2, n_assigned).astype(np.uint8)
+
+    legacy_out = band.copy()
+    batched_out = band.copy()
+    _legacy_embed_blocks(legacy_out, block_ids, bits, nbw, bs, PARAMS.q_step)
+    _embed_blocks(batched_out, block_ids, bits, nbw, bs, PARAMS.q_step)
+    if not np.array_equal(legacy_out, batched_out):
+        raise AssertionError(f"Batched engine diverged from legacy loop at {mp}MP")
+
+    legacy = _best_of(lambda: _legacy_embed_blocks(band.copy(), block_ids, bits, nbw, bs, PARAMS.q_step), repeat)
+    batched = _best_of(lambda: _embed_blocks(band.copy(), block_ids, bits, nbw, bs, PARAMS.q_step), repeat)
+    return (h, w), n_assigned, legacy, batched
+
+
+def bench_full_embed(mp: float, payload_bytes: int, repeat: int):
+    h, w = _shape_for_megapixels(mp)
+    gradient = np.tile(np.linspace(0, 255, w, dtype=np.float32), (h, 1))
+    img = Image.fromarray(np.stack([gradient, gradient * 0.8 + 20, 255 - gradient], axis=-1).astype(np.uint8))
+    embedder = SemiFragileEmbedderDwtSvd(PARAMS)
+    message = "x" * min(payload_bytes, embedder.estimate_capacity_bytes(img))
+    rgb = np.array(img)
+    full = _best_of(lambda: embedder.embed(img, message), repeat)
+    sparse = _best_of(lambda: embedder.embed_rgb_sparse(rgb, message), repeat)
+    return full, sparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semi-fragile block engine benchmark")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 12, 48], help="Image sizes in megapixels")
+    parser.add_argument("--payload-bytes", type=int, default=48, help="Embedded payload size in bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    parser.add_argument(
+        "--full", action="store_true", help="Also time the full embed() call against embed_rgb_sparse()"
+    )
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'blocks':>8} {'legacy ms':>10} {'batched ms':>11} {'speedup':>8}")
+    for mp in args.sizes:
+        (h, w), n_assigned, legacy, batched = bench_block_engine(mp, args.payload_bytes, args.repeat)
+        print(f"{mp:>6g}MP {n_assigned:>8d} {legacy * 1e3:>10.1f} {batched * 1e3:>11.1f} {legacy / batched:>7.1f}x")
+        if args.full:
+            full, sparse = bench_full_embed(mp, args.payload_bytes, args.repeat)
+            print(f"{'':>8} full embed() {w}x{h}: {full * 1e3:.1f} ms, sparse: {sparse * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
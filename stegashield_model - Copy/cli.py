@@ -1,26 +1,21 @@
 import argparse
+import contextlib
 import json
+import os
 import sys
+import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 from stegashield_profiles import embed_image, verify_image
+from utils.metadata_store import shared_store
 
 
 def _resolve(path_str: str) -> str:
     return str(Path(path_str).expanduser().resolve())
 
 
-def _read_json(path_str: str):
-    path = Path(path_str)
-    if not path.exists():
-        return {}
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-
 def handle_embed(args):
     result = embed_image(
         image_path=_resolve(args.image),
@@ -28,20 +23,18 @@ def handle_embed(args):
         mode=args.mode,
         user_key=args.user_key,
         output_dir=_resolve(args.output_dir) if args.output_dir else None,
+        store=_resolve(args.store) if args.store else None,
+        write_sidecar=not args.no_sidecar,
     )
 
-    metadata = {}
-    metadata_path = result.get("metadata_path")
-    if metadata_path:
-        metadata = _read_json(metadata_path)
-
     payload = {
         "mode": result.get("mode"),
         "image_path": result.get("image_path"),
-        "metadata_path": metadata_path,
+        "metadata_path": result.get("metadata_path"),
         "heatmap_path": result.get("heatmap_path"),
-        "robust_metadata_path": result.get("robust_metadata_path"),
-        "metadata": metadata,
+        "watermark_id": result.get("watermark_id"),
+        # The same dict the sidecar and the store hold, without reading either back
+        "metadata": result["metadata"],
     }
     return payload
 
@@ -49,29 +42,298 @@ def handle_embed(args):
 def handle_verify(args):
     result = verify_image(
         image_path=_resolve(args.image),
-        metadata_path=_resolve(args.metadata),
+        metadata_path=_resolve(args.metadata) if args.metadata else None,
         mode=args.mode,
+        store=_resolve(args.store) if args.store else None,
+        watermark_id=args.watermark_id,
     )
     return result
 
 
+MODES = ["robust", "semi_fragile", "fragile", "hybrid"]
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+# Fields a serve/batch job may carry, with the defaults of the matching command-line flags
+JOB_DEFAULTS = {
+    "embed": {
+        "image": None,
+        "mode": "hybrid",
+        "message": "",
+        "user_key": None,
+        "output_dir": None,
+        "store": None,
+        "no_sidecar": False,
+    },
+    "verify": {
+        "image": None,
+        "metadata": None,
+        "store": None,
+        "watermark_id": None,
+        "mode": None,
+    },
+}
+
+HANDLERS = {"embed": handle_embed, "verify": handle_verify}
+
+
+def _error_payload(exc: Exception):
+    return {
+        "success": False,
+        "error": str(exc),
+        "trace": traceback.format_exc(),
+    }
+
+
+def _job_args(job) -> argparse.Namespace:
+    """Validate one job object and turn it into the namespace the single-shot handlers take."""
+    if not isinstance(job, dict):
+        raise ValueError("A job must be a JSON object.")
+    command = job.get("command")
+    if command not in JOB_DEFAULTS:
+        raise ValueError(f"Job 'command' must be one of {sorted(JOB_DEFAULTS)}, got {command!r}.")
+    defaults = JOB_DEFAULTS[command]
+    fields = {k: v for k, v in job.items() if k not in ("id", "command")}
+    unknown = sorted(set(fields) - set(defaults))
+    if unknown:
+        raise ValueError(f"Unknown {command} job fields: {', '.join(unknown)}")
+    args = argparse.Namespace(**{**defaults, **fields})
+    if not args.image:
+        raise ValueError(f"{command} job needs 'image'.")
+    if args.mode is not None and args.mode not in MODES:
+        raise ValueError(f"Job 'mode' must be one of {MODES}, got {args.mode!r}.")
+    if command == "verify" and not (args.metadata or args.store):
+        raise ValueError("verify job needs 'metadata' or 'store'.")
+    return args
+
+
+def run_job(job):
+    """
+    Run one embed/verify job and return its result line: the single-shot
+    output ({"success": true, "data": ...} or the error payload), plus the
+    job's `id` when it has one. Never raises.
+    """
+    try:
+        args = _job_args(job)
+        # Anything a handler prints must not end up in the NDJSON stream
+        with contextlib.redirect_stdout(sys.stderr):
+            line = {"success": True, "data": HANDLERS[job["command"]](args)}
+    except Exception as exc:
+        line = _error_payload(exc)
+    if isinstance(job, dict) and "id" in job:
+        line = {"id": job["id"], **line}
+    return line
+
+
+def run_jobs(jobs):
+    """
+    Run a chunk of batch jobs in one worker call. The embeds recording into a
+    store are written in one transaction per store, committed after the chunk;
+    if that commit fails, those jobs are reported as failed.
+    """
+    stored = [
+        isinstance(job, dict) and job.get("command") == "embed" and isinstance(job.get("store"), str)
+        for job in jobs
+    ]
+    with contextlib.ExitStack() as batches:
+        for path in sorted({_resolve(job["store"]) for job, s in zip(jobs, stored) if s}):
+            try:
+                batches.enter_context(shared_store(path).batch())
+            except Exception:
+                pass  # unusable store: its jobs fail on their own
+        lines = [run_job(job) for job in jobs]
+        try:
+            batches.close()
+        except Exception as exc:
+            error = _error_payload(exc)
+            lines = [
+                {**({"id": line["id"]} if "id" in line else {}), **error} if s and line["success"] else line
+                for line, s in zip(lines, stored)
+            ]
+    return lines
+
+
+def _write_line(stream, line) -> None:
+    stream.write(json.dumps(line) + "\n")
+    stream.flush()
+
+
+def handle_serve(stdin=None, stdout=None) -> int:
+    """
+    Read one JSON job per stdin line and answer each with one JSON result line
+    on stdout, in order, until stdin closes. The interpreter and its imports
+    stay warm across jobs. A line that is not valid JSON gets an error line.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for raw in stdin:
+        if not raw.strip():
+            continue
+        try:
+            job = json.loads(raw)
+        except ValueError as exc:
+            _write_line(stdout, _error_payload(exc))
+            continue
+        _write_line(stdout, run_job(job))
+    return 0
+
+
+def _load_manifest(args):
+    """
+    Jobs for `batch`: each line of an NDJSON manifest, or one job per image in
+    a directory, built from the shared flags. Directory verify jobs use the
+    `<stem>_metadata.json` sidecar next to each image when there is one.
+    """
+    manifest = Path(args.manifest).expanduser()
+    if manifest.is_dir():
+        images = sorted(
+            p for p in manifest.iterdir()
+            if p.suffix.lower() in IMAGE_SUFFIXES and not p.stem.endswith("_heatmap")
+        )
+        jobs = []
+        for image in images:
+            job = {"id": image.name, "command": args.batch_command, "image": str(image)}
+            if args.store:
+                job["store"] = args.store
+            if args.batch_command == "embed":
+                job.update(mode=args.mode or "hybrid", message=args.message, user_key=args.user_key)
+                if args.output_dir:
+                    job["output_dir"] = args.output_dir
+            else:
+                job["mode"] = args.mode
+                sidecar = image.with_name(f"{image.stem}_metadata.json")
+                if sidecar.exists():
+                    job["metadata"] = str(sidecar)
+            jobs.append(job)
+        return jobs
+
+    jobs = []
+    with manifest.open(encoding="utf-8") as f:
+        for lineno, raw in enumerate(f, 1):
+            if not raw.strip():
+                continue
+            try:
+                jobs.append(json.loads(raw))
+            except ValueError as exc:
+                raise ValueError(f"{manifest}:{lineno}: {exc}") from exc
+    return jobs
+
+
+def _progress(done: int, total: int, failed: int, started: float, final: bool = False) -> None:
+    """Progress on stderr: rewritten in place on a terminal, every ~10% of the jobs in a log."""
+    tty = sys.stderr.isatty()
+    if not (final or tty or done % max(1, total // 10) == 0):
+        return
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    status = f"{done}/{total} done, {done - failed} ok, {failed} failed, {rate:.1f} jobs/s"
+    status += f", {elapsed:.1f}s elapsed" if final else f", eta {eta:.0f}s"
+    sys.stderr.write(("\r" + status + ("\n" if final else "")) if tty else status + "\n")
+    sys.stderr.flush()
+
+
+def handle_batch(args) -> int:
+    """
+    Run every job of a manifest over `--workers` processes, in chunks (see
+    `run_jobs`). Result lines go to `--output` (default stdout) in completion
+    order, each carrying the job's `id` (its manifest index when it has none);
+    progress goes to stderr. Returns 1 when any job failed.
+    """
+    jobs = _load_manifest(args)
+    for index, job in enumerate(jobs):
+        if isinstance(job, dict):
+            job.setdefault("id", index)
+
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(jobs) or 1))
+    size = max(1, min(16, len(jobs) // (workers * 4)))
+    chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+    started = time.perf_counter()
+    failed = 0
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if workers == 1:
+            results = (line for chunk in chunks for line in run_jobs(chunk))
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = [pool.submit(run_jobs, chunk) for chunk in chunks]
+            results = (line for future in as_completed(futures) for line in future.result())
+        try:
+            for done, line in enumerate(results, 1):
+                failed += not line["success"]
+                _write_line(out, line)
+                if done < len(jobs):
+                    _progress(done, len(jobs), failed, started)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    _progress(len(jobs), len(jobs), failed, started, final=True)
+    return 1 if failed else 0
+
+
 def main():
     parser = argparse.ArgumentParser(description="StegaShield watermark CLI interface")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     embed_parser = subparsers.add_parser("embed", help="Embed watermark")
     embed_parser.add_argument("--image", required=True, help="Path to the input image")
-    embed_parser.add_argument("--mode", default="hybrid", choices=["robust", "semi_fragile", "fragile", "hybrid"])
+    embed_parser.add_argument("--mode", default="hybrid", choices=MODES)
     embed_parser.add_argument("--message", default="", help="Payload message to embed")
     embed_parser.add_argument("--user-key", dest="user_key", help="Optional tenant key for payload derivation")
     embed_parser.add_argument("--output-dir", dest="output_dir", help="Directory to write generated artifacts")
+    embed_parser.add_argument("--store", help="SQLite metadata store to record the embed in")
+    embed_parser.add_argument(
+        "--no-sidecar", dest="no_sidecar", action="store_true", help="Skip the JSON sidecar (requires --store)"
+    )
 
     verify_parser = subparsers.add_parser("verify", help="Verify watermark")
     verify_parser.add_argument("--image", required=True, help="Path to the watermarked image")
-    verify_parser.add_argument("--metadata", required=True, help="Path to the metadata JSON produced at embed time")
-    verify_parser.add_argument("--mode", choices=["robust", "semi_fragile", "fragile", "hybrid"], help="Override profile mode")
+    verify_parser.add_argument("--metadata", help="Path to the metadata JSON produced at embed time")
+    verify_parser.add_argument("--store", help="SQLite metadata store to look the metadata up in")
+    verify_parser.add_argument(
+        "--watermark-id", dest="watermark_id", help="Record to verify against (default: match the image hash)"
+    )
+    verify_parser.add_argument("--mode", choices=MODES, help="Override profile mode")
+
+    subparsers.add_parser(
+        "serve",
+        help="Answer NDJSON embed/verify jobs from stdin on stdout, one warm process",
+        description=(
+            'Each stdin line is a job such as {"id": 1, "command": "embed", "image": "a.png", "message": "owner"} '
+            "with the same fields as the embed/verify flags (underscored). Each gets one result line, in order."
+        ),
+    )
+
+    batch_parser = subparsers.add_parser("batch", help="Run a manifest or directory of jobs in parallel")
+    batch_parser.add_argument(
+        "--manifest", required=True, help="NDJSON file of jobs (as for serve), or a directory of images"
+    )
+    batch_parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    batch_parser.add_argument("--output", help="Write result lines here instead of stdout")
+    batch_parser.add_argument(
+        "--command", dest="batch_command", default="embed", choices=sorted(JOB_DEFAULTS),
+        help="Job type for a directory manifest",
+    )
+    batch_parser.add_argument("--mode", choices=MODES, help="Profile mode for a directory manifest")
+    batch_parser.add_argument("--message", default="", help="Payload for a directory of embeds")
+    batch_parser.add_argument("--user-key", dest="user_key", help="Tenant key for a directory of embeds")
+    batch_parser.add_argument("--output-dir", dest="output_dir", help="Artifact directory for a directory of embeds")
+    batch_parser.add_argument("--store", help="SQLite metadata store for a directory manifest")
 
     args = parser.parse_args()
+    if args.command == "verify" and not (args.metadata or args.store):
+        parser.error("verify needs --metadata or --store")
+    if args.command == "serve":
+        sys.exit(handle_serve())
+    if args.command == "batch":
+        try:
+            sys.exit(handle_batch(args))
+        except (OSError, ValueError) as exc:
+            parser.error(str(exc))
 
     try:
         if args.command == "embed":
@@ -84,12 +346,7 @@ def main():
         sys.stdout.write(json.dumps({"success": True, "data": data}))
         sys.exit(0)
     except Exception as exc:
-        error_payload = {
-            "success": False,
-            "error": str(exc),
-            "trace": traceback.format_exc(),
-        }
-        sys.stdout.write(json.dumps(error_payload))
+        sys.stdout.write(json.dumps(_error_payload(exc)))
         sys.exit(1)
 
 
@@ -1,12 +1,21 @@
 import json
 import hashlib
 from pathlib import Path
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, Union
 
 import cv2
 import numpy as np
 from PIL import Image
 
+from utils.bitcodec import bytes_to_bits, embed_lsb
+from utils.fragile_hash import (
+    FRAGILE_HASH_PNG_SHA256,
+    FRAGILE_HASH_VERSION,
+    compute_fragile_hash,
+    encode_png,
+)
+from utils.timing import stage
+
 
 def _split_ycbcr(img: Image.Image) -> Tuple[np.ndarray, Image.Image, Image.Image]:
     """
@@ -25,6 +34,52 @@ def _merge_ycbcr(y_channel: np.ndarray, cb: Image.Image, cr: Image.Image) -> Ima
     return Image.merge("YCbCr", (y_img, cb, cr)).convert("RGB")
 
 
+# Rows per PIL YCbCr round trip; PIL converts pixel by pixel, so stripes give the
+# same pixels as the whole frame while the PIL images stay O(stripe)
+_STRIPE_ROWS = 256
+
+# Version 1: payload bits written into PIL's YCbCr luma only; about a third of them
+#            read back flipped through the verifier's OpenCV luma.
+# Version 2: as version 1, then each flipped pixel is nudged (_align_luma_parity) so
+#            the header reads back exactly, which blind verification relies on.
+LSB_VERSION_PIL_LUMA = 1
+LSB_VERSION_ALIGNED = 2
+LSB_VERSION = LSB_VERSION_ALIGNED
+
+# Every non-zero RGB nudge in {-1, 0, 1}^3, single-channel changes first
+_PARITY_DELTAS = np.array(
+    sorted(
+        ((r, g, b) for r in (-1, 0, 1) for g in (-1, 0, 1) for b in (-1, 0, 1) if (r, g, b) != (0, 0, 0)),
+        key=lambda d: sum(map(abs, d)),
+    ),
+    dtype=np.int16,
+)
+
+
+def _align_luma_parity(rgb: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """
+    Make the verifier-side luma LSBs of the first len(bits) pixels equal `bits`, in place.
+
+    The payload is written into PIL's YCbCr luma, but the YCbCr -> RGB round trip
+    rounds, and the verifier reads OpenCV's YCrCb luma, so roughly a third of the
+    payload LSBs come back flipped. Each flipped pixel is nudged by the smallest
+    RGB step (at most 1 per channel) whose OpenCV luma has the right parity.
+    """
+    head = rgb.reshape(-1, 3)[: bits.size]
+    luma = cv2.cvtColor(head[None], cv2.COLOR_RGB2YCrCb)[0, :, 0]
+    wrong = np.flatnonzero((luma & 1) != bits)
+    if wrong.size == 0:
+        return rgb
+
+    candidates = np.clip(head[wrong][:, None, :].astype(np.int16) + _PARITY_DELTAS[None], 0, 255).astype(np.uint8)
+    candidate_luma = cv2.cvtColor(candidates, cv2.COLOR_RGB2YCrCb)[:, :, 0]
+    fits = (candidate_luma & 1) == bits[wrong][:, None]
+    if not fits.any(axis=1).all():
+        raise ValueError("Could not align luma parity for the LSB payload.")
+    head[wrong] = candidates[np.arange(wrong.size), fits.argmax(axis=1)]
+    return rgb
+
+
 class HybridMultiDomainEmbedderDet:
     """
     Deterministic LSB-based embedder (no ML).
@@ -34,20 +89,35 @@ class HybridMultiDomainEmbedderDet:
         [4 bytes big-endian: payload_len_bytes][raw message bytes]
     """
 
-    def __init__(self, ecc_symbols: int = 0, alpha_dct: float = 0.12):
+    def __init__(
+        self,
+        ecc_symbols: int = 0,
+        alpha_dct: float = 0.12,
+        fragile_hash_version: int = FRAGILE_HASH_VERSION,
+        lsb_version: int = LSB_VERSION,
+    ):
         self.ecc_symbols = ecc_symbols
         self.alpha_dct = alpha_dct
+        self.fragile_hash_version = fragile_hash_version
+        self.lsb_version = lsb_version
 
     def _bytes_to_bits(self, payload_bytes: bytes) -> np.ndarray:
-        bits = []
-        for byte in payload_bytes:
-            for i in range(8):
-                bits.append((byte >> (7 - i)) & 1)
-        return np.array(bits, dtype=np.uint8)
-
-    def _embed_lsb(self, img: Image.Image, message: str) -> Tuple[Image.Image, Dict[str, Any]]:
-        y_channel, cb_img, cr_img = _split_ycbcr(img)
-        h, w = y_channel.shape
+        return bytes_to_bits(payload_bytes)
+
+    def _embed_lsb(
+        self, rgb: np.ndarray, message: str, encode: bool = False
+    ) -> Tuple[np.ndarray, Dict[str, Any], Optional[bytes]]:
+        """
+        Watermark the HxWx3 uint8 RGB array `rgb` in place.
+        Returns (rgb, metadata, PNG bytes or None).
+
+        With the legacy PNG fragile hash (version 1) the PNG bytes are the exact
+        encoding the hash was taken over, so callers can write them out as the
+        final image instead of encoding again. Raw-pixel hashing only encodes
+        when `encode` is set, from the BGR frame it already converted for the
+        hash; otherwise it returns None.
+        """
+        h, w = rgb.shape[:2]
         capacity = h * w
 
         msg_bytes = message.encode("utf-8")
@@ -63,19 +133,40 @@ class HybridMultiDomainEmbedderDet:
                 f"Message too long for image capacity: need {payload_bits.size} bits, have {capacity}."
             )
 
-        flat = y_channel.flatten()
-        flat[: payload_bits.size] = (flat[: payload_bits.size] & 0xFE) | payload_bits
-        y_wm = flat.reshape(h, w)
+        # Every pixel goes through PIL's YCbCr round trip, the payload pixels with
+        # their luma LSBs replaced on the way
+        for top in range(0, h, _STRIPE_ROWS):
+            stripe = rgb[top:top + _STRIPE_ROWS]
+            with stage("color_convert"):
+                y_channel, cb_img, cr_img = _split_ycbcr(Image.fromarray(stripe, mode="RGB"))
+            if top * w < payload_bits.size:
+                with stage("lsb"):
+                    embed_lsb(y_channel, payload_bits[top * w:(top + _STRIPE_ROWS) * w])
+            with stage("color_convert"):
+                stripe[...] = np.asarray(_merge_ycbcr(y_channel, cb_img, cr_img))
 
-        wm_img = _merge_ycbcr(y_wm, cb_img, cr_img)
+        if self.lsb_version >= LSB_VERSION_ALIGNED:
+            with stage("lsb"):
+                rgb = _align_luma_parity(rgb, payload_bits)
 
-        # Fragile hash over watermarked PNG bytes (BGR via cv2)
-        rgb = np.array(wm_img.convert("RGB"), dtype=np.uint8)
-        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-        ok, buf = cv2.imencode(".png", bgr)
-        if not ok:
-            raise ValueError("Failed to encode watermarked image for fragile hash.")
-        fragile_hash = hashlib.sha256(buf.tobytes()).hexdigest()
+        # Fragile hash over the watermarked BGR frame (cv2 channel order). The
+        # channels are swapped in place and back, rather than held twice.
+        with stage("color_convert"):
+            bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=rgb)
+        png_bytes = None
+        try:
+            with stage("fragile_hash"):
+                if self.fragile_hash_version == FRAGILE_HASH_PNG_SHA256:
+                    png_bytes = encode_png(bgr)
+                    fragile_hash = hashlib.sha256(png_bytes).hexdigest()
+                else:
+                    fragile_hash = compute_fragile_hash(bgr, self.fragile_hash_version)
+            if encode and png_bytes is None:
+                with stage("png_encode"):
+                    png_bytes = encode_png(bgr)
+        finally:
+            with stage("color_convert"):
+                cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
 
         payload_metadata = {
             "original_length": msg_len,
@@ -88,6 +179,8 @@ class HybridMultiDomainEmbedderDet:
         metadata: Dict[str, Any] = {
             "payload_metadata": payload_metadata,
             "fragile_hash": fragile_hash,
+            "fragile_hash_version": self.fragile_hash_version,
+            "lsb_version": self.lsb_version,
             "embedding_params": {
                 "alpha_dct": self.alpha_dct,
                 "redundancy": 1,
@@ -99,7 +192,31 @@ class HybridMultiDomainEmbedderDet:
             "domains_used": ["lsb"],
             "message": message,
         }
-        return wm_img, metadata
+        return rgb, metadata, png_bytes
+
+    def embed_array(
+        self,
+        img: Union[np.ndarray, Image.Image],
+        message: str,
+        encode: bool = False,
+        in_place: bool = False,
+    ) -> Tuple[np.ndarray, Dict[str, Any], Optional[bytes]]:
+        """
+        Embed message into an in-memory RGB uint8 array (or PIL image) without touching disk.
+
+        Returns (watermarked RGB array, metadata, PNG bytes of the result if the
+        fragile hash already produced them or `encode` is set, else None). With
+        `in_place`, an array argument is watermarked in place instead of copied.
+        """
+        if isinstance(img, Image.Image):
+            rgb = np.array(img.convert("RGB"), dtype=np.uint8)
+        elif in_place:
+            rgb = img
+        else:
+            rgb = img.copy()
+        if rgb.ndim != 3 or rgb.shape[2] != 3 or rgb.dtype != np.uint8 or not rgb.flags.c_contiguous:
+            raise ValueError("embed_array expects a contiguous HxWx3 uint8 RGB array.")
+        return self._embed_lsb(rgb, message, encode)
 
     def embed(
         self,
@@ -121,7 +238,7 @@ class HybridMultiDomainEmbedderDet:
         image_path = str(image_path)
         img = Image.open(image_path).convert("RGB")
 
-        wm_img, metadata = self._embed_lsb(img, message)
+        _, metadata, png_bytes = self.embed_array(img, message, encode=True)
 
         if output_path is None:
             p = Path(image_path)
@@ -129,7 +246,8 @@ class HybridMultiDomainEmbedderDet:
         if metadata_path is None:
             metadata_path = str(Path(output_path).with_name(Path(output_path).stem + "_metadata.json"))
 
-        wm_img.save(output_path)
+        with open(output_path, "wb") as f:
+            f.write(png_bytes)
 
         if save_metadata:
             with open(metadata_path, "w") as f:
@@ -1,9 +1,12 @@
-import cv2
 import numpy as np
 import json
 import struct
-import hashlib
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Union
+
+from utils.bitcodec import bits_to_bytes, extract_lsb
+from utils.fragile_hash import FRAGILE_HASH_PNG_SHA256, compute_fragile_hash
+from utils.frame import DecodedFrame
+from utils.timing import stage
 
 
 class HybridMultiDomainVerifierDet:
@@ -21,31 +24,45 @@ class HybridMultiDomainVerifierDet:
         self.alpha_dct = alpha_dct
 
     @staticmethod
-    def _bits_to_bytes(bits: List[int]) -> bytes:
-        if len(bits) == 0:
-            return b""
-        if len(bits) % 8 != 0:
-            pad = 8 - (len(bits) % 8)
-            bits = bits + [0] * pad
-        out = bytearray()
-        for i in range(0, len(bits), 8):
-            byte = 0
-            for j in range(8):
-                byte = (byte << 1) | (bits[i + j] & 1)
-            out.append(byte)
-        return bytes(out)
+    def _bits_to_bytes(bits: np.ndarray) -> bytes:
+        return bits_to_bytes(bits)
 
     @staticmethod
-    def _compute_fragile_hash(img_color: np.ndarray) -> str:
-        ok, buf = cv2.imencode(".png", img_color)
-        if not ok:
-            raise ValueError("Failed to encode image for fragile hash.")
-        return hashlib.sha256(buf.tobytes()).hexdigest()
-
-    def _extract_bits_lsb(self, gray: np.ndarray, max_bits: int) -> List[int]:
-        flat = gray.flatten()
-        total_bits = min(max_bits, flat.size)
-        return [int(flat[i] & 1) for i in range(total_bits)]
+    def _compute_fragile_hash(img_color: np.ndarray, version: int = FRAGILE_HASH_PNG_SHA256) -> str:
+        with stage("fragile_hash"):
+            return compute_fragile_hash(img_color, version)
+
+    def _extract_bits_lsb(self, gray: np.ndarray, max_bits: int) -> np.ndarray:
+        with stage("lsb"):
+            return extract_lsb(gray, max_bits)
+
+    def read_payload_bits(self, frame: DecodedFrame, max_bits: int) -> np.ndarray:
+        """
+        Read the first `max_bits` Y-channel LSBs. Only the rows carrying them are
+        colour-converted (and, for an undecoded PNG frame, decoded).
+        """
+        return self._extract_bits_lsb(frame.y_prefix(max_bits), max_bits=max_bits)
+
+    def read_payload(self, frame: DecodedFrame, max_payload_bytes: int = 4096) -> Union[bytes, None]:
+        """
+        Read the `[4-byte length][payload]` block without any metadata, for blind
+        lookups. Returns None when the image is too small to hold the header, or
+        the length header is implausible for this image or above `max_payload_bytes`.
+        """
+        header_bits = self.read_payload_bits(frame, 32)
+        if header_bits.size < 32:
+            return None
+        header = self._bits_to_bytes(header_bits)
+        payload_len = struct.unpack(">I", header)[0]
+        if payload_len <= 0 or payload_len > max_payload_bytes:
+            return None
+
+        bits = self.read_payload_bits(frame, (4 + payload_len) * 8)
+        if bits.size < (4 + payload_len) * 8:
+            # Image holds fewer pixels than the header claims
+            return None
+        message_bytes, _ = self.parse_deterministic_header(bytearray(self._bits_to_bytes(bits)))
+        return bytes(message_bytes)
 
     def parse_deterministic_header(
         self,
@@ -94,19 +111,19 @@ class HybridMultiDomainVerifierDet:
         metadata_path: str,
         public_key_path: str = None,
     ) -> Dict[str, Any]:
-        img_color = cv2.imread(image_path, cv2.IMREAD_COLOR)
-        img_gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-
-        if img_color is None and img_gray is None:
-            raise ValueError(f"Could not load image: {image_path}")
-        if img_color is None:
-            img_color = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
-        if img_gray is None:
-            img_gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
+        frame = DecodedFrame.from_path(image_path)
 
         with open(metadata_path, "r") as f:
             metadata = json.load(f)
 
+        return self.verify_array(frame, metadata)
+
+    def verify_array(self, img_color: Union[np.ndarray, DecodedFrame], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Verify an in-memory BGR uint8 image (or a shared DecodedFrame) against an
+        already-loaded metadata dict.
+        """
+        frame = img_color if isinstance(img_color, DecodedFrame) else DecodedFrame(img_color)
         payload_metadata = metadata.get("payload_metadata", {})
         final_length = payload_metadata.get(
             "final_length",
@@ -114,16 +131,13 @@ class HybridMultiDomainVerifierDet:
         )
         original_length = payload_metadata.get("original_length", None)
 
-        img_ycrcb = cv2.cvtColor(img_color, cv2.COLOR_BGR2YCrCb)
-        y, cr, cb = cv2.split(img_ycrcb)
-
         max_bits = final_length * 8
-        bits_lsb = self._extract_bits_lsb(y, max_bits=max_bits)
+        bits_lsb = self.read_payload_bits(frame, max_bits)
 
         bits_dwt: List[int] = []
         bits_svd: List[int] = []
 
-        final_bits = bits_lsb[:]
+        final_bits = bits_lsb
         extracted_bytes = self._bits_to_bytes(final_bits)
 
         extraction_stats = {
@@ -180,7 +194,11 @@ class HybridMultiDomainVerifierDet:
         try:
             original_fragile_hash = metadata.get("fragile_hash")
             if original_fragile_hash is not None:
-                current_fragile_hash = self._compute_fragile_hash(img_color)
+                # Metadata without a version predates raw-pixel hashing and used PNG bytes
+                current_fragile_hash = self._compute_fragile_hash(
+                    frame.bgr,
+                    metadata.get("fragile_hash_version", FRAGILE_HASH_PNG_SHA256),
+                )
                 fragile_match = (current_fragile_hash == original_fragile_hash)
         except Exception:
             fragile_match = None
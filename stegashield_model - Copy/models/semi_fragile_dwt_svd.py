@@ -1,42 +1,169 @@
 import numpy as np
 import pywt
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 from PIL import Image
 
+from utils.bitcodec import bits_to_bytes, bytes_to_bits
+from utils.frame import DecodedFrame
+from utils.permutation import DEFAULT_PERM_SEED, block_permutation
+from utils.timing import stage
+
 
 def _to_gray(img: Image.Image) -> np.ndarray:
     return np.array(img.convert("L"), dtype=np.float32)
 
 
-def _from_gray(gray: np.ndarray) -> Image.Image:
+def _from_gray(gray: np.ndarray) -> np.ndarray:
     gray = np.clip(gray, 0, 255).astype("uint8")
-    return Image.fromarray(gray, mode="L").convert("RGB")
+    return np.repeat(gray[..., None], 3, axis=-1)
+
+
+def _is_grayscale(img_array: np.ndarray) -> bool:
+    """True when all three channels of a float RGB array agree."""
+    return np.allclose(img_array[:, :, 0], img_array[:, :, 1]) and np.allclose(img_array[:, :, 1], img_array[:, :, 2])
+
+
+def _is_grayscale_u8(rgb: np.ndarray, stripe_rows: int = 512) -> bool:
+    """
+    `_is_grayscale` for a uint8 frame without a float copy. allclose's tolerance
+    (at most 1e-8 + 1e-5 * 255) is below one grey level, so on integer pixels
+    it is plain equality.
+    """
+    for r0 in range(0, rgb.shape[0], stripe_rows):
+        stripe = rgb[r0:r0 + stripe_rows]
+        if not (np.array_equal(stripe[:, :, 0], stripe[:, :, 1]) and np.array_equal(stripe[:, :, 1], stripe[:, :, 2])):
+            return False
+    return True
+
+
+def _split_luma(img_array: np.ndarray, is_grayscale: bool) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Split a float32 RGB array (or a stack of them) into the plane that carries the watermark and the
+    chroma planes to restore afterwards: (Y, Cb, Cr) for color images, and the
+    shared channel with no chroma for grayscale ones (PIL's "L" conversion of an
+    R == G == B pixel is exactly that value).
+    """
+    if is_grayscale:
+        return img_array[..., 0].copy(), None, None
+    r, g, b = img_array[..., 0], img_array[..., 1], img_array[..., 2]
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = -0.168736 * r - 0.331264 * g + 0.5 * b + 128
+    cr = 0.5 * r - 0.418688 * g - 0.081312 * b + 128
+    return y, cb, cr
+
+
+def _merge_luma(gray_wm: np.ndarray, cb: Optional[np.ndarray], cr: Optional[np.ndarray]) -> np.ndarray:
+    """Inverse of `_split_luma` with the watermarked plane, as an RGB uint8 array."""
+    if cb is None:
+        return _from_gray(gray_wm)
+    y = gray_wm.astype(np.float32, copy=False)
+    rgb_wm = np.empty(y.shape + (3,), dtype=np.float32)
+    rgb_wm[..., 0] = y + 1.402 * (cr - 128)  # R
+    rgb_wm[..., 1] = y - 0.344136 * (cb - 128) - 0.714136 * (cr - 128)  # G
+    rgb_wm[..., 2] = y + 1.772 * (cb - 128)  # B
+    return np.clip(rgb_wm, 0, 255).astype("uint8")
 
 
 def _message_to_bits(msg: str) -> np.ndarray:
-    b = msg.encode("utf-8")
-    bits: List[int] = []
-    for byte in b:
-        for i in range(8):
-            bits.append((byte >> (7 - i)) & 1)
-    return np.array(bits, dtype=np.uint8)
+    return bytes_to_bits(msg.encode("utf-8"))
 
 
 def _bits_to_message(bits: np.ndarray, length_bytes: int) -> str:
-    bits = bits.astype(int)
-    if bits.size % 8 != 0:
-        pad = 8 - (bits.size % 8)
-        bits = np.concatenate([bits, np.zeros(pad, dtype=int)])
-    out_bytes = bytearray()
-    total_bits = length_bytes * 8
-    for i in range(0, total_bits, 8):
-        byte = 0
-        for j in range(8):
-            if i + j < bits.size:
-                byte = (byte << 1) | (bits[i + j] & 1)
-        out_bytes.append(byte)
-    return out_bytes.decode("utf-8", errors="replace")
+    return bits_to_bytes(bits, length_bytes).decode("utf-8", errors="replace")
+
+
+def _block_grid(band: np.ndarray, bs: int) -> np.ndarray:
+    """Return a writable (nbh, nbw, bs, bs) view over the full blocks of `band`."""
+    nbh = band.shape[0] // bs
+    nbw = band.shape[1] // bs
+    s0, s1 = band.strides
+    return np.lib.stride_tricks.as_strided(
+        band, shape=(nbh, nbw, bs, bs), strides=(s0 * bs, s1 * bs, s0, s1)
+    )
+
+
+def _qim_blocks(blocks: np.ndarray, bits: np.ndarray, q: float) -> np.ndarray:
+    """QIM-embed one bit into the top singular value of each block of an (n, bs, bs) stack."""
+    U, S, Vt = np.linalg.svd(blocks, full_matrices=False)
+    base = np.floor(S[:, 0] / q) * q
+    S[:, 0] = np.where(bits == 0, base + 0.25 * q, base + 0.75 * q)
+
+    # U * S[:, None, :] is exactly U @ diag(S), without materialising the diagonal matrices
+    return ((U * S[:, None, :]) @ Vt).astype(np.float32)
+
+
+def _window_grid(img: np.ndarray, size: int) -> np.ndarray:
+    """Return a writable (rows, cols, size, size, ...) view over the full size x size windows of `img`."""
+    rows, cols = img.shape[0] // size, img.shape[1] // size
+    s0, s1 = img.strides[:2]
+    return np.lib.stride_tricks.as_strided(
+        img, shape=(rows, cols, size, size) + img.shape[2:], strides=(s0 * size, s1 * size) + img.strides
+    )
+
+
+def _gather_windows(img: np.ndarray, block_rows: np.ndarray, block_cols: np.ndarray, size: int) -> np.ndarray:
+    """
+    (n, size, size, ...) stack of the size x size windows of `img` at
+    (size * row, size * col). A window reaching past an odd frame edge repeats
+    the edge pixel, which is exactly the DWT's symmetric extension.
+    """
+    H, W = img.shape[:2]
+    inside = ((block_rows + 1) * size <= H) & ((block_cols + 1) * size <= W)
+    windows = np.empty((block_rows.size, size, size) + img.shape[2:], dtype=img.dtype)
+    windows[inside] = _window_grid(img, size)[block_rows[inside], block_cols[inside]]
+    edge = np.flatnonzero(~inside)
+    if edge.size:
+        offsets = np.arange(size)
+        rows = np.minimum(block_rows[edge, None] * size + offsets, H - 1)
+        cols = np.minimum(block_cols[edge, None] * size + offsets, W - 1)
+        windows[edge] = img[rows[:, :, None], cols[:, None, :]]
+    return windows
+
+
+def _pil_luma(rgb: np.ndarray) -> np.ndarray:
+    """`_to_gray` (PIL's "L" conversion) of an (..., h, w, 3) uint8 RGB stack, pixel for pixel."""
+    if rgb.size == 0:
+        return np.zeros(rgb.shape[:-1], dtype=np.float32)
+    flat = np.ascontiguousarray(rgb).reshape(-1, rgb.shape[-2], 3)
+    return np.array(Image.fromarray(flat, mode="RGB").convert("L"), dtype=np.float32).reshape(rgb.shape[:-1])
+
+
+def _is_haar_length(wavelet: str) -> bool:
+    """Two-tap wavelets map each band coefficient to one 2x2 pixel cell, so stripes and windows transform exactly."""
+    return pywt.Wavelet(wavelet).dec_len == 2
+
+
+def _embed_blocks(band: np.ndarray, block_ids: np.ndarray, bits: np.ndarray, nbw: int, bs: int, q: float) -> None:
+    """
+    QIM-embed one bit per block into the top singular value, in place.
+
+    All blocks are gathered into a single (n, bs, bs) stack so the SVD and the
+    reconstruction run as one batched call instead of one LAPACK call per block.
+    """
+    if block_ids.size == 0:
+        return
+    grid = _block_grid(band, bs)
+    rows, cols = np.divmod(block_ids, nbw)
+    grid[rows, cols] = _qim_blocks(grid[rows, cols], bits, q)
+
+
+def _qim_decisions(blocks: np.ndarray, q: float) -> np.ndarray:
+    """Return the QIM bit decision (0/1) of each block of an (n, bs, bs) stack using one batched SVD."""
+    if blocks.shape[0] == 0:
+        return np.zeros(0, dtype=np.uint8)
+    S0 = np.linalg.svd(blocks, compute_uv=False)[:, 0]
+    offset = S0 - np.floor(S0 / q) * q
+    return (offset >= 0.5 * q).astype(np.uint8)
+
+
+def _extract_blocks(band: np.ndarray, block_ids: np.ndarray, nbw: int, bs: int, q: float) -> np.ndarray:
+    """Return the QIM bit decision (0/1) of every block in `block_ids` using one batched SVD."""
+    if block_ids.size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    grid = _block_grid(band, bs)
+    rows, cols = np.divmod(block_ids, nbw)
+    return _qim_decisions(grid[rows, cols], q)
 
 
 @dataclass
@@ -46,6 +173,7 @@ class DwtSvdParams:
     block_size: int = 8
     q_step: float = 5.0
     redundancy: int = 3
+    perm_seed: int = DEFAULT_PERM_SEED
 
 
 class SemiFragileEmbedderDwtSvd:
@@ -59,7 +187,8 @@ class SemiFragileEmbedderDwtSvd:
     
     def _decompose_band_from_gray(self, gray: np.ndarray, p: DwtSvdParams) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, int, int, int]:
         """Decompose a grayscale array into DWT bands."""
-        LL, (LH, HL, HH) = pywt.dwt2(gray, p.wavelet)
+        with stage("dwt"):
+            LL, (LH, HL, HH) = pywt.dwt2(gray, p.wavelet)
         band = LH if p.band == "LH" else HL
         bh, bw = band.shape
         bs = p.block_size
@@ -78,79 +207,72 @@ class SemiFragileEmbedderDwtSvd:
         return self.estimate_capacity_bits(img) // 8
 
     def embed(self, img: Image.Image, message: str) -> Tuple[Image.Image, Dict[str, Any], np.ndarray]:
-        p = self.params
         # Convert to RGB if needed
-        img_rgb = img.convert("RGB")
-        img_array = np.array(img_rgb, dtype=np.float32)
-        
-        # Check if image is grayscale (all channels same) or color
-        is_grayscale = np.allclose(img_array[:, :, 0], img_array[:, :, 1]) and np.allclose(img_array[:, :, 1], img_array[:, :, 2])
-        
-        if is_grayscale:
-            # For grayscale images, use the original method
-            gray = _to_gray(img)
-        else:
-            # For color images, convert to YCbCr and work on Y channel only
-            # Convert RGB to YCbCr
-            ycbcr = np.zeros_like(img_array)
-            ycbcr[:, :, 0] = 0.299 * img_array[:, :, 0] + 0.587 * img_array[:, :, 1] + 0.114 * img_array[:, :, 2]  # Y
-            ycbcr[:, :, 1] = -0.168736 * img_array[:, :, 0] - 0.331264 * img_array[:, :, 1] + 0.5 * img_array[:, :, 2] + 128  # Cb
-            ycbcr[:, :, 2] = 0.5 * img_array[:, :, 0] - 0.418688 * img_array[:, :, 1] - 0.081312 * img_array[:, :, 2] + 128  # Cr
-            gray = ycbcr[:, :, 0].copy()  # Use Y channel for watermarking
-            cb_orig = ycbcr[:, :, 1].copy()
-            cr_orig = ycbcr[:, :, 2].copy()
-        
-        H, W = gray.shape
-        _, LL, LH, HL, HH, band, nbh, nbw, num_blocks = self._decompose_band_from_gray(gray, p)
-        bs = p.block_size
+        rgb_wm, metadata, heatmap = self.embed_rgb(np.array(img.convert("RGB"), dtype=np.uint8), message)
+        return Image.fromarray(rgb_wm, mode="RGB"), metadata, heatmap
+
+    def _plan(self, H: int, W: int, message: str) -> Tuple[np.ndarray, np.ndarray, int, int]:
+        """Return (assigned block ids, one bit per assigned block, nbw, num_blocks) for an HxW frame."""
+        p = self.params
+        # Haar subbands are ceil(N / 2) long on each axis
+        bh, bw = (H + 1) // 2, (W + 1) // 2
+        nbw = bw // p.block_size
+        num_blocks = (bh // p.block_size) * nbw
+        if num_blocks == 0:
+            raise ValueError("Image too small for selected block size / band.")
 
         bits = _message_to_bits(message)
-        mlen = len(bits)
-        total_slots = num_blocks
-        if mlen * p.redundancy > total_slots:
+        n_assigned = len(bits) * p.redundancy
+        if n_assigned > num_blocks:
             raise ValueError(
-                f"Message too long: need {mlen * p.redundancy} blocks, only {total_slots} available."
+                f"Message too long: need {n_assigned} blocks, only {num_blocks} available."
             )
+        # Bit i occupies the next `redundancy` slots of the permutation
+        block_ids = block_permutation(num_blocks, p.perm_seed)[:n_assigned]
+        return block_ids, np.repeat(bits, p.redundancy), nbw, num_blocks
 
-        block_indices = np.arange(num_blocks)
-        np.random.seed(0)
-        np.random.shuffle(block_indices)
-
-        assignments = []
-        idx = 0
-        for bit_idx in range(mlen):
-            for _ in range(p.redundancy):
-                if idx >= total_slots:
-                    break
-                assignments.append((block_indices[idx], bits[bit_idx]))
-                idx += 1
-
-        band_mod = band.copy()
-
-        for block_id, bit in assignments:
-            by = (block_id // nbw) * bs
-            bx = (block_id % nbw) * bs
-            block = band_mod[by:by+bs, bx:bx+bs]
+    def _metadata(self, message: str, H: int, W: int, num_blocks: int) -> Dict[str, Any]:
+        p = self.params
+        return {
+            "message": message,
+            "message_len_bytes": len(message.encode("utf-8")),
+            "params": {
+                "wavelet": p.wavelet,
+                "band": p.band,
+                "block_size": p.block_size,
+                "q_step": p.q_step,
+                "redundancy": p.redundancy,
+                "shape": [int(H), int(W)],
+                "num_blocks": int(num_blocks),
+                "perm_seed": int(p.perm_seed),
+            },
+        }
 
-            U, S, Vt = np.linalg.svd(block, full_matrices=False)
+    def embed_rgb(self, rgb: np.ndarray, message: str) -> Tuple[np.ndarray, Dict[str, Any], np.ndarray]:
+        """
+        Array form of `embed`: takes and returns HxWx3 RGB uint8 arrays, so callers
+        chaining another stage can skip the PIL round trip.
+        """
+        p = self.params
+        H, W = rgb.shape[:2]
+        with stage("color_convert"):
+            img_array = rgb.astype(np.float32)
+            gray, cb, cr = _split_luma(img_array, _is_grayscale(img_array))
 
-            q = p.q_step
-            base = np.floor(S[0] / q) * q
-            if bit == 0:
-                S0_new = base + 0.25 * q
-            else:
-                S0_new = base + 0.75 * q
+        block_ids, slot_bits, nbw, num_blocks = self._plan(H, W, message)
+        _, LL, LH, HL, HH, band, _, _, _ = self._decompose_band_from_gray(gray, p)
 
-            S[0] = S0_new
-            block_new = (U @ np.diag(S) @ Vt).astype(np.float32)
-            band_mod[by:by+bs, bx:bx+bs] = block_new
+        band_mod = band.copy()
+        with stage("svd"):
+            _embed_blocks(band_mod, block_ids, slot_bits, nbw, p.block_size, p.q_step)
 
         if p.band == "LH":
             LH_mod, HL_mod = band_mod, HL
         else:
             LH_mod, HL_mod = LH, band_mod
 
-        gray_wm = pywt.idwt2((LL, (LH_mod, HL_mod, HH)), p.wavelet)
+        with stage("idwt"):
+            gray_wm = pywt.idwt2((LL, (LH_mod, HL_mod, HH)), p.wavelet)
         # DWT inverse can produce slightly different dimensions, crop/pad to match original
         h_wm, w_wm = gray_wm.shape
         if h_wm != H or w_wm != W:
@@ -165,72 +287,152 @@ class SemiFragileEmbedderDwtSvd:
             elif w_wm < W:
                 pad_w = W - w_wm
                 gray_wm = np.pad(gray_wm, ((0, 0), (0, pad_w)), mode='edge')
-        
-        # Compute difference for heatmap (before color reconstruction)
-        # For grayscale, compare with original grayscale; for color, compare with original Y channel
-        if is_grayscale:
-            gray_orig = _to_gray(img)
-        else:
-            gray_orig = ycbcr[:, :, 0]  # Original Y channel
-        diff = np.abs(gray_wm - gray_orig)
-        if diff.max() > 0:
-            heatmap = diff / diff.max() * 255.0
-        else:
-            heatmap = diff
-        
-        # Reconstruct color image
-        if is_grayscale:
-            wm_img = _from_gray(gray_wm)
+
+        with stage("heatmap"):
+            # Difference against the original luma, before color reconstruction
+            diff = np.abs(gray_wm - gray)
+            if diff.max() > 0:
+                heatmap = diff / diff.max() * 255.0
+            else:
+                heatmap = diff
+
+        with stage("color_convert"):
+            rgb_wm = _merge_luma(gray_wm, cb, cr)
+
+        return rgb_wm, self._metadata(message, H, W, num_blocks), heatmap
+
+    def embed_rgb_sparse(
+        self,
+        rgb: np.ndarray,
+        message: str,
+        out: Optional[np.ndarray] = None,
+        heatmap_out: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, Dict[str, Any], np.ndarray]:
+        """
+        Embed by rewriting only the pixels the payload touches.
+
+        With Haar, band block (r, c) is fully determined by the 2bs x 2bs pixel
+        window at (2bs*r, 2bs*c), and changing it only changes that window. So
+        just the assigned windows are gathered into one stack, transformed,
+        QIM-embedded, inverted and patched into a copy of `rgb`; every other
+        pixel stays bit-exact, and the patched windows equal the same pixels of
+        `embed_rgb`. Cost scales with the payload rather than the frame.
+        Verification is unchanged, as is the metadata.
+
+        Memory is bounded the same way: float buffers cover the assigned windows
+        only, the heatmap is uint8 (`embed_rgb`'s heatmap, truncated), and with
+        `out=rgb` the frame is patched in place instead of copied.
+        """
+        p = self.params
+        if not _is_haar_length(p.wavelet):
+            raise ValueError(f"Sparse embedding needs a Haar-length wavelet, got {p.wavelet!r}; use embed_rgb.")
+        H, W = rgb.shape[:2]
+        block_ids, slot_bits, nbw, num_blocks = self._plan(H, W, message)
+        pair = 2 * p.block_size
+
+        if out is None:
+            out = rgb.copy()
+        elif out is not rgb:
+            out[...] = rgb
+        if heatmap_out is None:
+            heatmap_out = np.zeros((H, W), dtype=np.uint8)
         else:
-            # Reconstruct YCbCr with modified Y channel
-            ycbcr_wm = np.zeros((H, W, 3), dtype=np.float32)
-            ycbcr_wm[:, :, 0] = gray_wm
-            ycbcr_wm[:, :, 1] = cb_orig
-            ycbcr_wm[:, :, 2] = cr_orig
-            
-            # Convert YCbCr back to RGB
-            rgb_wm = np.zeros_like(ycbcr_wm)
-            rgb_wm[:, :, 0] = ycbcr_wm[:, :, 0] + 1.402 * (ycbcr_wm[:, :, 2] - 128)  # R
-            rgb_wm[:, :, 1] = ycbcr_wm[:, :, 0] - 0.344136 * (ycbcr_wm[:, :, 1] - 128) - 0.714136 * (ycbcr_wm[:, :, 2] - 128)  # G
-            rgb_wm[:, :, 2] = ycbcr_wm[:, :, 0] + 1.772 * (ycbcr_wm[:, :, 1] - 128)  # B
-            
-            rgb_wm = np.clip(rgb_wm, 0, 255).astype("uint8")
-            wm_img = Image.fromarray(rgb_wm, mode="RGB")
-
-        metadata = {
-            "message": message,
-            "message_len_bytes": len(message.encode("utf-8")),
-            "params": {
-                "wavelet": p.wavelet,
-                "band": p.band,
-                "block_size": p.block_size,
-                "q_step": p.q_step,
-                "redundancy": p.redundancy,
-                "shape": [int(H), int(W)],
-                "num_blocks": int(num_blocks),
-                "perm_seed": 0,
-            },
-        }
-        return wm_img, metadata, heatmap
+            heatmap_out[...] = 0
+        if block_ids.size == 0:
+            return out, self._metadata(message, H, W, num_blocks), heatmap_out
+
+        block_rows, block_cols = np.divmod(block_ids, nbw)
+        with stage("color_convert"):
+            is_grayscale = _is_grayscale_u8(rgb)
+            windows = _gather_windows(rgb, block_rows, block_cols, pair)
+            gray, cb, cr = _split_luma(windows.astype(np.float32), is_grayscale)
+
+        with stage("dwt"):
+            LL, (LH, HL, HH) = pywt.dwt2(gray, p.wavelet, axes=(1, 2))
+        with stage("svd"):
+            if p.band == "LH":
+                LH = _qim_blocks(LH, slot_bits, p.q_step)
+            else:
+                HL = _qim_blocks(HL, slot_bits, p.q_step)
+        with stage("idwt"):
+            gray_wm = pywt.idwt2((LL, (LH, HL, HH)), p.wavelet, axes=(1, 2))
+
+        with stage("heatmap"):
+            diff = np.abs(gray_wm - gray)
+            if diff.max() > 0:
+                diff = diff / diff.max() * 255.0
+        with stage("color_convert"):
+            patched = _merge_luma(gray_wm, cb, cr)
+
+        # On an odd-sized frame the last block row/column reaches one pixel past
+        # the edge; those few windows are patched through index arrays instead of the grid
+        inside = ((block_rows + 1) * pair <= H) & ((block_cols + 1) * pair <= W)
+        _window_grid(out, pair)[block_rows[inside], block_cols[inside]] = patched[inside]
+        _window_grid(heatmap_out, pair)[block_rows[inside], block_cols[inside]] = diff[inside]
+        edge = np.flatnonzero(~inside)
+        if edge.size:
+            offsets = np.arange(pair)
+            edge_rows = block_rows[edge, None] * pair + offsets
+            edge_cols = block_cols[edge, None] * pair + offsets
+            # The extension row/column only existed for the transform; drop it when patching
+            valid = (edge_rows < H)[:, :, None] & (edge_cols < W)[:, None, :]
+            shape = valid.shape
+            pix_rows = np.broadcast_to(edge_rows[:, :, None], shape)[valid]
+            pix_cols = np.broadcast_to(edge_cols[:, None, :], shape)[valid]
+            out[pix_rows, pix_cols] = patched[edge][valid]
+            heatmap_out[pix_rows, pix_cols] = diff[edge][valid]
+        return out, self._metadata(message, H, W, num_blocks), heatmap_out
 
 
 class SemiFragileVerifierDwtSvd:
     def __init__(self, params: DwtSvdParams = None):
         self.params = params or DwtSvdParams()
 
-    def verify(self, img: Image.Image, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    def _roi_band_blocks(self, img: Union[Image.Image, DecodedFrame], block_ids: np.ndarray, nbw: int) -> np.ndarray:
+        """(n, bs, bs) band blocks for `block_ids`, transformed from just their 2bs x 2bs pixel windows."""
+        p = self.params
+        pair = 2 * p.block_size
+        rows, cols = np.divmod(block_ids, nbw)
+        if isinstance(img, DecodedFrame):
+            windows = _gather_windows(img.bgr, rows, cols, pair)
+            with stage("color_convert"):
+                gray = _pil_luma(windows[..., ::-1])
+        else:
+            gray = _gather_windows(_to_gray(img), rows, cols, pair)
+        with stage("dwt"):
+            _, (LH, HL, _) = pywt.dwt2(gray, p.wavelet, axes=(1, 2))
+        return LH if p.band == "LH" else HL
+
+    def verify(
+        self, img: Union[Image.Image, DecodedFrame], metadata: Dict[str, Any], roi: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Decode the payload and score it against `metadata["message"]`.
+
+        With `roi` (the default; Haar-length wavelets only) just the pixel
+        windows of the blocks the permutation assigned are converted to gray and
+        transformed, instead of the whole frame. `roi=False` runs the full-frame
+        DWT; both give identical reports.
+        """
         p = self.params
         msg = metadata["message"]
         msg_len_bytes = metadata["message_len_bytes"]
         expected_bits = _message_to_bits(msg)
         mlen = len(expected_bits)
 
-        gray = _to_gray(img)
-        H, W = gray.shape
+        roi = roi and _is_haar_length(p.wavelet)
+        if roi:
+            H, W = img.shape[:2] if isinstance(img, DecodedFrame) else (img.height, img.width)
+            # Haar subbands are ceil(N / 2) long on each axis
+            bh, bw = (H + 1) // 2, (W + 1) // 2
+        else:
+            gray = img.gray if isinstance(img, DecodedFrame) else _to_gray(img)
+            H, W = gray.shape
 
-        LL, (LH, HL, HH) = pywt.dwt2(gray, p.wavelet)
-        band = LH if p.band == "LH" else HL
-        bh, bw = band.shape
+            with stage("dwt"):
+                LL, (LH, HL, HH) = pywt.dwt2(gray, p.wavelet)
+            band = LH if p.band == "LH" else HL
+            bh, bw = band.shape
 
         bs = p.block_size
         nbh = bh // bs
@@ -244,43 +446,24 @@ class SemiFragileVerifierDwtSvd:
                 "bit_accuracy": 0.0,
             }
 
-        block_indices = np.arange(num_blocks)
-        np.random.seed(metadata["params"].get("perm_seed", 0))
-        np.random.shuffle(block_indices)
-
-        assignments = []
-        idx = 0
-        for bit_idx in range(mlen):
-            for _ in range(p.redundancy):
-                if idx >= num_blocks:
-                    break
-                assignments.append((block_indices[idx], bit_idx))
-                idx += 1
-
-        votes = [[] for _ in range(mlen)]
-        q = p.q_step
-
-        for block_id, bit_idx in assignments:
-            by = (block_id // nbw) * bs
-            bx = (block_id % nbw) * bs
-            block = band[by:by+bs, bx:bx+bs]
-
-            U, S, Vt = np.linalg.svd(block, full_matrices=False)
-            S0 = S[0]
-            base = np.floor(S0 / q) * q
-            offset = S0 - base
-            bit_hat = 0 if offset < 0.5 * q else 1
-            votes[bit_idx].append(bit_hat)
-
-        decoded_bits = np.zeros(mlen, dtype=np.uint8)
-        for i, v in enumerate(votes):
-            if len(v) == 0:
-                decoded_bits[i] = 0
-            else:
-                # Use strict majority voting (0.5 threshold) to better detect tampering
-                # This ensures we only accept bits when there's clear majority agreement
-                # Helps distinguish between authentic (high agreement) and tampered (low agreement) images
-                decoded_bits[i] = 1 if np.mean(v) >= 0.5 else 0
+        block_indices = block_permutation(num_blocks, metadata["params"].get("perm_seed", DEFAULT_PERM_SEED))
+        assigned = block_indices[: mlen * p.redundancy]
+
+        # Votes come back in permutation order, i.e. `redundancy` consecutive votes per bit
+        if roi:
+            blocks = self._roi_band_blocks(img, assigned, nbw)
+            with stage("svd"):
+                votes = _qim_decisions(blocks, p.q_step)
+        else:
+            with stage("svd"):
+                votes = _extract_blocks(band, assigned, nbw, bs, p.q_step)
+        vote_share = votes.reshape(mlen, p.redundancy).mean(axis=1)
+
+        # Use strict majority voting (0.5 threshold) to better detect tampering
+        # This ensures we only accept bits when there's clear majority agreement
+        # Helps distinguish between authentic (high agreement) and tampered (low agreement) images
+        decoded_bits = (vote_share >= 0.5).astype(np.uint8)
+        bit_agreement = np.where(decoded_bits == 1, vote_share, 1.0 - vote_share)
 
         min_len = min(len(expected_bits), len(decoded_bits))
         correct = int((expected_bits[:min_len] == decoded_bits[:min_len]).sum())
@@ -292,4 +475,5 @@ class SemiFragileVerifierDwtSvd:
             "decode_success": True,
             "decoded_message": decoded_msg,
             "bit_accuracy": bit_acc,
+            "bit_agreement": [round(float(a), 4) for a in bit_agreement],
         }
@@ -1,299 +1,632 @@
-import hashlib
-import json
-from pathlib import Path
-from typing import Any, Dict, Optional
-
-from PIL import Image
-
-from models.hybrid_multidomain_embed_det import HybridMultiDomainEmbedderDet
-from models.hybrid_multidomain_verify_det import HybridMultiDomainVerifierDet
-from models.semi_fragile_dwt_svd import (
-    SemiFragileEmbedderDwtSvd,
-    SemiFragileVerifierDwtSvd,
-    DwtSvdParams,
-)
-
-
-VALID_MODES = ("robust", "semi_fragile", "fragile", "hybrid")
-
-
-def _normalize_mode(mode: str) -> str:
-    if mode is None:
-        return "hybrid"
-    norm = mode.strip().lower()
-    if norm not in VALID_MODES:
-        raise ValueError(f"Unsupported mode '{mode}'. Choose from {VALID_MODES}.")
-    return norm
-
-
-def _derive_payload(message: str, user_key: Optional[str]) -> Dict[str, Optional[str]]:
-    message = (message or "").strip()
-    if not message and not user_key:
-        raise ValueError("Provide at least one of message or user_key.")
-
-    key_hash = hashlib.sha256(user_key.encode("utf-8")).hexdigest() if user_key else None
-    if user_key and message:
-        payload = f"{message}|{key_hash[:32]}"
-    elif user_key:
-        payload = key_hash
-    else:
-        payload = message
-    return {"payload": payload, "key_hash": key_hash}
-
-
-def _write_metadata(
-    metadata_path: Path,
-    base_payload: Dict[str, Optional[str]],
-    profile_mode: str,
-    extra: Dict[str, Any],
-) -> Dict[str, Any]:
-    metadata = {
-        "profile_mode": profile_mode,
-        "user_payload": base_payload["payload"],
-        "user_key_hash": base_payload["key_hash"],
-    }
-    metadata.update(extra)
-
-    metadata_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    return metadata
-
-
-def embed_image(
-    image_path: str,
-    message: str = "",
-    mode: str = "hybrid",
-    user_key: Optional[str] = None,
-    output_dir: Optional[str] = None,
-) -> Dict[str, Any]:
-    """
-    High-level embed wrapper that routes to the correct pipeline based on `mode`.
-    """
-
-    mode = _normalize_mode(mode)
-    payload_info = _derive_payload(message, user_key)
-
-    image_path = Path(image_path).expanduser().resolve()
-    if not image_path.exists():
-        raise FileNotFoundError(f"Input image not found: {image_path}")
-
-    out_dir = Path(output_dir).expanduser().resolve() if output_dir else image_path.parent
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    base_name = f"{image_path.stem}_{mode}"
-    final_image_path = out_dir / f"{base_name}.png"
-    metadata_path = out_dir / f"{base_name}_metadata.json"
-
-    if mode == "robust":
-        embedder = HybridMultiDomainEmbedderDet()
-        embedder.embed(
-            str(image_path),
-            payload_info["payload"],
-            output_path=str(final_image_path),
-            metadata_path=str(metadata_path),
-            save_metadata=True,
-        )
-
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            raw_meta = json.load(f)
-
-        raw_meta.update(
-            {
-                "profile_mode": "robust",
-                "user_payload": payload_info["payload"],
-                "user_key_hash": payload_info["key_hash"],
-            }
-        )
-
-        with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(raw_meta, f, indent=2)
-
-        return {
-            "mode": "robust",
-            "image_path": str(final_image_path),
-            "metadata_path": str(metadata_path),
-        }
-
-    if mode == "semi_fragile":
-        # Use significantly more robust parameters for better survival through re-encoding
-        # Higher redundancy = more copies of each bit (better error correction)
-        # Higher q_step = larger quantization bins (more tolerant to compression)
-        # Larger block_size = more stable embedding (less affected by small changes)
-        robust_params = DwtSvdParams(
-            redundancy=8,   # Increased from 5 to 8 (each bit embedded 8 times for better error correction)
-            q_step=9.0,     # Increased from 7.0 to 9.0 (larger quantization bins = more robust to compression)
-            block_size=12,  # Increased from 8 to 12 (larger blocks = more stable, less sensitive to minor changes)
-            wavelet="haar",
-            band="LH"
-        )
-        embedder = SemiFragileEmbedderDwtSvd(params=robust_params)
-        img = Image.open(image_path).convert("RGB")
-        wm_img, semi_metadata, heatmap = embedder.embed(img, payload_info["payload"])
-        wm_img.save(final_image_path)
-
-        heatmap_path = out_dir / f"{base_name}_heatmap.png"
-        Image.fromarray(heatmap.astype("uint8")).save(heatmap_path)
-
-        _write_metadata(
-            metadata_path,
-            payload_info,
-            "semi_fragile",
-            {
-                "semi_metadata": semi_metadata,
-                "heatmap_path": str(heatmap_path),
-                "params": robust_params.__dict__,  # Store params in metadata for verification
-            },
-        )
-
-        return {
-            "mode": "semi_fragile",
-            "image_path": str(final_image_path),
-            "metadata_path": str(metadata_path),
-            "heatmap_path": str(heatmap_path),
-        }
-
-    if mode == "fragile":
-        raise NotImplementedError(
-            "Fragile profile is reserved for future work. Tune SemiFragileEmbedderDwtSvd "
-            "parameters (e.g., higher redundancy, tighter thresholds) before enabling."
-        )
-
-    # Hybrid mode: semi-fragile embed first, robust embed second
-    # Use significantly more robust parameters for hybrid mode as well
-    robust_params = DwtSvdParams(
-        redundancy=8,   # Increased from 5 to 8 for better error correction
-        q_step=9.0,     # Increased from 7.0 to 9.0 for more robust quantization
-        block_size=12, # Increased from 8 to 12 for more stable embedding
-        wavelet="haar",
-        band="LH"
-    )
-    semi_embedder = SemiFragileEmbedderDwtSvd(params=robust_params)
-    img = Image.open(image_path).convert("RGB")
-    semi_wm_img, semi_metadata, heatmap = semi_embedder.embed(img, payload_info["payload"])
-
-    intermediate_path = out_dir / f"{base_name}_stage.png"
-    semi_wm_img.save(intermediate_path)
-
-    heatmap_path = out_dir / f"{base_name}_heatmap.png"
-    Image.fromarray(heatmap.astype("uint8")).save(heatmap_path)
-
-    robust_embedder = HybridMultiDomainEmbedderDet()
-    robust_metadata_path = out_dir / f"{base_name}_robust.json"
-    robust_embedder.embed(
-        str(intermediate_path),
-        payload_info["payload"],
-        output_path=str(final_image_path),
-        metadata_path=str(robust_metadata_path),
-        save_metadata=True,
-    )
-
-    if intermediate_path.exists():
-        intermediate_path.unlink()
-
-    combined_metadata = _write_metadata(
-        metadata_path,
-        payload_info,
-        "hybrid",
-        {
-            "semi_metadata": semi_metadata,
-            "heatmap_path": str(heatmap_path),
-            "robust_metadata_path": str(robust_metadata_path),
-            "params": robust_params.__dict__,  # Store params in metadata for verification
-        },
-    )
-
-    return {
-        "mode": "hybrid",
-        "image_path": str(final_image_path),
-        "metadata_path": str(metadata_path),
-        "heatmap_path": str(heatmap_path),
-        "robust_metadata_path": combined_metadata["robust_metadata_path"],
-    }
-
-
-def verify_image(
-    image_path: str,
-    metadata_path: str,
-    mode: Optional[str] = None,
-) -> Dict[str, Any]:
-    """
-    High-level verify wrapper that routes to the correct pipeline based on `mode`.
-    """
-
-    image_path = Path(image_path).expanduser().resolve()
-    metadata_path = Path(metadata_path).expanduser().resolve()
-    if not image_path.exists():
-        raise FileNotFoundError(f"Image not found: {image_path}")
-    if not metadata_path.exists():
-        raise FileNotFoundError(f"Metadata not found: {metadata_path}")
-
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
-
-    resolved_mode = _normalize_mode(mode or metadata.get("profile_mode", "hybrid"))
-
-    if resolved_mode == "robust":
-        verifier = HybridMultiDomainVerifierDet()
-        report = verifier.verify(str(image_path), str(metadata_path))
-        return {"mode": "robust", "robust_report": report}
-
-    if resolved_mode == "semi_fragile":
-        semi_metadata = metadata.get("semi_metadata")
-        if semi_metadata is None:
-            raise ValueError("Semi-fragile metadata missing from metadata file.")
-        
-        # Use parameters from metadata if available, otherwise use improved robust defaults
-        # This ensures backward compatibility with old watermarks
-        params_dict = semi_metadata.get("params", {})
-        verify_params = DwtSvdParams(
-            redundancy=params_dict.get("redundancy", 8),  # Default to 8 for new watermarks (improved from 5)
-            q_step=params_dict.get("q_step", 9.0),        # Default to 9.0 for new watermarks (improved from 7.0)
-            block_size=params_dict.get("block_size", 12),  # Default to 12 for new watermarks (improved from 8)
-            wavelet=params_dict.get("wavelet", "haar"),
-            band=params_dict.get("band", "LH")
-        )
-        verifier = SemiFragileVerifierDwtSvd(params=verify_params)
-        img = Image.open(image_path).convert("RGB")
-
-        report = verifier.verify(img, semi_metadata)
-        return {"mode": "semi_fragile", "semi_fragile_report": report}
-
-    if resolved_mode == "fragile":
-        raise NotImplementedError(
-            "Fragile profile verification hooks are not implemented yet. "
-            "Tighten semi-fragile thresholds to emulate fragile behaviour."
-        )
-
-    # Hybrid
-    semi_metadata = metadata.get("semi_metadata")
-    robust_metadata_path = metadata.get("robust_metadata_path")
-    if semi_metadata is None or robust_metadata_path is None:
-        raise ValueError("Hybrid metadata must include semi and robust components.")
-
-    img = Image.open(image_path).convert("RGB")
-    # Use parameters from metadata for hybrid verification (backward compatible)
-    # Check both semi_metadata.params and top-level params for backward compatibility
-    params_dict = semi_metadata.get("params", {})
-    if not params_dict and "params" in metadata:
-        params_dict = metadata.get("params", {})
-    verify_params = DwtSvdParams(
-        redundancy=params_dict.get("redundancy", 8),  # Default to 8 (improved from 5)
-        q_step=params_dict.get("q_step", 9.0),        # Default to 9.0 (improved from 7.0)
-        block_size=params_dict.get("block_size", 12), # Default to 12 (improved from 8)
-        wavelet=params_dict.get("wavelet", "haar"),
-        band=params_dict.get("band", "LH")
-    )
-    semi_report = SemiFragileVerifierDwtSvd(params=verify_params).verify(img, semi_metadata)
-
-    robust_report = HybridMultiDomainVerifierDet().verify(
-        str(image_path),
-        str(robust_metadata_path),
-    )
-
-    return {
-        "mode": "hybrid",
-        "semi_fragile_report": semi_report,
-        "robust_report": robust_report,
-    }
-
+import hashlib
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from models.hybrid_multidomain_embed_det import HybridMultiDomainEmbedderDet
+from models.hybrid_multidomain_verify_det import HybridMultiDomainVerifierDet
+from models.semi_fragile_dwt_svd import (
+    SemiFragileEmbedderDwtSvd,
+    SemiFragileVerifierDwtSvd,
+    DwtSvdParams,
+)
+from utils.fragile_hash import FRAGILE_HASH_PNG_SHA256, FRAGILE_HASH_RAW_BLAKE2B, compute_fragile_hash, encode_png
+from utils.frame import DecodedFrame
+from utils.metadata_store import (
+    MetadataRecord,
+    MetadataStore,
+    WatermarkAmbiguous,
+    WatermarkNotFound,
+    new_watermark_id,
+    open_store,
+    payload_digest,
+)
+from utils.permutation import DEFAULT_PERM_SEED, tenant_perm_seed
+from utils.timing import note_shape, stage, with_timings
+
+
+VALID_MODES = ("robust", "semi_fragile", "fragile", "hybrid")
+
+# Bump whenever a change alters verification reports, so cached results are not reused
+VERIFIER_VERSION = 2
+
+ImageInput = Union[np.ndarray, Image.Image, DecodedFrame]
+
+
+def _normalize_mode(mode: str) -> str:
+    if mode is None:
+        return "hybrid"
+    norm = mode.strip().lower()
+    if norm not in VALID_MODES:
+        raise ValueError(f"Unsupported mode '{mode}'. Choose from {VALID_MODES}.")
+    return norm
+
+
+def _derive_payload(message: str, user_key: Optional[str]) -> Dict[str, Optional[str]]:
+    message = (message or "").strip()
+    if not message and not user_key:
+        raise ValueError("Provide at least one of message or user_key.")
+
+    key_hash = hashlib.sha256(user_key.encode("utf-8")).hexdigest() if user_key else None
+    if user_key and message:
+        payload = f"{message}|{key_hash[:32]}"
+    elif user_key:
+        payload = key_hash
+    else:
+        payload = message
+    return {"payload": payload, "key_hash": key_hash}
+
+
+def _build_metadata(
+    base_payload: Dict[str, Optional[str]],
+    profile_mode: str,
+    extra: Dict[str, Any],
+) -> Dict[str, Any]:
+    metadata = {
+        "profile_mode": profile_mode,
+        "user_payload": base_payload["payload"],
+        "user_key_hash": base_payload["key_hash"],
+    }
+    metadata.update(extra)
+    return metadata
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with stage("sidecar_write"), open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def _embed_params(perm_seed: int = DEFAULT_PERM_SEED) -> DwtSvdParams:
+    # Use significantly more robust parameters for better survival through re-encoding
+    # Higher redundancy = more copies of each bit (better error correction)
+    # Higher q_step = larger quantization bins (more tolerant to compression)
+    # Larger block_size = more stable embedding (less affected by small changes)
+    return DwtSvdParams(
+        redundancy=8,   # Increased from 5 to 8 (each bit embedded 8 times for better error correction)
+        q_step=9.0,     # Increased from 7.0 to 9.0 (larger quantization bins = more robust to compression)
+        block_size=12,  # Increased from 8 to 12 (larger blocks = more stable, less sensitive to minor changes)
+        wavelet="haar",
+        band="LH",
+        perm_seed=perm_seed,
+    )
+
+
+def _verify_params(params_dict: Dict[str, Any]) -> DwtSvdParams:
+    # Use parameters from metadata if available, otherwise use improved robust defaults
+    # This ensures backward compatibility with old watermarks
+    return DwtSvdParams(
+        redundancy=params_dict.get("redundancy", 8),  # Default to 8 for new watermarks (improved from 5)
+        q_step=params_dict.get("q_step", 9.0),        # Default to 9.0 for new watermarks (improved from 7.0)
+        block_size=params_dict.get("block_size", 12),  # Default to 12 for new watermarks (improved from 8)
+        wavelet=params_dict.get("wavelet", "haar"),
+        band=params_dict.get("band", "LH"),
+        perm_seed=params_dict.get("perm_seed", DEFAULT_PERM_SEED),
+    )
+
+
+def _as_rgb_array(image: ImageInput) -> np.ndarray:
+    if isinstance(image, DecodedFrame):
+        return image.rgb
+    if isinstance(image, Image.Image):
+        return np.array(image.convert("RGB"), dtype=np.uint8)
+    arr = np.asarray(image)
+    if arr.dtype != np.uint8:
+        raise ValueError(f"Expected a uint8 image array, got dtype {arr.dtype}.")
+    if arr.ndim == 2:
+        return np.repeat(arr[:, :, None], 3, axis=2)
+    if arr.ndim == 3 and arr.shape[2] in (3, 4):
+        return np.ascontiguousarray(arr[:, :, :3])
+    raise ValueError(f"Expected an HxW or HxWx3 image array, got shape {arr.shape}.")
+
+
+# Rows copied out of a decoded PIL image at a time
+_DECODE_STRIPE_ROWS = 256
+
+
+def _decode_rgb(data: bytes) -> np.ndarray:
+    with stage("decode"):
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        # np.array(img.convert("RGB")) would hold the converted image, a bytes
+        # copy of it and the array at once; stripes keep that to PIL's own buffer
+        rgb = np.empty((img.height, img.width, 3), dtype=np.uint8)
+        for top in range(0, img.height, _DECODE_STRIPE_ROWS):
+            bottom = min(img.height, top + _DECODE_STRIPE_ROWS)
+            rgb[top:bottom] = np.asarray(img.crop((0, top, img.width, bottom)).convert("RGB"))
+        return rgb
+
+
+def _encode_png(arr: np.ndarray, in_place: bool = False) -> bytes:
+    # OpenCV's PNG encoder is considerably faster than PIL's default settings
+    with stage("png_encode"):
+        if arr.ndim != 3:
+            return encode_png(arr)
+        if not in_place:
+            return encode_png(cv2.cvtColor(arr, cv2.COLOR_RGB2BGR))
+        # Swap the channels of the caller's array and back, instead of a second frame
+        bgr = cv2.cvtColor(arr, cv2.COLOR_RGB2BGR, dst=arr)
+        try:
+            return encode_png(bgr)
+        finally:
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=arr)
+
+
+def _semi_fragile_embed(params: DwtSvdParams, rgb: np.ndarray, payload: str, in_place: bool = False):
+    # Only the payload's block footprints are rewritten; the rest of the frame is copied untouched
+    return SemiFragileEmbedderDwtSvd(params=params).embed_rgb_sparse(rgb, payload, out=rgb if in_place else None)
+
+
+def _embed(
+    rgb: np.ndarray,
+    message: str,
+    mode: str,
+    user_key: Optional[str],
+    tenant_seed: bool = False,
+    encode: bool = False,
+    in_place: bool = False,
+) -> Tuple[str, np.ndarray, Dict[str, Any], Optional[np.ndarray], Optional[bytes]]:
+    """
+    Core in-memory embed shared by every public entry point.
+
+    Returns (mode, watermarked RGB array, metadata, heatmap or None, PNG bytes or None).
+    The PNG bytes are set when the pipeline already had to encode the final image
+    (the legacy PNG fragile hash), so callers never encode it twice. With `encode`,
+    the LSB layer encodes them from the BGR frame it converted for the fragile hash.
+    With `in_place` (callers that decoded `rgb` themselves) the layers write into
+    `rgb` instead of copying it, so the frame is held once.
+    With `tenant_seed`, the semi-fragile block layout is derived from `user_key`
+    instead of the shared default seed.
+    """
+
+    mode = _normalize_mode(mode)
+    payload_info = _derive_payload(message, user_key)
+    note_shape(rgb.shape)
+    perm_seed = tenant_perm_seed(user_key) if tenant_seed else DEFAULT_PERM_SEED
+
+    if mode == "robust":
+        wm_rgb, raw_meta, png_bytes = HybridMultiDomainEmbedderDet().embed_array(
+            rgb, payload_info["payload"], encode=encode, in_place=in_place
+        )
+        raw_meta.update(
+            {
+                "profile_mode": "robust",
+                "user_payload": payload_info["payload"],
+                "user_key_hash": payload_info["key_hash"],
+            }
+        )
+        return mode, wm_rgb, raw_meta, None, png_bytes
+
+    if mode == "semi_fragile":
+        robust_params = _embed_params(perm_seed)
+        wm_rgb, semi_metadata, heatmap = _semi_fragile_embed(robust_params, rgb, payload_info["payload"], in_place)
+        metadata = _build_metadata(
+            payload_info,
+            "semi_fragile",
+            {
+                "semi_metadata": semi_metadata,
+                "params": robust_params.__dict__,  # Store params in metadata for verification
+            },
+        )
+        return mode, wm_rgb, metadata, heatmap, None
+
+    if mode == "fragile":
+        raise NotImplementedError(
+            "Fragile profile is reserved for future work. Tune SemiFragileEmbedderDwtSvd "
+            "parameters (e.g., higher redundancy, tighter thresholds) before enabling."
+        )
+
+    # Hybrid mode: semi-fragile embed first, robust embed second.
+    # The semi-fragile RGB array feeds the LSB layer directly.
+    robust_params = _embed_params(perm_seed)
+    semi_rgb, semi_metadata, heatmap = _semi_fragile_embed(robust_params, rgb, payload_info["payload"], in_place)
+    # semi_rgb is either `rgb` itself or the semi-fragile layer's own copy
+    wm_rgb, robust_metadata, png_bytes = HybridMultiDomainEmbedderDet().embed_array(
+        semi_rgb, payload_info["payload"], encode=encode, in_place=True
+    )
+
+    metadata = _build_metadata(
+        payload_info,
+        "hybrid",
+        {
+            "semi_metadata": semi_metadata,
+            "robust_metadata": robust_metadata,
+            "params": robust_params.__dict__,  # Store params in metadata for verification
+        },
+    )
+    return mode, wm_rgb, metadata, heatmap, png_bytes
+
+
+@with_timings
+def embed_array(
+    image: ImageInput,
+    message: str = "",
+    mode: str = "hybrid",
+    user_key: Optional[str] = None,
+    tenant_seed: bool = False,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    In-memory embed: takes an RGB uint8 array (or PIL image) and returns the
+    watermarked RGB array, metadata dict and heatmap without touching disk.
+    With `timings=True` the result gains a per-stage `timings` block.
+    """
+
+    mode, wm_rgb, metadata, heatmap, _ = _embed(_as_rgb_array(image), message, mode, user_key, tenant_seed)
+    return {
+        "mode": mode,
+        "image": wm_rgb,
+        "metadata": metadata,
+        "heatmap": heatmap.astype(np.uint8, copy=False) if heatmap is not None else None,
+    }
+
+
+def _record_embed(
+    store: Union[MetadataStore, str],
+    mode: str,
+    metadata: Dict[str, Any],
+    png_bytes: bytes,
+) -> Dict[str, str]:
+    """
+    Assign a watermark_id and write the metadata to `store`, indexed by the
+    output's content hash, the embedded payload's hash and, for the raw-pixel
+    scheme, the LSB layer's fragile hash.
+    """
+
+    metadata["watermark_id"] = new_watermark_id()
+    content_sha256 = hashlib.sha256(png_bytes).hexdigest()
+    lsb = metadata.get("robust_metadata", metadata)
+    fragile_hash = lsb.get("fragile_hash") if lsb.get("fragile_hash_version") == FRAGILE_HASH_RAW_BLAKE2B else None
+    # Inside a caller's batch() the write joins that transaction
+    with stage("metadata_store"), open_store(store) as opened, opened.batch():
+        opened.put(
+            MetadataRecord(
+                watermark_id=metadata["watermark_id"],
+                mode=mode,
+                metadata=metadata,
+                user_key_hash=metadata.get("user_key_hash"),
+                content_sha256=content_sha256,
+                payload_sha256=payload_digest(metadata["user_payload"]),
+                fragile_hash=fragile_hash,
+            )
+        )
+    return {"watermark_id": metadata["watermark_id"], "content_sha256": content_sha256}
+
+
+@with_timings
+def embed_bytes(
+    data: bytes,
+    message: str = "",
+    mode: str = "hybrid",
+    user_key: Optional[str] = None,
+    tenant_seed: bool = False,
+    store: Union[MetadataStore, str, None] = None,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    In-memory embed for encoded images: takes the uploaded file bytes and returns
+    the watermarked PNG bytes, metadata dict and heatmap PNG bytes. With a
+    `store`, the metadata is also recorded there (see `embed_image`).
+    """
+
+    mode, wm_rgb, metadata, heatmap, png_bytes = _embed(
+        _decode_rgb(data), message, mode, user_key, tenant_seed, encode=True, in_place=True
+    )
+    if png_bytes is None:
+        png_bytes = _encode_png(wm_rgb, in_place=True)
+    result = {
+        "mode": mode,
+        "image_bytes": png_bytes,
+        "metadata": metadata,
+        "heatmap_bytes": _encode_png(heatmap.astype(np.uint8, copy=False)) if heatmap is not None else None,
+    }
+    if store is not None:
+        result.update(_record_embed(store, mode, metadata, png_bytes))
+    return result
+
+
+@with_timings
+def embed_image(
+    image_path: str,
+    message: str = "",
+    mode: str = "hybrid",
+    user_key: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    tenant_seed: bool = False,
+    store: Union[MetadataStore, str, None] = None,
+    write_sidecar: bool = True,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    High-level embed wrapper that routes to the correct pipeline based on `mode`.
+
+    With a `store` (a MetadataStore or SQLite path) the metadata is recorded
+    there under a new `watermark_id` and the output's content hash; the JSON
+    sidecar then becomes an optional export (`write_sidecar`). The metadata is
+    also returned as `metadata`. With
+    `timings=True` the result gains a `timings` block: total seconds, image
+    megapixels and exclusive seconds per stage (decode, color_convert, dwt,
+    svd, idwt, lsb, fragile_hash, png_encode, file_io, sidecar_write, ...).
+    """
+
+    mode = _normalize_mode(mode)
+
+    image_path = Path(image_path).expanduser().resolve()
+    if not image_path.exists():
+        raise FileNotFoundError(f"Input image not found: {image_path}")
+
+    out_dir = Path(output_dir).expanduser().resolve() if output_dir else image_path.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    base_name = f"{image_path.stem}_{mode}"
+    final_image_path = out_dir / f"{base_name}.png"
+    metadata_path = out_dir / f"{base_name}_metadata.json"
+
+    if store is None and not write_sidecar:
+        raise ValueError("write_sidecar=False needs a metadata store to record the metadata.")
+
+    with stage("file_io"):
+        data = image_path.read_bytes()
+    mode, wm_rgb, metadata, heatmap, png_bytes = _embed(
+        _decode_rgb(data), message, mode, user_key, tenant_seed, encode=True, in_place=True
+    )
+    if png_bytes is None:
+        png_bytes = _encode_png(wm_rgb, in_place=True)
+    with stage("file_io"):
+        final_image_path.write_bytes(png_bytes)
+
+    result = {
+        "mode": mode,
+        "image_path": str(final_image_path),
+        "metadata_path": str(metadata_path) if write_sidecar else None,
+        "metadata": metadata,
+    }
+
+    if heatmap is not None:
+        heatmap_path = out_dir / f"{base_name}_heatmap.png"
+        heatmap_png = _encode_png(heatmap.astype(np.uint8, copy=False))
+        with stage("file_io"):
+            heatmap_path.write_bytes(heatmap_png)
+        metadata["heatmap_path"] = str(heatmap_path)
+        result["heatmap_path"] = str(heatmap_path)
+
+    if store is not None:
+        result.update(_record_embed(store, mode, metadata, png_bytes))
+
+    if write_sidecar:
+        _write_json(metadata_path, metadata)
+    return result
+
+
+def _verify(
+    frame: DecodedFrame,
+    metadata: Dict[str, Any],
+    mode: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Core in-memory verify. Every layer reads from the same decoded frame, so a
+    request pays for one decode whatever the mode.
+    """
+
+    result = _verify_layers(frame, metadata, mode)
+    if frame.decoded_shape is not None:
+        note_shape(frame.decoded_shape)
+    return result
+
+
+def _verify_layers(
+    frame: DecodedFrame,
+    metadata: Dict[str, Any],
+    mode: Optional[str],
+) -> Dict[str, Any]:
+    resolved_mode = _normalize_mode(mode or metadata.get("profile_mode", "hybrid"))
+
+    if resolved_mode == "robust":
+        verifier = HybridMultiDomainVerifierDet()
+        report = verifier.verify_array(frame, metadata)
+        return {"mode": "robust", "robust_report": report}
+
+    if resolved_mode == "semi_fragile":
+        semi_metadata = metadata.get("semi_metadata")
+        if semi_metadata is None:
+            raise ValueError("Semi-fragile metadata missing from metadata file.")
+
+        verify_params = _verify_params(semi_metadata.get("params", {}))
+        verifier = SemiFragileVerifierDwtSvd(params=verify_params)
+        report = verifier.verify(frame, semi_metadata)
+        return {"mode": "semi_fragile", "semi_fragile_report": report}
+
+    if resolved_mode == "fragile":
+        raise NotImplementedError(
+            "Fragile profile verification hooks are not implemented yet. "
+            "Tighten semi-fragile thresholds to emulate fragile behaviour."
+        )
+
+    # Hybrid
+    semi_metadata = metadata.get("semi_metadata")
+    robust_metadata = metadata.get("robust_metadata")
+    if semi_metadata is None or robust_metadata is None:
+        raise ValueError("Hybrid metadata must include semi and robust components.")
+
+    # Use parameters from metadata for hybrid verification (backward compatible)
+    # Check both semi_metadata.params and top-level params for backward compatibility
+    params_dict = semi_metadata.get("params", {})
+    if not params_dict and "params" in metadata:
+        params_dict = metadata.get("params", {})
+    semi_report = SemiFragileVerifierDwtSvd(params=_verify_params(params_dict)).verify(frame, semi_metadata)
+
+    robust_report = HybridMultiDomainVerifierDet().verify_array(frame, robust_metadata)
+
+    return {
+        "mode": "hybrid",
+        "semi_fragile_report": semi_report,
+        "robust_report": robust_report,
+    }
+
+
+@with_timings
+def verify_array(
+    image: ImageInput,
+    metadata: Dict[str, Any],
+    mode: Optional[str] = None,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    In-memory verify: checks an RGB uint8 array, PIL image or already decoded
+    DecodedFrame against a metadata dict.
+    """
+
+    frame = image if isinstance(image, DecodedFrame) else DecodedFrame.from_rgb(_as_rgb_array(image))
+    return _verify(frame, metadata, mode)
+
+
+@with_timings
+def verify_bytes(
+    data: bytes,
+    metadata: Dict[str, Any],
+    mode: Optional[str] = None,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    In-memory verify for encoded images (PNG/JPEG/... file bytes).
+    """
+
+    return _verify(DecodedFrame.from_bytes(data), metadata, mode)
+
+
+def _fragile_hash_matches(frame: DecodedFrame, metadata: Dict[str, Any], hashes: Dict[int, str]) -> bool:
+    robust = metadata.get("robust_metadata", metadata)
+    expected = robust.get("fragile_hash")
+    if expected is None:
+        return False
+    version = robust.get("fragile_hash_version", FRAGILE_HASH_PNG_SHA256)
+    if version not in hashes:
+        bgr = frame.bgr
+        with stage("fragile_hash"):
+            hashes[version] = compute_fragile_hash(bgr, version)
+    return hashes[version] == expected
+
+
+@with_timings
+def verify_blind_bytes(
+    data: bytes,
+    store: Union[MetadataStore, str],
+    mode: Optional[str] = None,
+    max_candidates: int = 16,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    Verify an image that arrives without its metadata.
+
+    Records are looked up in order of specificity: the file's content hash
+    (an unmodified copy of an embed's output), then the raw-pixel fragile hash
+    (the same pixels, re-encoded), then the hash of the `[length][payload]`
+    header read from the luma LSBs. A payload shared by several embeds is
+    narrowed down by their fragile hashes; if none matches these pixels,
+    `WatermarkAmbiguous` is raised rather than guessing. The report gains
+    `watermark_id`, `matched_by` and `candidate_count`.
+    """
+
+    frame = DecodedFrame.from_bytes(data)
+    hashes: Dict[int, str] = {}
+    with stage("metadata_store"), open_store(store) as opened:
+        candidates = opened.find_by_content_hash(hashlib.sha256(data).hexdigest())
+        matched_by = "content_hash"
+        if not candidates:
+            bgr = frame.bgr
+            with stage("fragile_hash"):
+                hashes[FRAGILE_HASH_RAW_BLAKE2B] = compute_fragile_hash(bgr, FRAGILE_HASH_RAW_BLAKE2B)
+            candidates = opened.find_by_fragile_hash(hashes[FRAGILE_HASH_RAW_BLAKE2B], limit=max_candidates)
+            matched_by = "fragile_hash"
+        if not candidates:
+            payload = HybridMultiDomainVerifierDet().read_payload(frame)
+            if payload is None:
+                raise WatermarkNotFound("No readable watermark header; blind verification needs the LSB payload.")
+            candidates = opened.find_by_payload_hash(payload_digest(payload), limit=max_candidates)
+            matched_by = "payload"
+    if not candidates:
+        raise WatermarkNotFound("Watermark payload does not match any metadata record.")
+
+    record = candidates[0]
+    if matched_by == "payload" and len(candidates) > 1:
+        # Only records without an indexed fragile hash (legacy PNG scheme) can still match here
+        record = next((c for c in candidates if _fragile_hash_matches(frame, c.metadata, hashes)), None)
+        if record is None:
+            raise WatermarkAmbiguous(
+                f"{len(candidates)} embeds carry this payload and none matches the image's pixels.",
+                [c.watermark_id for c in candidates],
+            )
+    result = _verify(frame, record.metadata, mode)
+    result.update(
+        {"watermark_id": record.watermark_id, "matched_by": matched_by, "candidate_count": len(candidates)}
+    )
+    return result
+
+
+@with_timings
+def verify_image(
+    image_path: str,
+    metadata_path: Optional[str] = None,
+    mode: Optional[str] = None,
+    store: Union[MetadataStore, str, None] = None,
+    watermark_id: Optional[str] = None,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    """
+    High-level verify wrapper that routes to the correct pipeline based on `mode`.
+
+    Without a `metadata_path`, the metadata is read from `store`: by
+    `watermark_id` when given, otherwise blindly via `verify_blind_bytes`.
+    `timings=True` adds a `timings` block, as for `embed_image`.
+    """
+
+    image_path = Path(image_path).expanduser().resolve()
+    if not image_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    if metadata_path is not None:
+        metadata_path = Path(metadata_path).expanduser().resolve()
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"Metadata not found: {metadata_path}")
+        with stage("file_io"):
+            data = image_path.read_bytes()
+        return verify_bytes(data, load_metadata(metadata_path), mode=mode)
+
+    if store is None:
+        raise ValueError("Provide metadata_path or a metadata store.")
+
+    with stage("file_io"):
+        data = image_path.read_bytes()
+    if watermark_id is None:
+        return verify_blind_bytes(data, store, mode=mode)
+
+    with stage("metadata_store"), open_store(store) as opened:
+        record = opened.get(watermark_id)
+    if record is None:
+        raise WatermarkNotFound(f"No metadata record found for watermark_id {watermark_id}.")
+
+    result = verify_bytes(data, record.metadata, mode=mode)
+    result["watermark_id"] = record.watermark_id
+    return result
+
+
+def load_metadata(metadata_path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Load a metadata sidecar, inlining the robust metadata of legacy hybrid
+    sidecars that point at a separate *_robust.json.
+    """
+
+    with stage("sidecar_read"):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        robust_metadata_path = metadata.get("robust_metadata_path")
+        if robust_metadata_path is not None and "robust_metadata" not in metadata:
+            with open(robust_metadata_path, "r", encoding="utf-8") as f:
+                metadata["robust_metadata"] = json.load(f)
+    return metadata
@@ -0,0 +1,50 @@
+import json
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.workers import WorkerPool
+from tests.support import write_png
+
+
+def _ndjson(response):
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_batch_matches_single_item_endpoints():
+    app_module.worker_pool = WorkerPool.from_env({"MODEL_SERVICE_BACKEND": "thread", "MODEL_SERVICE_EMBED_WORKERS": "2"})
+
+    with tempfile.TemporaryDirectory() as tmp, TestClient(app_module.app) as client:
+        src = write_png(tmp)
+
+        jobs = [
+            {"image_path": str(src), "message": "owner", "mode": "robust", "output_dir": str(Path(tmp) / "a")},
+            {"image_path": str(Path(tmp) / "missing.png"), "message": "owner"},
+            {"image_path": str(src), "message": "owner", "mode": "semi_fragile", "output_dir": str(Path(tmp) / "b")},
+        ]
+        lines = _ndjson(client.post("/embed/batch", json={"jobs": jobs, "concurrency": 2}))
+        assert sorted(line["index"] for line in lines) == [0, 1, 2]
+        by_index = {line["index"]: line for line in lines}
+
+        # A bad job is reported on its own line and does not sink the batch
+        assert by_index[1]["success"] is False and by_index[1]["status_code"] == 400
+        assert by_index[0]["success"] and by_index[2]["success"]
+
+        verify_jobs = [
+            {"image_path": by_index[i]["data"]["image_path"], "metadata_path": by_index[i]["data"]["metadata_path"]}
+            for i in (0, 2)
+        ]
+        batch = _ndjson(client.post("/verify/batch", json={"jobs": verify_jobs}))
+        for line in batch:
+            single = client.post("/verify", json=verify_jobs[line["index"]]).json()
+            assert line["success"] and line["data"] == single["data"]
+
+        assert client.post("/verify/batch", json={"jobs": []}).status_code == 422
+
+
+if __name__ == "__main__":
+    test_batch_matches_single_item_endpoints()
+    print("✅ Batch endpoint tests passed")
@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import json
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.uploads import METADATA_HEADER, decode_metadata_header
+from api.workers import WorkerPool
+from tests.support import gradient_rgb, png_bytes
+
+
+def test_multipart_and_raw_roundtrip():
+    app_module.worker_pool = WorkerPool.from_env({"MODEL_SERVICE_BACKEND": "thread"})
+    data = png_bytes(gradient_rgb())
+
+    with TestClient(app_module.app) as client:
+        # Multipart embed, PNG body back with metadata in a header
+        embedded = client.post(
+            "/v2/embed",
+            files={"image": ("input.png", data, "image/png")},
+            data={"message": "owner", "mode": "hybrid", "user_key": "tenant"},
+        )
+        assert embedded.status_code == 200, embedded.text
+        assert embedded.headers["content-type"] == "image/png"
+        # The header describes the returned PNG, not the upload
+        assert embedded.headers["x-content-sha256"] == hashlib.sha256(embedded.content).hexdigest()
+        metadata = decode_metadata_header(embedded.headers[METADATA_HEADER])
+        assert metadata["profile_mode"] == "hybrid"
+
+        # Raw-body verify with the metadata header handed straight back
+        verified = client.post(
+            "/v2/verify",
+            content=embedded.content,
+            headers={"content-type": "image/png", METADATA_HEADER: embedded.headers[METADATA_HEADER]},
+        )
+        assert verified.status_code == 200, verified.text
+        body = verified.json()
+        assert body["content_sha256"] == hashlib.sha256(embedded.content).hexdigest()
+        assert body["data"]["robust_report"]["verdict"] == "AUTHENTIC"
+
+        # Multipart verify with a metadata file part gives the same report
+        again = client.post(
+            "/v2/verify",
+            files={
+                "image": ("wm.png", embedded.content, "image/png"),
+                "metadata": ("metadata.json", json.dumps(metadata), "application/json"),
+            },
+        )
+        assert again.json()["data"] == body["data"]
+
+        # Raw-body embed with query parameters and a JSON response
+        as_json = client.post(
+            "/v2/embed?message=owner&mode=semi_fragile&response=json",
+            content=data,
+            headers={"content-type": "application/octet-stream"},
+        ).json()["data"]
+        assert as_json["mode"] == "semi_fragile" and as_json["heatmap_base64"]
+        image = base64.b64decode(as_json["image_base64"])
+        assert image.startswith(b"\x89PNG")
+        assert as_json["content_sha256"] == hashlib.sha256(image).hexdigest()
+
+        assert client.post("/v2/verify", content=data, headers={"content-type": "image/png"}).status_code == 400
+        assert client.post("/v2/embed", content=b"").status_code == 400
+
+
+if __name__ == "__main__":
+    test_multipart_and_raw_roundtrip()
+    print("✅ Upload endpoint tests passed")
@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+
+from tests.support import gradient_rgb
+from training import attack_graph as ag
+from training.attack_graph import AttackGraph
+from training.attacks import AttackSimulator
+
+
+def _image(h=900, w=1500):
+    rng = np.random.default_rng(7)
+    base = gradient_rgb(h, w)
+    return np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+
+
+def test_social_chains_match_pipelines():
+    img = _image()
+    graph = AttackGraph({
+        "whatsapp": ag.social(1280, 80),
+        "instagram": ag.social(1080, 85),
+        "twitter": ag.social(1600, 85),
+        "tiktok": ag.social(1080, 80),
+    })
+    out = graph.evaluate(img)
+    assert np.array_equal(out["whatsapp"], AttackSimulator.pipeline_whatsapp(img))
+    assert np.array_equal(out["instagram"], AttackSimulator.pipeline_instagram(img))
+    assert np.array_equal(out["twitter"], AttackSimulator.pipeline_twitter(img))
+    assert np.array_equal(out["tiktok"], AttackSimulator.pipeline_tiktok(img))
+    assert out["twitter"].shape == img.shape
+
+
+def test_shared_prefix_runs_once():
+    qualities = [95, 85, 70, 50, 30]
+    graph = AttackGraph({f"down_q{q}": (ag.downscale(720), ag.jpeg(q)) for q in qualities})
+    assert graph.num_ops == 1 + len(qualities)
+    assert graph.num_chain_ops == 2 * len(qualities)
+
+    calls = []
+    original = AttackSimulator.downscale
+
+    def counting_downscale(img, max_side=1280):
+        calls.append(max_side)
+        return original(img, max_side)
+
+    AttackSimulator.downscale = staticmethod(counting_downscale)
+    try:
+        out = graph.evaluate(_image(), workers=3)
+    finally:
+        AttackSimulator.downscale = staticmethod(original)
+
+    assert calls == [720]
+    for q in qualities:
+        expected = AttackSimulator.jpeg_compression(original(_image(), 720), q)
+        assert np.array_equal(out[f"down_q{q}"], expected)
+
+
+def test_parallel_matches_serial_in_attack_order():
+    img = _image(400, 600)
+    attacks = {
+        "identity": (),
+        "blur": (ag.blur(5),),
+        "blur_jpeg": (ag.blur(5), ag.jpeg(70)),
+        "rot_crop": (ag.rotate(15), ag.crop(0.1)),
+        "gamma": (ag.gamma(1.2),),
+        "resize": (ag.resize(0.5),),
+    }
+    graph = AttackGraph(attacks)
+    seen = []
+    lock = threading.Lock()
+
+    def consume(name, out):
+        with lock:
+            seen.append(name)
+        return name, out
+
+    serial = graph.run(img, consume, workers=1)
+    parallel = graph.run(img, consume, workers=4)
+    assert [name for name, _ in parallel] == list(attacks)
+    assert sorted(seen) == sorted(list(attacks) * 2)
+    for (_, a), (_, b) in zip(serial, parallel):
+        assert np.array_equal(a, b)
+    assert serial[0][1] is img
+
+
+def test_op_errors_propagate():
+    graph = AttackGraph({"bad": (ag.Op("no_such_attack"),), "ok": (ag.blur(3),)})
+    for workers in (1, 2):
+        try:
+            graph.evaluate(_image(64, 64), workers=workers)
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("unknown op should raise")
+
+
+if __name__ == "__main__":
+    test_social_chains_match_pipelines()
+    test_shared_prefix_runs_once()
+    test_parallel_matches_serial_in_attack_order()
+    test_op_errors_propagate()
+    print("✅ Attack graph tests passed")
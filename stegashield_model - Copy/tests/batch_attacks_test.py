@@ -0,0 +1,70 @@
+import numpy as np
+
+from training.attacks import AttackSimulator, BatchAttackSimulator
+
+
+def _stack(n=5, h=48, w=64):
+    return np.random.default_rng(1).integers(0, 256, (n, h, w, 3), dtype=np.uint8)
+
+
+def _per_image(func, stack, **params):
+    return np.stack([func(img, **params) for img in stack])
+
+
+def test_batched_kernels_match_per_image():
+    stack = _stack()
+    B, A = BatchAttackSimulator, AttackSimulator
+    for alpha, beta in [(1.0, 25), (1.0, -25), (1.1, 0), (0.9, 0)]:
+        expected = _per_image(A.brightness_contrast, stack, alpha=alpha, beta=beta)
+        assert np.array_equal(B.brightness_contrast(stack, alpha=alpha, beta=beta), expected)
+    for g in (0.8, 1.2):
+        assert np.array_equal(B.gamma(stack, gamma=g), _per_image(A.gamma, stack, gamma=g))
+    for workers in (1, 3):
+        assert np.array_equal(B.blur(stack, 5, workers=workers), _per_image(A.blur, stack, kernel_size=5))
+        assert np.array_equal(
+            B.jpeg_compression(stack, 70, workers=workers), _per_image(A.jpeg_compression, stack, quality=70)
+        )
+    assert np.array_equal(B.map(A.rotate, stack, workers=2, angle=15), _per_image(A.rotate, stack, angle=15))
+
+
+def test_gamma_matches_legacy_table():
+    img = _stack(1)[0]
+    for g in (0.8, 1.2, 2.2):
+        inv_gamma = 1.0 / g
+        table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype("uint8")
+        assert np.array_equal(AttackSimulator.gamma(img, g), table[img])
+
+
+def test_seeded_noise_is_reproducible_and_chunk_independent():
+    stack = np.full((6, 64, 64, 3), 128, dtype=np.uint8)
+    batched = BatchAttackSimulator.noise(stack, 10.0, rng=np.random.default_rng(42))
+    assert np.array_equal(batched, BatchAttackSimulator.noise(stack, 10.0, rng=np.random.default_rng(42)))
+    assert not np.array_equal(batched, BatchAttackSimulator.noise(stack, 10.0, rng=np.random.default_rng(43)))
+
+    original = BatchAttackSimulator.NOISE_CHUNK
+    BatchAttackSimulator.NOISE_CHUNK = stack[0].size * 2
+    try:
+        chunked = BatchAttackSimulator.noise(stack, 10.0, rng=np.random.default_rng(42))
+    finally:
+        BatchAttackSimulator.NOISE_CHUNK = original
+    assert np.array_equal(chunked, batched)
+
+    delta = batched.astype(np.float64) - 128
+    assert abs(delta.mean()) < 0.6 and 9.0 < delta.std() < 11.0
+
+
+def test_rejects_non_stacks():
+    try:
+        BatchAttackSimulator.gamma(_stack(1)[0], 1.2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a single HxWx3 image should be rejected")
+
+
+if __name__ == "__main__":
+    test_batched_kernels_match_per_image()
+    test_gamma_matches_legacy_table()
+    test_seeded_noise_is_reproducible_and_chunk_independent()
+    test_rejects_non_stacks()
+    print("✅ Batched attack kernel tests passed")
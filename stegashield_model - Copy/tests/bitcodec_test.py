@@ -0,0 +1,60 @@
+import numpy as np
+
+from models.semi_fragile_dwt_svd import _bits_to_message, _message_to_bits
+from utils.bitcodec import bits_to_bytes, bytes_to_bits, embed_lsb, extract_lsb
+
+
+def _legacy_bytes_to_bits(data: bytes):
+    return [(byte >> (7 - i)) & 1 for byte in data for i in range(8)]
+
+
+def _legacy_bits_to_bytes(bits):
+    if len(bits) % 8 != 0:
+        bits = bits + [0] * (8 - len(bits) % 8)
+    out = bytearray()
+    for i in range(0, len(bits), 8):
+        byte = 0
+        for j in range(8):
+            byte = (byte << 1) | (bits[i + j] & 1)
+        out.append(byte)
+    return bytes(out)
+
+
+def test_bit_packing_matches_legacy_loops():
+    rng = np.random.default_rng(0)
+    for n in (0, 1, 4, 37, 256):
+        data = rng.integers(0, 256, n, dtype=np.uint8).tobytes()
+        bits = bytes_to_bits(data)
+        assert bits.tolist() == _legacy_bytes_to_bits(data)
+        assert bits_to_bytes(bits) == data
+        # Partial trailing byte is zero-padded like the legacy packer
+        assert bits_to_bytes(bits[:-3]) == _legacy_bits_to_bytes(bits[:-3].tolist())
+
+
+def test_message_roundtrip_with_fixed_length():
+    msg = "StegaShield|ключ"
+    bits = _message_to_bits(msg)
+    n_bytes = len(msg.encode("utf-8"))
+    assert _bits_to_message(bits, n_bytes) == msg
+    # Missing bits decode as zero bytes rather than raising
+    assert _bits_to_message(bits[:8], 3) == msg[0] + "\x00\x00"
+
+
+def test_lsb_embed_and_extract_in_place():
+    rng = np.random.default_rng(1)
+    plane = rng.integers(0, 256, (40, 50), dtype=np.uint8)
+    original = plane.copy()
+    bits = bytes_to_bits(b"\x00\x00\x00\x05hello")
+
+    embed_lsb(plane, bits)
+    assert np.array_equal(extract_lsb(plane, bits.size), bits)
+    assert np.array_equal(plane.reshape(-1)[bits.size:], original.reshape(-1)[bits.size:])
+    assert np.all((plane.astype(int) - original).reshape(-1)[: bits.size] ** 2 <= 1)
+    assert extract_lsb(plane, 10 ** 9).size == plane.size
+
+
+if __name__ == "__main__":
+    test_bit_packing_matches_legacy_loops()
+    test_message_roundtrip_with_fixed_length()
+    test_lsb_embed_and_extract_in_place()
+    print("✅ Bit codec tests passed")
@@ -0,0 +1,152 @@
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from models.hybrid_multidomain_embed_det import LSB_VERSION_PIL_LUMA, HybridMultiDomainEmbedderDet
+from models.hybrid_multidomain_verify_det import HybridMultiDomainVerifierDet
+from stegashield_profiles import embed_bytes, verify_blind_bytes, verify_image
+from tests.support import gradient_rgb, png_bytes
+from utils.frame import DecodedFrame
+from utils.metadata_store import SQLiteMetadataStore, WatermarkAmbiguous, WatermarkNotFound
+
+
+def test_lsb_payload_reads_back_exactly():
+    textured = np.random.default_rng(0).integers(0, 256, (600, 800, 3), dtype=np.uint8)
+    for image in (gradient_rgb(), textured, np.zeros((64, 64, 3), np.uint8), np.full((64, 64, 3), 255, np.uint8)):
+        message = "owner|8254c329a92850f6d539dd376f4816ee"
+        wm, metadata, _ = HybridMultiDomainEmbedderDet().embed_array(image, message)
+        frame = DecodedFrame.from_bytes(png_bytes(wm))
+        verifier = HybridMultiDomainVerifierDet()
+        assert verifier.read_payload(frame) == message.encode("utf-8")
+        assert verifier.verify_array(frame, metadata)["decoded_message"] == message
+        assert np.abs(wm.astype(int) - image).max() <= 4
+        assert metadata["lsb_version"] == 2
+
+    # Version 1 skips the parity alignment, so its pixels stay exactly as PIL merged them
+    legacy, metadata, _ = HybridMultiDomainEmbedderDet(lsb_version=LSB_VERSION_PIL_LUMA).embed_array(gradient_rgb(), "owner")
+    assert metadata["lsb_version"] == 1
+    assert not np.array_equal(legacy, HybridMultiDomainEmbedderDet().embed_array(gradient_rgb(), "owner")[0])
+
+
+def test_blind_lookup_picks_the_matching_embed():
+    store = SQLiteMetadataStore()
+    first = embed_bytes(png_bytes(gradient_rgb()), message="owner", mode="hybrid", user_key="tenant", store=store)
+    second = embed_bytes(png_bytes(gradient_rgb(shift=30)), message="owner", mode="hybrid", user_key="tenant", store=store)
+
+    # Byte-identical output is found by content hash
+    exact = verify_blind_bytes(first["image_bytes"], store)
+    assert exact["matched_by"] == "content_hash" and exact["watermark_id"] == first["watermark_id"]
+
+    # Same pixels, different encoding: found through the indexed fragile hash
+    pixels = np.array(Image.open(io.BytesIO(first["image_bytes"])).convert("RGB"))
+    blind = verify_blind_bytes(png_bytes(pixels, compress_level=1), store)
+    assert blind["matched_by"] == "fragile_hash" and blind["candidate_count"] == 1
+    assert blind["watermark_id"] == first["watermark_id"]
+    assert blind["robust_report"]["verdict"] == "AUTHENTIC"
+    assert blind["semi_fragile_report"]["bit_accuracy"] >= 0.98
+
+    other = np.array(Image.open(io.BytesIO(second["image_bytes"])).convert("RGB"))
+    assert verify_blind_bytes(png_bytes(other, compress_level=1), store)["watermark_id"] == second["watermark_id"]
+
+    # Edited pixels: the payload alone identifies a unique embed, but not one of two
+    solo = embed_bytes(png_bytes(gradient_rgb(shift=60)), message="solo", mode="hybrid", user_key="tenant", store=store)
+    edited = np.array(Image.open(io.BytesIO(solo["image_bytes"])).convert("RGB"))
+    edited[-40:, -40:] = 0
+    by_payload = verify_blind_bytes(png_bytes(edited), store)
+    assert by_payload["matched_by"] == "payload" and by_payload["candidate_count"] == 1
+    assert by_payload["watermark_id"] == solo["watermark_id"]
+
+    pixels[-40:, -40:] = 0
+    try:
+        verify_blind_bytes(png_bytes(pixels), store)
+        raise AssertionError("an edited copy of a shared payload should be ambiguous")
+    except WatermarkAmbiguous as exc:
+        assert sorted(exc.candidates) == sorted([first["watermark_id"], second["watermark_id"]])
+
+    try:
+        verify_blind_bytes(png_bytes(gradient_rgb()), store)
+        raise AssertionError("unwatermarked image should not match")
+    except WatermarkNotFound:
+        pass
+
+    # Fewer than 32 luma pixels cannot hold the length header
+    tiny = png_bytes(gradient_rgb(3, 5))
+    assert HybridMultiDomainVerifierDet().read_payload(DecodedFrame.from_bytes(tiny)) is None
+    try:
+        verify_blind_bytes(tiny, store)
+        raise AssertionError("an image too small for the header should not match")
+    except WatermarkNotFound:
+        pass
+
+
+def test_verify_image_and_api_without_sidecar():
+    from fastapi.testclient import TestClient
+    import api.app as app_module
+    from api.workers import WorkerPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "meta.db")
+        app_module.worker_pool = WorkerPool.from_env({"MODEL_SERVICE_BACKEND": "thread"})
+        app_module.METADATA_DB = db
+        try:
+            with TestClient(app_module.app) as client:
+                embedded = client.post("/v2/embed?message=owner&mode=robust", content=png_bytes(gradient_rgb()))
+                watermark_id = embedded.headers["x-stegashield-watermark-id"]
+
+                pixels = np.array(Image.open(io.BytesIO(embedded.content)).convert("RGB"))
+                suspect = Path(tmp) / "repost.png"
+                suspect.write_bytes(png_bytes(pixels, compress_level=1))
+
+                body = client.post("/v2/verify", content=suspect.read_bytes()).json()
+                assert body["data"]["watermark_id"] == watermark_id
+                assert body["data"]["robust_report"]["verdict"] == "AUTHENTIC"
+                assert client.post("/v2/verify", content=png_bytes(gradient_rgb())).status_code == 404
+
+                # Metadata missing a key (a KeyError inside the verifier) is a failure, not "not found"
+                from api.uploads import METADATA_HEADER, encode_metadata_header
+
+                broken = client.post(
+                    "/v2/verify",
+                    content=suspect.read_bytes(),
+                    headers={METADATA_HEADER: encode_metadata_header({"profile_mode": "semi_fragile", "semi_metadata": {}})},
+                )
+                assert broken.status_code == 500
+        finally:
+            app_module.METADATA_DB = None
+
+        assert verify_image(str(suspect), store=db)["watermark_id"] == watermark_id
+        try:
+            verify_image(str(suspect), store=db, watermark_id="missing")
+            raise AssertionError("unknown watermark_id should not match")
+        except WatermarkNotFound:
+            pass
+
+
+def test_old_databases_gain_the_payload_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "old.db"
+        conn = sqlite3.connect(db)
+        conn.execute(
+            "CREATE TABLE watermarks (watermark_id TEXT PRIMARY KEY, mode TEXT NOT NULL, user_key_hash TEXT, "
+            "content_sha256 TEXT, created_at REAL NOT NULL, metadata TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO watermarks VALUES ('old', 'robust', NULL, NULL, 0, '{}')")
+        conn.commit()
+        conn.close()
+
+        with SQLiteMetadataStore(db) as store:
+            assert store.get("old").payload_sha256 is None and store.get("old").fragile_hash is None
+            assert store.find_by_payload_hash("missing") == []
+            assert store.find_by_fragile_hash("missing") == []
+
+
+if __name__ == "__main__":
+    test_lsb_payload_reads_back_exactly()
+    test_blind_lookup_picks_the_matching_embed()
+    test_verify_image_and_api_without_sidecar()
+    test_old_databases_gain_the_payload_index()
+    print("✅ Blind verification tests passed")
@@ -0,0 +1,108 @@
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from tests.support import REPO_ROOT, gradient_rgb, write_png
+
+
+def _save_images(directory: Path, count: int = 3):
+    for i in range(count):
+        write_png(directory, gradient_rgb(480, 640, shift=20 * i), f"img{i}.png")
+
+
+def _cli(*args, stdin=None):
+    return subprocess.run(
+        [sys.executable, str(REPO_ROOT / "cli.py"), *args],
+        input=stdin,
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+    )
+
+
+def test_serve_answers_each_line_in_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        _save_images(tmp, 1)
+        out = tmp / "out"
+        jobs = [
+            {"id": "e", "command": "embed", "image": str(tmp / "img0.png"), "message": "owner", "output_dir": str(out)},
+            # The embed above writes these deterministic paths before this job runs
+            {
+                "id": "v",
+                "command": "verify",
+                "image": str(out / "img0_hybrid.png"),
+                "metadata": str(out / "img0_hybrid_metadata.json"),
+            },
+            {"id": "bad", "command": "verify", "image": str(out / "img0_hybrid.png")},
+            {
+                "id": "store",
+                "command": "embed",
+                "image": str(tmp / "img0.png"),
+                "message": "owner",
+                "mode": "robust",
+                "output_dir": str(out),
+                "store": str(tmp / "meta.db"),
+                "no_sidecar": True,
+            },
+        ]
+        stdin = "\n".join(json.dumps(job) for job in jobs) + "\nnot json\n\n"
+        proc = _cli("serve", stdin=stdin)
+        assert proc.returncode == 0, proc.stderr
+
+        lines = [json.loads(line) for line in proc.stdout.splitlines()]
+        assert [line.get("id") for line in lines] == ["e", "v", "bad", "store", None]
+        assert lines[0]["success"] and lines[0]["data"]["image_path"] == str(out / "img0_hybrid.png")
+        # Hybrid robust metadata is inline; there is no *_robust.json to point at
+        assert "robust_metadata" in lines[0]["data"]["metadata"]
+        assert "robust_metadata_path" not in lines[0]["data"]
+        assert lines[1]["data"]["robust_report"]["verdict"] == "AUTHENTIC"
+        assert not lines[2]["success"] and "metadata" in lines[2]["error"]
+        # Without a sidecar the metadata still comes back, straight from the embed
+        stored = lines[3]["data"]
+        assert stored["metadata_path"] is None and stored["metadata"]["watermark_id"] == stored["watermark_id"]
+        assert not lines[4]["success"]
+
+
+def test_batch_directory_and_manifest():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        _save_images(tmp)
+        out = tmp / "out"
+
+        proc = _cli("batch", "--manifest", str(tmp), "--message", "owner", "--output-dir", str(out), "--workers", "2")
+        assert proc.returncode == 0, proc.stderr
+        lines = [json.loads(line) for line in proc.stdout.splitlines()]
+        assert sorted(line["id"] for line in lines) == ["img0.png", "img1.png", "img2.png"]
+        assert all(line["success"] for line in lines)
+        assert "3/3 done, 3 ok, 0 failed" in proc.stderr
+
+        # Directory verify finds each image's sidecar; heatmaps are skipped
+        proc = _cli("batch", "--manifest", str(out), "--command", "verify", "--workers", "2")
+        lines = [json.loads(line) for line in proc.stdout.splitlines()]
+        assert len(lines) == 3 and all(line["data"]["robust_report"]["verdict"] == "AUTHENTIC" for line in lines)
+
+        # An NDJSON manifest with one failing job: ids default to the line index, exit status 1
+        manifest = tmp / "jobs.ndjson"
+        manifest.write_text(
+            json.dumps({"command": "embed", "image": str(tmp / "img0.png"), "message": "m", "mode": "robust", "output_dir": str(out)})
+            + "\n"
+            + json.dumps({"command": "embed", "image": str(tmp / "missing.png"), "message": "m"})
+            + "\n",
+            encoding="utf-8",
+        )
+        results = tmp / "results.ndjson"
+        proc = _cli("batch", "--manifest", str(manifest), "--workers", "1", "--output", str(results))
+        assert proc.returncode == 1
+        by_id = {line["id"]: line for line in map(json.loads, results.read_text(encoding="utf-8").splitlines())}
+        assert by_id[0]["success"] and by_id[0]["data"]["mode"] == "robust"
+        assert not by_id[1]["success"]
+        assert "2/2 done, 1 ok, 1 failed" in proc.stderr
+
+
+if __name__ == "__main__":
+    test_serve_answers_each_line_in_order()
+    test_batch_directory_and_manifest()
+    print("✅ CLI serve/batch tests passed")
@@ -0,0 +1,49 @@
+import numpy as np
+
+from models.hybrid_multidomain_embed_det import HybridMultiDomainEmbedderDet
+from models.hybrid_multidomain_verify_det import HybridMultiDomainVerifierDet
+from utils.fragile_hash import FRAGILE_HASH_PNG_SHA256, FRAGILE_HASH_RAW_BLAKE2B, compute_fragile_hash
+
+
+def _make_rgb(h: int = 120, w: int = 160) -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_raw_hash_covers_shape_and_pixels():
+    bgr = _make_rgb()
+    digest = compute_fragile_hash(bgr, FRAGILE_HASH_RAW_BLAKE2B)
+    assert digest == compute_fragile_hash(bgr.copy(), FRAGILE_HASH_RAW_BLAKE2B)
+    assert digest != compute_fragile_hash(bgr.reshape(160, 120, 3), FRAGILE_HASH_RAW_BLAKE2B)
+
+    tampered = bgr.copy()
+    tampered[5, 5, 0] ^= 1
+    assert digest != compute_fragile_hash(tampered, FRAGILE_HASH_RAW_BLAKE2B)
+
+
+def test_both_hash_versions_verify():
+    verifier = HybridMultiDomainVerifierDet()
+    for version in (FRAGILE_HASH_PNG_SHA256, FRAGILE_HASH_RAW_BLAKE2B):
+        wm_rgb, metadata, png_bytes = HybridMultiDomainEmbedderDet(fragile_hash_version=version).embed_array(
+            _make_rgb(), "owner"
+        )
+        assert metadata["fragile_hash_version"] == version
+        assert (png_bytes is not None) == (version == FRAGILE_HASH_PNG_SHA256)
+
+        bgr = np.ascontiguousarray(wm_rgb[:, :, ::-1])
+        assert verifier.verify_array(bgr, metadata)["fragile_match"] is True
+
+        tampered = bgr.copy()
+        tampered[-1, -1, 1] ^= 1
+        assert verifier.verify_array(tampered, metadata)["fragile_match"] is False
+
+    # Metadata written before versioning existed is checked with the PNG scheme
+    legacy = dict(metadata)
+    legacy["fragile_hash"] = compute_fragile_hash(bgr, FRAGILE_HASH_PNG_SHA256)
+    del legacy["fragile_hash_version"]
+    assert verifier.verify_array(bgr, legacy)["fragile_match"] is True
+
+
+if __name__ == "__main__":
+    test_raw_hash_covers_shape_and_pixels()
+    test_both_hash_versions_verify()
+    print("✅ Fragile hash tests passed")
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+import utils.frame as frame_module
+from stegashield_profiles import embed_bytes, verify_bytes
+from tests.support import gradient_rgb, png_bytes
+from utils.frame import DecodedFrame
+
+
+def test_views_match_per_layer_decoders():
+    rgb = np.random.default_rng(0).integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    frame = DecodedFrame.from_bytes(png_bytes(rgb))
+
+    assert np.array_equal(frame.rgb, rgb)
+    assert np.array_equal(frame.bgr, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    assert np.array_equal(frame.y, cv2.split(cv2.cvtColor(frame.bgr, cv2.COLOR_BGR2YCrCb))[0])
+    assert np.array_equal(frame.gray, np.array(Image.fromarray(rgb).convert("L"), dtype=np.float32))
+    # Views are cached, not recomputed
+    assert frame.gray is frame.gray and frame.y is frame.y
+
+
+def test_hybrid_verify_decodes_once():
+    embedded = embed_bytes(png_bytes(gradient_rgb()), message="owner", mode="hybrid")
+
+    calls = []
+    real_imdecode = frame_module.cv2.imdecode
+
+    def counting_imdecode(*args, **kwargs):
+        calls.append(1)
+        return real_imdecode(*args, **kwargs)
+
+    frame_module.cv2.imdecode = counting_imdecode
+    try:
+        report = verify_bytes(embedded["image_bytes"], embedded["metadata"])
+    finally:
+        frame_module.cv2.imdecode = real_imdecode
+
+    assert len(calls) == 1
+    assert report["robust_report"]["verdict"] == "AUTHENTIC"
+    assert report["semi_fragile_report"]["bit_accuracy"] >= 0.98
+
+
+if __name__ == "__main__":
+    test_views_match_per_layer_decoders()
+    test_hybrid_verify_decodes_once()
+    print("✅ Decoded frame tests passed")
@@ -0,0 +1,114 @@
+import csv
+import os
+import tempfile
+from pathlib import Path
+
+from tests.support import gradient_rgb, write_png
+from training.test_harness_det import TestHarness as Harness  # aliased so pytest does not try to collect it
+
+
+# Deterministic attacks only, so serial and parallel runs can be compared row for row
+ATTACKS = ["Identity", "JPEG_Q70", "Resize_0.5x", "Blur_k3", "Gamma_1.2", "WhatsApp_like"]
+
+
+def _make_inputs(root: Path, count: int = 3):
+    return [str(write_png(root, gradient_rgb(320, 384, shift=20 * i), f"img_{i}.png")) for i in range(count)]
+
+
+def _read_csv(path: Path):
+    with path.open(newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_parallel_run_matches_serial_and_resumes():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        images = _make_inputs(root)
+
+        serial = Harness(str(root / "serial"), attack_names=ATTACKS).run_batch(images)
+        harness = Harness(str(root / "parallel"), attack_names=ATTACKS)
+        parallel = harness.run_batch(images, workers=2, attack_threads=3)
+
+        rows = _read_csv(parallel)
+        assert rows == _read_csv(serial)
+        assert len(rows) == len(images) * len(ATTACKS) * 2
+        assert [r["attack"] for r in rows[:4]] == ["Identity", "Identity", "JPEG_Q70", "JPEG_Q70"]
+
+        # Drop one checkpoint: a rerun recomputes only that image and yields the same CSV
+        checkpoints = {p: harness._checkpoint_path(p) for p in images}
+        before = {p: c.stat().st_mtime_ns for p, c in checkpoints.items()}
+        checkpoints[images[1]].unlink()
+        assert _read_csv(harness.run_batch(images, workers=2)) == rows
+        after = {p: c.stat().st_mtime_ns for p, c in checkpoints.items()}
+        assert after[images[0]] == before[images[0]] and after[images[2]] == before[images[2]]
+        assert checkpoints[images[1]].exists()
+
+
+def test_checkpoint_key_covers_the_run_settings():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = str(Path(tmp) / "out")
+        base = Harness(out, attack_names=["Identity"])._checkpoint_path("img.png")
+        assert Harness(out, attack_names=["Identity"])._checkpoint_path("img.png") == base
+        variants = [
+            Harness(out, attack_names=["Identity", "Blur_k3"]),
+            Harness(out, attack_names=["Identity"], lsb_message="other"),
+            Harness(out, attack_names=["Identity"], semi_message="other"),
+            Harness(out, attack_names=["Identity"], persist_attacked="all"),
+        ]
+        tuned = Harness(out, attack_names=["Identity"])
+        tuned.semi_embedder.params.redundancy += 1
+        variants.append(tuned)
+        paths = {h._checkpoint_path("img.png") for h in variants}
+        assert base not in paths and len(paths) == len(variants)
+
+
+def test_failed_image_is_skipped_and_retried():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        images = _make_inputs(root, count=2)
+        broken = root / "broken.png"
+        broken.write_bytes(b"not an image")
+
+        harness = Harness(str(root / "out"), attack_names=["Identity"])
+        rows = _read_csv(harness.run_batch([images[0], str(broken), images[1]]))
+        assert {r["image_id"] for r in rows} == {"img_0.png", "img_1.png"}
+        assert not harness._checkpoint_path(str(broken)).exists()
+
+
+def test_in_memory_scoring_persists_only_failures():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        image = _make_inputs(root, count=1)[0]
+
+        legacy = Harness(str(root / "all"), attack_names=ATTACKS, persist_attacked="all")
+        rows = legacy.run_single(image)
+        assert len(os.listdir(legacy.tampered_dir)) == len(ATTACKS) * 2
+
+        failures = Harness(str(root / "failures"), attack_names=ATTACKS)
+        assert failures.run_single(image) == rows
+        saved = set(os.listdir(failures.tampered_dir))
+        # The identity re-encode keeps the semi-fragile message; the heavy attacks destroy it
+        assert "img_0_semi_Identity.png" not in saved
+        assert "img_0_semi_Resize_0.5x.png" in saved
+
+        silent = Harness(str(root / "none"), attack_names=ATTACKS, persist_attacked="none")
+        assert silent.run_single(image) == rows
+        assert os.listdir(silent.tampered_dir) == []
+
+        sampled = Harness(str(root / "sample"), attack_names=ATTACKS, persist_attacked="none", persist_sample=0.5)
+        sampled.run_single(image)
+        expected = {
+            f"img_0_{layer}_{name}.png"
+            for name in ATTACKS
+            if sampled._in_sample("img_0", name)
+            for layer in ("lsb", "semi")
+        }
+        assert set(os.listdir(sampled.tampered_dir)) == expected
+
+
+if __name__ == "__main__":
+    test_parallel_run_matches_serial_and_resumes()
+    test_checkpoint_key_covers_the_run_settings()
+    test_failed_image_is_skipped_and_retried()
+    test_in_memory_scoring_persists_only_failures()
+    print("✅ Harness batch tests passed")
@@ -0,0 +1,143 @@
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from stegashield_profiles import embed_image, verify_image
+from tests.support import REPO_ROOT, write_png
+from utils.metadata_store import MetadataRecord, MetadataStore, SQLiteMetadataStore, open_store, shared_store
+
+
+def _record(i: int, user_key_hash: str = "tenant") -> MetadataRecord:
+    return MetadataRecord(
+        watermark_id=f"wm{i}",
+        mode="robust",
+        metadata={"i": i},
+        user_key_hash=user_key_hash,
+        content_sha256=f"sha{i}",
+        created_at=float(i),
+    )
+
+
+def test_batched_writes_commit_together():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "meta.db"
+        store = SQLiteMetadataStore(db)
+        reader = SQLiteMetadataStore(db)
+
+        with store.batch():
+            for i in range(50):
+                store.put(_record(i))
+            assert reader.get("wm0") is None  # nothing visible until the batch commits
+        assert reader.get("wm49").metadata == {"i": 49}
+        assert [r.watermark_id for r in reader.find_by_user_key_hash("tenant", limit=3)] == ["wm49", "wm48", "wm47"]
+        assert reader.find_by_content_hash("sha7")[0].watermark_id == "wm7"
+
+        try:
+            with store.batch():
+                store.put(_record(100))
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        assert reader.get("wm100") is None
+        store.close()
+        reader.close()
+
+
+def test_concurrent_puts():
+    store = SQLiteMetadataStore()
+    threads = [
+        threading.Thread(target=lambda n=n: [store.put(_record(n * 100 + i, f"t{n}")) for i in range(20)])
+        for n in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(len(store.find_by_user_key_hash(f"t{n}")) == 20 for n in range(4))
+
+
+def _open_shared(db: str) -> int:
+    store = shared_store(db)
+    store.put(_record(len(store.find_by_user_key_hash("tenant"))))
+    return id(store)
+
+
+def test_shared_store_opens_once_per_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "meta.db"
+        # A database from before the payload_sha256 column
+        legacy = sqlite3.connect(db)
+        legacy.execute(
+            "CREATE TABLE watermarks (watermark_id TEXT PRIMARY KEY, mode TEXT NOT NULL, user_key_hash TEXT, "
+            "content_sha256 TEXT, created_at REAL NOT NULL, metadata TEXT NOT NULL)"
+        )
+        legacy.commit()
+        legacy.close()
+
+        # Several processes opening it at once migrate it one after the other
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            assert len(list(pool.map(_open_shared, [str(db)] * 8))) == 8
+
+        store = shared_store(db)
+        assert shared_store(str(db)) is store
+        with open_store(str(db)) as opened:
+            assert opened is store
+        # open_store leaves the shared store open for the next call
+        assert store.get("wm0") is not None
+        with store.batch():
+            store.put(_record(100))
+            assert store.get("wm100") is None
+        assert store.get("wm100") is not None
+
+    # ":memory:" is one in-memory database per process, never a file of that name
+    memory = shared_store(":memory:")
+    assert shared_store(":memory:") is memory and memory.path == ":memory:"
+    assert not Path(":memory:").exists()
+
+    try:
+        MetadataStore()
+        raise AssertionError("the interface should not be instantiable")
+    except TypeError:
+        pass
+
+
+def test_embed_and_verify_through_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = write_png(tmp)
+        db = Path(tmp) / "meta.db"
+
+        result = embed_image(str(src), message="owner", mode="hybrid", user_key="tenant", store=str(db), write_sidecar=False)
+        assert result["metadata_path"] is None and not list(Path(tmp).glob("*.json"))
+
+        # Looked up by the output's content hash, then by explicit id
+        report = verify_image(result["image_path"], store=str(db))
+        assert report["watermark_id"] == result["watermark_id"]
+        assert report["robust_report"]["verdict"] == "AUTHENTIC"
+        assert verify_image(result["image_path"], store=str(db), watermark_id=result["watermark_id"])["mode"] == "hybrid"
+
+        # The sidecar, when exported, holds the same metadata as the store
+        exported = embed_image(str(src), message="owner", mode="robust", store=str(db), output_dir=tmp)
+        with SQLiteMetadataStore(db) as store:
+            with open(exported["metadata_path"], encoding="utf-8") as f:
+                assert json.load(f) == store.get(exported["watermark_id"]).metadata
+
+        cli = subprocess.run(
+            [sys.executable, str(REPO_ROOT / "cli.py"), "verify", "--image", result["image_path"], "--store", str(db)],
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT,
+        )
+        assert json.loads(cli.stdout)["data"]["watermark_id"] == result["watermark_id"]
+
+
+if __name__ == "__main__":
+    test_batched_writes_commit_together()
+    test_concurrent_puts()
+    test_shared_store_opens_once_per_process()
+    test_embed_and_verify_through_store()
+    print("✅ Metadata store tests passed")
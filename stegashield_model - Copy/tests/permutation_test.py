@@ -0,0 +1,77 @@
+import threading
+
+import numpy as np
+
+from stegashield_profiles import embed_array, verify_array
+from tests.support import gradient_rgb
+from utils.permutation import BlockPermutationService, tenant_perm_seed
+
+
+def _legacy_permutation(num_blocks: int, seed: int) -> np.ndarray:
+    block_indices = np.arange(num_blocks)
+    np.random.seed(seed)
+    np.random.shuffle(block_indices)
+    return block_indices
+
+
+def test_matches_legacy_global_shuffle():
+    service = BlockPermutationService()
+    for num_blocks, seed in [(1, 0), (500, 0), (8321, 0), (8321, tenant_perm_seed("acme"))]:
+        assert np.array_equal(service.get(num_blocks, seed), _legacy_permutation(num_blocks, seed))
+
+
+def test_does_not_touch_global_rng():
+    np.random.seed(123)
+    expected = np.random.random_sample(4)
+    np.random.seed(123)
+    BlockPermutationService().get(1000, 0)
+    assert np.array_equal(np.random.random_sample(4), expected)
+
+
+def test_lru_eviction_and_counters():
+    service = BlockPermutationService(maxsize=2)
+    first = service.get(100, 0)
+    assert service.get(100, 0) is first
+    service.get(200, 0)
+    service.get(300, 0)  # evicts (100, 0)
+    service.get(100, 0)
+    assert service.cache_info() == {"hits": 1, "misses": 4, "size": 2, "maxsize": 2}
+    assert not first.flags.writeable
+
+
+def test_concurrent_lookups_agree():
+    service = BlockPermutationService(maxsize=4)
+    results = []
+
+    def worker(seed):
+        results.append((seed, service.get(5000, seed)))
+
+    threads = [threading.Thread(target=worker, args=(i % 3,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for seed, perm in results:
+        assert np.array_equal(perm, _legacy_permutation(5000, seed))
+
+
+def test_tenant_seed_roundtrip():
+    rgb = gradient_rgb()
+
+    default = embed_array(rgb, message="owner", mode="semi_fragile", user_key="acme")
+    tenant = embed_array(rgb, message="owner", mode="semi_fragile", user_key="acme", tenant_seed=True)
+    assert default["metadata"]["semi_metadata"]["params"]["perm_seed"] == 0
+    assert tenant["metadata"]["semi_metadata"]["params"]["perm_seed"] == tenant_perm_seed("acme")
+    assert not np.array_equal(default["image"], tenant["image"])
+
+    report = verify_array(tenant["image"], tenant["metadata"])["semi_fragile_report"]
+    assert report["bit_accuracy"] >= 0.98
+
+
+if __name__ == "__main__":
+    test_matches_legacy_global_shuffle()
+    test_does_not_touch_global_rng()
+    test_lru_eviction_and_counters()
+    test_concurrent_lookups_agree()
+    test_tenant_seed_roundtrip()
+    print("✅ Block permutation service tests passed")
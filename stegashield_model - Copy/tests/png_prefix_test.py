@@ -0,0 +1,94 @@
+import io
+import struct
+import zlib
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import utils.frame
+from utils.frame import DecodedFrame
+from utils.png_prefix import _paeth, decode_png_prefix
+
+
+def _chunk(ctype: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + ctype + body + struct.pack(">I", zlib.crc32(ctype + body))
+
+
+def _png_with_filter(rgb: np.ndarray, filter_type: int) -> bytes:
+    """Hand-rolled RGB PNG writer that applies one filter type to every row."""
+    h, w, _ = rgb.shape
+    bpp = 3
+    prior = [0] * (w * bpp)
+    raw = bytearray()
+    for row in rgb.reshape(h, -1).tolist():
+        out = []
+        for i, x in enumerate(row):
+            left = row[i - bpp] if i >= bpp else 0
+            upper_left = prior[i - bpp] if i >= bpp else 0
+            pred = [0, left, prior[i], (left + prior[i]) >> 1, _paeth(left, prior[i], upper_left)][filter_type]
+            out.append((x - pred) & 0xFF)
+        raw += bytes([filter_type]) + bytes(out)
+        prior = row
+    ihdr = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", ihdr) + _chunk(b"IDAT", zlib.compress(bytes(raw))) + _chunk(b"IEND", b"")
+
+
+def _full_decode(data: bytes) -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_prefix_matches_opencv_for_every_filter_type():
+    rgb = np.random.default_rng(0).integers(0, 256, (12, 21, 3), dtype=np.uint8)
+    for filter_type in range(5):
+        data = _png_with_filter(rgb, filter_type)
+        full = _full_decode(data)
+        for n_pixels in (1, 21, 22, 100, 12 * 21):
+            rows = decode_png_prefix(data, n_pixels)
+            assert rows.shape[0] == min(12, -(-n_pixels // 21))
+            assert np.array_equal(rows, full[: rows.shape[0]])
+
+
+def test_prefix_matches_opencv_for_encoder_output_and_modes():
+    rgb = np.random.default_rng(1).integers(0, 256, (30, 40, 3), dtype=np.uint8)
+    for mode in ("RGB", "RGBA", "L", "LA"):
+        buf = io.BytesIO()
+        Image.fromarray(rgb).convert(mode).save(buf, format="PNG")
+        data = buf.getvalue()
+        assert np.array_equal(decode_png_prefix(data, 30 * 40), _full_decode(data))
+
+    # Formats the prefix reader does not handle fall back to the full decoder
+    buf = io.BytesIO()
+    Image.fromarray(rgb).convert("P").save(buf, format="PNG")
+    assert decode_png_prefix(buf.getvalue(), 10) is None
+    assert decode_png_prefix(cv2.imencode(".jpg", rgb)[1].tobytes(), 10) is None
+
+
+def test_frame_y_prefix_skips_full_decode():
+    rgb = np.random.default_rng(2).integers(0, 256, (50, 64, 3), dtype=np.uint8)
+    data = cv2.imencode(".png", rgb[:, :, ::-1].copy())[1].tobytes()
+    frame = DecodedFrame.from_bytes(data)
+    prefix = frame.y_prefix(100)
+    luma = DecodedFrame.from_rgb(rgb).y.reshape(-1)
+    assert "bgr" not in frame.__dict__
+    assert np.array_equal(prefix, luma[:100])
+
+    # Shorter reads come from the rows already decoded; longer ones decode again
+    calls = []
+    original = utils.frame.decode_png_prefix
+    utils.frame.decode_png_prefix = lambda *args: calls.append(args) or original(*args)
+    try:
+        assert np.array_equal(frame.y_prefix(32), luma[:32])
+        assert np.array_equal(frame.y_prefix(128), luma[:128])
+        assert not calls
+        assert np.array_equal(frame.y_prefix(200), luma[:200])
+        assert len(calls) == 1
+    finally:
+        utils.frame.decode_png_prefix = original
+
+
+if __name__ == "__main__":
+    test_prefix_matches_opencv_for_every_filter_type()
+    test_prefix_matches_opencv_for_encoder_output_and_modes()
+    test_frame_y_prefix_skips_full_decode()
+    print("✅ PNG prefix tests passed")
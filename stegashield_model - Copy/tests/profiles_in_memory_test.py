@@ -0,0 +1,56 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from stegashield_profiles import embed_array, embed_bytes, embed_image, verify_array, verify_bytes, verify_image
+from tests.support import gradient_rgb, png_bytes, write_png
+
+
+MODES = ("robust", "semi_fragile", "hybrid")
+
+
+def _assert_authentic(report):
+    if "robust_report" in report:
+        assert report["robust_report"]["verdict"] == "AUTHENTIC"
+    if "semi_fragile_report" in report:
+        assert report["semi_fragile_report"]["bit_accuracy"] >= 0.98
+
+
+def test_bytes_roundtrip_all_modes():
+    data = png_bytes(gradient_rgb())
+    for mode in MODES:
+        result = embed_bytes(data, message="owner", mode=mode)
+        assert result["image_bytes"].startswith(b"\x89PNG")
+        assert (result["heatmap_bytes"] is None) == (mode == "robust")
+        _assert_authentic(verify_bytes(result["image_bytes"], result["metadata"]))
+
+
+def test_array_roundtrip_matches_path_api():
+    rgb = gradient_rgb()
+    with tempfile.TemporaryDirectory() as tmp:
+        src = write_png(tmp, rgb)
+        for mode in MODES:
+            result = embed_array(rgb, message="owner", mode=mode, user_key="tenant")
+            assert result["image"].dtype == np.uint8 and result["image"].shape == rgb.shape
+            _assert_authentic(verify_array(result["image"], result["metadata"]))
+
+            on_disk = embed_image(str(src), message="owner", mode=mode, user_key="tenant", output_dir=tmp)
+            assert np.array_equal(np.array(Image.open(on_disk["image_path"]).convert("RGB")), result["image"])
+            _assert_authentic(verify_image(on_disk["image_path"], on_disk["metadata_path"]))
+
+            # Hybrid keeps its LSB metadata inline instead of a separate *_robust.json
+            with open(on_disk["metadata_path"], encoding="utf-8") as f:
+                written = json.load(f)
+            assert ("robust_metadata" in written) == (mode == "hybrid")
+
+        leftovers = [p.name for p in Path(tmp).iterdir() if p.name.endswith(("_stage.png", "_robust.json"))]
+        assert leftovers == []
+
+
+if __name__ == "__main__":
+    test_bytes_roundtrip_all_modes()
+    test_array_roundtrip_matches_path_api()
+    print("✅ In-memory profile API tests passed")
@@ -0,0 +1,138 @@
+import numpy as np
+import pywt
+from PIL import Image
+
+from models.semi_fragile_dwt_svd import (
+    DwtSvdParams,
+    SemiFragileEmbedderDwtSvd,
+    SemiFragileVerifierDwtSvd,
+    _embed_blocks,
+    _extract_blocks,
+)
+from tests.support import gradient_rgb
+from utils.frame import DecodedFrame
+
+
+PARAMS = DwtSvdParams(redundancy=8, q_step=9.0, block_size=12, wavelet="haar", band="LH")
+
+
+def _make_texture(h: int = 768, w: int = 1024, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = 128 + 60 * np.sin(xx / 17.0) * np.cos(yy / 23.0) + rng.normal(0, 6, (h, w))
+    return np.clip(base, 0, 255).astype(np.float32)
+
+
+def _legacy_embed_blocks(band, block_ids, bits, nbw, bs, q):
+    """Reference per-block loop the batched engine must reproduce exactly."""
+    for block_id, bit in zip(block_ids, bits):
+        by = (block_id // nbw) * bs
+        bx = (block_id % nbw) * bs
+        block = band[by:by+bs, bx:bx+bs]
+        U, S, Vt = np.linalg.svd(block, full_matrices=False)
+        base = np.floor(S[0] / q) * q
+        S[0] = base + 0.25 * q if bit == 0 else base + 0.75 * q
+        band[by:by+bs, bx:bx+bs] = (U @ np.diag(S) @ Vt).astype(np.float32)
+
+
+def test_batched_block_engine_matches_per_block_loop():
+    gray = _make_texture()
+    _, (band, _, _) = pywt.dwt2(gray, "haar")
+    bs = PARAMS.block_size
+    nbw = band.shape[1] // bs
+    num_blocks = (band.shape[0] // bs) * nbw
+
+    rng = np.random.default_rng(0)
+    block_ids = rng.permutation(num_blocks)[: num_blocks // 2]
+    bits = rng.integers(0, 2, block_ids.size).astype(np.uint8)
+
+    expected = band.copy()
+    _legacy_embed_blocks(expected, block_ids, bits, nbw, bs, PARAMS.q_step)
+    actual = band.copy()
+    _embed_blocks(actual, block_ids, bits, nbw, bs, PARAMS.q_step)
+
+    assert np.array_equal(actual, expected)
+
+
+def test_batched_extraction_matches_per_block_decisions():
+    _, (band, _, _) = pywt.dwt2(_make_texture(seed=3), "haar")
+    bs = PARAMS.block_size
+    q = PARAMS.q_step
+    nbw = band.shape[1] // bs
+    block_ids = np.random.default_rng(1).permutation((band.shape[0] // bs) * nbw)
+
+    expected = []
+    for block_id in block_ids:
+        by = (block_id // nbw) * bs
+        bx = (block_id % nbw) * bs
+        S0 = np.linalg.svd(band[by:by+bs, bx:bx+bs], full_matrices=False)[1][0]
+        expected.append(0 if S0 - np.floor(S0 / q) * q < 0.5 * q else 1)
+
+    assert np.array_equal(_extract_blocks(band, block_ids, nbw, bs, q), np.array(expected))
+
+
+def test_embed_roundtrip():
+    img = Image.fromarray(gradient_rgb(768, 1024))
+    wm_img, metadata, _ = SemiFragileEmbedderDwtSvd(PARAMS).embed(img, "StegaShield|0123")
+    report = SemiFragileVerifierDwtSvd(PARAMS).verify(wm_img, metadata)
+    assert report["decode_success"]
+    assert report["bit_accuracy"] >= 0.98
+    assert len(report["bit_agreement"]) == len("StegaShield|0123") * 8
+    assert min(report["bit_agreement"]) >= 0.5
+
+
+def test_sparse_embed_only_rewrites_assigned_footprints():
+    for h, w in ((768, 1024), (601, 803)):
+        rgb = gradient_rgb(h, w)
+        # block_size=7 puts the last block row on the odd frame's edge (301 = 43 * 7 band rows)
+        for params in (DwtSvdParams(band="HL"), DwtSvdParams(block_size=7), PARAMS):
+            embedder = SemiFragileEmbedderDwtSvd(params)
+            full, full_meta, _ = embedder.embed_rgb(rgb, "Shield")
+            sparse, meta, heatmap = embedder.embed_rgb_sparse(rgb, "Shield")
+            assert meta == full_meta
+
+            block_ids, _, nbw, _ = embedder._plan(h, w, "Shield")
+            pair = 2 * params.block_size
+            touched = np.zeros((h, w), dtype=bool)
+            for block_id in block_ids:
+                r, c = divmod(int(block_id), nbw)
+                touched[r * pair:(r + 1) * pair, c * pair:(c + 1) * pair] = True
+            assert np.array_equal(sparse[~touched], rgb[~touched])
+            assert np.array_equal(sparse[touched], full[touched])
+            assert not heatmap[~touched].any()
+            assert heatmap.dtype == np.uint8
+
+            # Patching in place gives the same frame without a copy
+            frame = rgb.copy()
+            patched, _, in_place_heatmap = embedder.embed_rgb_sparse(frame, "Shield", out=frame)
+            assert patched is frame and np.array_equal(frame, sparse)
+            assert np.array_equal(in_place_heatmap, heatmap)
+
+            # Verification reads only the patched footprints, so both outputs decode alike
+            verifier = SemiFragileVerifierDwtSvd(params)
+            report = verifier.verify(Image.fromarray(sparse), meta)
+            assert report == verifier.verify(Image.fromarray(full), full_meta)
+        assert report["bit_accuracy"] == 1.0
+
+
+def test_roi_verify_matches_full_frame():
+    rng = np.random.default_rng(11)
+    for h, w in ((768, 1024), (601, 803)):
+        rgb = gradient_rgb(h, w)
+        for params in (PARAMS, DwtSvdParams(block_size=7, band="HL")):
+            wm, meta, _ = SemiFragileEmbedderDwtSvd(params).embed_rgb_sparse(rgb, "Shield")
+            noisy = np.clip(wm.astype(np.int16) + rng.integers(-8, 9, wm.shape), 0, 255).astype(np.uint8)
+            verifier = SemiFragileVerifierDwtSvd(params)
+            for img in (wm, noisy):
+                expected = verifier.verify(DecodedFrame.from_rgb(img), meta, roi=False)
+                assert verifier.verify(DecodedFrame.from_rgb(img), meta) == expected
+                assert verifier.verify(Image.fromarray(img), meta) == expected
+
+
+if __name__ == "__main__":
+    test_batched_block_engine_matches_per_block_loop()
+    test_batched_extraction_matches_per_block_decisions()
+    test_embed_roundtrip()
+    test_sparse_embed_only_rewrites_assigned_footprints()
+    test_roi_verify_matches_full_frame()
+    print("✅ Semi-fragile engine tests passed")
@@ -0,0 +1,33 @@
+"""
+Helpers shared by the test modules: `from tests.support import gradient_rgb, ...`.
+
+pytest puts the repository root on sys.path (`pythonpath` in pytest.ini); a
+single module also runs as a script from the root with `python -m tests.<name>`.
+"""
+import io
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def gradient_rgb(h: int = 1200, w: int = 1600, shift: int = 0) -> np.ndarray:
+    """Smooth horizontal RGB gradient; a different `shift` gives a different image."""
+    gradient = np.tile(np.linspace(0, 255 - shift, w), (h, 1)) + shift
+    return np.stack([gradient, gradient * 0.8 + 20, 255 - gradient], axis=-1).astype(np.uint8)
+
+
+def png_bytes(rgb: np.ndarray, compress_level: int = 6) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(rgb).save(buf, format="PNG", compress_level=compress_level)
+    return buf.getvalue()
+
+
+def write_png(directory: Union[str, Path], rgb: np.ndarray = None, name: str = "input.png") -> Path:
+    """Save `rgb` (default: `gradient_rgb()`) as `directory/name` and return the path."""
+    path = Path(directory) / name
+    Image.fromarray(gradient_rgb() if rgb is None else rgb).save(path)
+    return path
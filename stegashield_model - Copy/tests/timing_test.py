@@ -0,0 +1,113 @@
+import tempfile
+
+import numpy as np
+
+from api.metrics import size_bucket
+from stegashield_profiles import embed_array, embed_bytes, embed_image, verify_bytes
+from tests.support import gradient_rgb, png_bytes, write_png
+from utils.timing import collect_timings, stage, with_timings
+
+
+def test_nested_stages_are_exclusive():
+    with collect_timings() as timer:
+        with stage("outer"):
+            with stage("inner"):
+                sum(range(200000))
+            sum(range(100000))
+    report = timer.report()
+    assert set(report["stages"]) == {"outer", "inner", "other"}
+    assert abs(sum(report["stages"].values()) - report["total_s"]) < 1e-4
+    # Outside a timer, stages are no-ops
+    with stage("ignored"):
+        pass
+
+
+def test_timings_only_when_requested():
+    rgb = gradient_rgb(600, 800)
+    data = png_bytes(rgb)
+    plain = embed_bytes(data, message="owner")
+    assert "timings" not in plain
+
+    embedded = embed_bytes(data, message="owner", timings=True)
+    timings = embedded["timings"]
+    assert timings["megapixels"] == 0.48
+    stages = timings["stages"]
+    for name in ("decode", "color_convert", "dwt", "svd", "idwt", "lsb", "fragile_hash", "png_encode"):
+        assert stages.get(name, 0) > 0, name
+    assert abs(sum(stages.values()) - timings["total_s"]) < 1e-4
+
+    report = verify_bytes(embedded["image_bytes"], embedded["metadata"], timings=True)
+    assert report["robust_report"]["verdict"] == "AUTHENTIC"
+    for name in ("decode", "dwt", "svd", "lsb", "fragile_hash"):
+        assert report["timings"]["stages"].get(name, 0) > 0, name
+    assert "timings" not in verify_bytes(embedded["image_bytes"], embedded["metadata"])
+
+    # The timed and untimed paths produce the same artifacts
+    timed = embed_array(rgb, message="owner", timings=True)
+    assert np.array_equal(timed["image"], embed_array(rgb, message="owner")["image"])
+    assert embedded["image_bytes"] == plain["image_bytes"]
+
+
+def test_positional_timings_flag():
+    @with_timings
+    def work(n: int, timings: bool = False):
+        with stage("loop"):
+            sum(range(n))
+        return {"n": n}
+
+    assert "timings" not in work(1000)
+    assert "timings" not in work(1000, False)
+    assert "loop" in work(1000, True)["timings"]["stages"]
+    assert "loop" in work(1000, timings=True)["timings"]["stages"]
+
+
+def test_embed_image_reports_file_io():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = write_png(tmp, gradient_rgb(600, 800))
+        result = embed_image(str(src), message="owner", output_dir=tmp, timings=True)
+        stages = result["timings"]["stages"]
+        assert stages["file_io"] > 0 and stages["sidecar_write"] > 0
+
+
+def test_size_buckets():
+    assert size_bucket(0.1) == "le_0.25mp"
+    assert size_bucket(1.0) == "le_1mp"
+    assert size_bucket(12.5) == "le_48mp"
+    assert size_bucket(60) == "gt_48mp"
+    assert size_bucket(None) == "unknown"
+
+
+def test_metrics_endpoint():
+    from fastapi.testclient import TestClient
+    import api.app as app_module
+    from api.verify_cache import VerificationCache
+    from api.workers import WorkerPool
+
+    app_module.worker_pool = WorkerPool.from_env({"MODEL_SERVICE_BACKEND": "thread"})
+    app_module.verify_cache = VerificationCache()
+    data = png_bytes(gradient_rgb(600, 800))
+
+    with TestClient(app_module.app) as client:
+        embedded = client.post("/v2/embed", content=data, headers={"content-type": "image/png"}, params={"response": "json", "message": "owner"})
+        assert embedded.status_code == 200, embedded.text
+        assert "timings" not in embedded.json()["data"]
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert "# TYPE stegashield_stage_duration_seconds histogram" in text
+        labels = 'op="embed_bytes",mode="hybrid",stage="total",size="le_1mp"'
+        assert f'stegashield_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+        assert f"stegashield_stage_duration_seconds_count{{{labels}}} 1" in text
+        assert 'stage="dwt"' in text and 'stage="png_encode"' in text
+
+
+if __name__ == "__main__":
+    test_nested_stages_are_exclusive()
+    test_timings_only_when_requested()
+    test_positional_timings_flag()
+    test_embed_image_reports_file_io()
+    test_size_buckets()
+    test_metrics_endpoint()
+    print("✅ Stage timing tests passed")
@@ -0,0 +1,118 @@
+import asyncio
+import tempfile
+import time
+
+from api.verify_cache import VerificationCache, metadata_digest
+from tests.support import write_png
+
+
+def _key(name):
+    return (name, "meta", "hybrid", 1)
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    cache = VerificationCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"verdict": "AUTHENTIC"}
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute(_key("a"), compute) for _ in range(5)))
+        assert all(r == {"verdict": "AUTHENTIC"} for r in results)
+        await cache.get_or_compute(_key("a"), compute)
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+
+def test_failures_are_shared_but_not_cached():
+    cache = VerificationCache()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(
+            *(cache.get_or_compute(_key("b"), failing) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        try:
+            await cache.get_or_compute(_key("b"), failing)
+        except RuntimeError:
+            pass
+
+    asyncio.run(main())
+    assert len(calls) == 2 and cache.stats()["entries"] == 0
+
+
+def test_lru_ttl_and_byte_bounds():
+    async def value(v):
+        return v
+
+    cache = VerificationCache(max_entries=2, ttl=60.0)
+
+    async def fill(c, names):
+        for name in names:
+            await c.get_or_compute(_key(name), lambda name=name: value({"name": name}))
+
+    asyncio.run(fill(cache, ["a", "b", "a", "c"]))  # "b" is least recently used when "c" arrives
+    assert cache.stats()["evictions"] == 1
+    assert cache._lookup(_key("a"))[0] and not cache._lookup(_key("b"))[0]
+
+    small = VerificationCache(max_entries=100, ttl=60.0, max_bytes=40)
+    asyncio.run(fill(small, ["a", "b", "c"]))  # each report is ~13 bytes of JSON
+    assert small.stats()["bytes"] <= 40 and small.stats()["entries"] == 3
+    asyncio.run(fill(small, ["d"]))
+    assert small.stats()["entries"] == 3 and small.stats()["evictions"] == 1
+
+    short = VerificationCache(ttl=0.05)
+    asyncio.run(fill(short, ["a"]))
+    time.sleep(0.1)
+    assert not short._lookup(_key("a"))[0]
+    assert short.stats()["expirations"] == 1
+
+
+def test_metadata_digest_ignores_key_order():
+    assert metadata_digest({"a": 1, "b": [1, 2]}) == metadata_digest({"b": [1, 2], "a": 1})
+    assert metadata_digest({"a": 1}) != metadata_digest({"a": 2})
+
+
+def test_app_serves_repeat_verifies_from_cache():
+    from fastapi.testclient import TestClient
+    import api.app as app_module
+    from api.workers import WorkerPool
+
+    app_module.worker_pool = WorkerPool.from_env({"MODEL_SERVICE_BACKEND": "thread"})
+    app_module.verify_cache = VerificationCache()
+
+    with tempfile.TemporaryDirectory() as tmp, TestClient(app_module.app) as client:
+        src = write_png(tmp)
+        data = client.post("/embed", json={"image_path": str(src), "message": "owner", "output_dir": tmp}).json()["data"]
+
+        job = {"image_path": data["image_path"], "metadata_path": data["metadata_path"]}
+        first = client.post("/verify", json=job).json()
+        second = client.post("/verify", json=job).json()
+        assert first == second
+        stats = client.get("/cache").json()
+        assert stats["misses"] == 1 and stats["hits"] == 1
+
+        # A different mode is a different key
+        client.post("/verify", json={**job, "mode": "robust"})
+        assert client.get("/cache").json()["misses"] == 2
+
+
+if __name__ == "__main__":
+    test_single_flight_coalesces_concurrent_misses()
+    test_failures_are_shared_but_not_cached()
+    test_lru_ttl_and_byte_bounds()
+    test_metadata_digest_ignores_key_order()
+    test_app_serves_repeat_verifies_from_cache()
+    print("✅ Verification cache tests passed")
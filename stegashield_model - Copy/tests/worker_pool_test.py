@@ -0,0 +1,154 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from api.workers import Lane, LaneConfig, LaneSaturated, LaneTimeout, WorkerPool
+from tests.support import write_png
+
+
+def _square(x):
+    return x * x
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _die():
+    os._exit(1)  # as if the worker were killed, e.g. for running out of memory
+
+
+def test_process_lane_runs_jobs():
+    lane = Lane("verify", LaneConfig(workers=2, queue_size=2, timeout=30.0), backend="process")
+    lane.start()
+    try:
+        async def main():
+            return await asyncio.gather(*(lane.run(_square, i) for i in range(4)))
+
+        assert asyncio.run(main()) == [0, 1, 4, 9]
+        stats = lane.stats()
+        assert stats["completed"] == 4
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    finally:
+        lane.shutdown()
+
+
+def test_process_lane_survives_a_dead_worker():
+    lane = Lane("embed", LaneConfig(workers=1, queue_size=2, timeout=30.0), backend="process")
+    lane.start()
+    try:
+        async def main():
+            try:
+                await lane.run(_die)
+                raise AssertionError("the job whose worker died should fail")
+            except BrokenProcessPool:
+                pass
+            return await lane.run(_square, 3)
+
+        assert asyncio.run(main()) == 9
+        assert lane.stats()["restarts"] == 1
+        assert asyncio.run(lane.run(_square, 4)) == 16
+    finally:
+        lane.shutdown()
+
+
+def test_lane_builds_executors_off_the_loop_and_outside_the_lock():
+    class SlowLane(Lane):
+        def _new_executor(self):
+            time.sleep(0.3)  # as long as spawning and warming process workers can take
+            return super()._new_executor()
+
+    lane = SlowLane("verify", LaneConfig(workers=1, queue_size=1, timeout=30.0), backend="thread")
+
+    async def main():
+        ticks = 0
+        job = asyncio.ensure_future(lane.run(_square, 5))
+        while not job.done():
+            ticks += 1
+            lane.stats()  # takes the lane lock
+            await asyncio.sleep(0.01)
+        assert ticks >= 10
+        return job.result()
+
+    try:
+        assert asyncio.run(main()) == 25
+    finally:
+        lane.shutdown()
+
+
+def test_bounded_queue_rejects_with_retry_after():
+    release = threading.Event()
+    lane = Lane("embed", LaneConfig(workers=1, queue_size=1, timeout=30.0), backend="thread")
+
+    async def main():
+        running = asyncio.ensure_future(lane.run(release.wait))
+        queued = asyncio.ensure_future(lane.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert lane.stats()["in_flight"] == 1 and lane.stats()["queue_depth"] == 1
+        try:
+            await lane.run(release.wait)
+            raise AssertionError("third job should have been rejected")
+        except LaneSaturated as exc:
+            assert exc.retry_after >= 1
+        release.set()
+        await asyncio.gather(running, queued)
+
+    try:
+        asyncio.run(main())
+        assert lane.stats()["rejected"] == 1
+    finally:
+        lane.shutdown()
+
+
+def test_timeout_cancels_queued_job():
+    lane = Lane("embed", LaneConfig(workers=1, queue_size=1, timeout=0.2), backend="thread")
+
+    async def main():
+        running = asyncio.ensure_future(lane.run(_sleep, 0.5))
+        queued = asyncio.ensure_future(lane.run(_sleep, 0.5))
+        results = await asyncio.gather(running, queued, return_exceptions=True)
+        assert all(isinstance(r, LaneTimeout) for r in results)
+        # The queued job never started, so only the running one holds a slot
+        assert lane.stats()["in_flight"] + lane.stats()["queue_depth"] == 1
+        await asyncio.sleep(0.5)
+        assert lane.stats()["in_flight"] == 0
+
+    try:
+        asyncio.run(main())
+        assert lane.stats()["timed_out"] == 2
+    finally:
+        lane.shutdown()
+
+
+def test_app_routes_through_lanes():
+    from fastapi.testclient import TestClient
+    import api.app as app_module
+
+    app_module.worker_pool = WorkerPool.from_env({"MODEL_SERVICE_BACKEND": "thread"})
+
+    with tempfile.TemporaryDirectory() as tmp, TestClient(app_module.app) as client:
+        src = write_png(tmp)
+        embed = client.post("/embed", json={"image_path": str(src), "message": "owner", "output_dir": tmp})
+        assert embed.status_code == 200, embed.text
+        data = embed.json()["data"]
+
+        verify = client.post("/verify", json={"image_path": data["image_path"], "metadata_path": data["metadata_path"]})
+        assert verify.status_code == 200, verify.text
+        assert verify.json()["data"]["robust_report"]["verdict"] == "AUTHENTIC"
+
+        stats = client.get("/workers").json()
+        assert stats["embed"]["completed"] == 1 and stats["verify"]["completed"] == 1
+
+
+if __name__ == "__main__":
+    test_process_lane_runs_jobs()
+    test_process_lane_survives_a_dead_worker()
+    test_lane_builds_executors_off_the_loop_and_outside_the_lock()
+    test_bounded_queue_rejects_with_retry_after()
+    test_timeout_cancels_queued_job()
+    test_app_routes_through_lanes()
+    print("✅ Worker pool tests passed")
@@ -0,0 +1,181 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from training.attacks import AttackSimulator
+
+
+@dataclass(frozen=True)
+class Op:
+    """One primitive step: an `AttackSimulator` method plus its parameters."""
+
+    func_name: str
+    params: Tuple[Tuple[str, Any], ...] = ()
+    source_sized: bool = False   # receives the chain input's height/width
+
+    def apply(self, img: np.ndarray, source_shape: Tuple[int, ...]) -> np.ndarray:
+        params = dict(self.params)
+        if self.source_sized:
+            params.update(height=source_shape[0], width=source_shape[1])
+        return getattr(AttackSimulator, self.func_name)(img, **params)
+
+    def __str__(self) -> str:
+        args = ", ".join(f"{k}={v!r}" for k, v in self.params)
+        return f"{self.func_name}({args})"
+
+
+Chain = Tuple[Op, ...]
+
+
+def _op(func_name: str, **params: Any) -> Op:
+    return Op(func_name, tuple(sorted(params.items())))
+
+
+def jpeg(quality: int) -> Op:
+    return _op("jpeg_compression", quality=quality)
+
+
+def crop(crop_percent: float) -> Op:
+    return _op("crop", crop_percent=crop_percent)
+
+
+def resize(scale: float) -> Op:
+    """Scale by `scale` and back, in one step."""
+    return _op("resize", scale=scale)
+
+
+def downscale(max_side: int) -> Op:
+    return _op("downscale", max_side=max_side)
+
+
+def restore_size() -> Op:
+    """Resize back to the size of the image the chain started from."""
+    return Op("restore_size", source_sized=True)
+
+
+def rotate(angle: float) -> Op:
+    return _op("rotate", angle=angle)
+
+
+def blur(kernel_size: int) -> Op:
+    return _op("blur", kernel_size=kernel_size)
+
+
+def noise(noise_level: float) -> Op:
+    return _op("noise", noise_level=noise_level)
+
+
+def brightness_contrast(alpha: float = 1.0, beta: float = 0.0) -> Op:
+    return _op("brightness_contrast", alpha=alpha, beta=beta)
+
+
+def gamma(value: float) -> Op:
+    return _op("gamma", gamma=value)
+
+
+def text_overlay(text: str = "DEMO", alpha: float = 0.8) -> Op:
+    return _op("text_overlay", text=text, alpha=alpha)
+
+
+def sticker_overlay(size_frac: float = 0.2, alpha: float = 1.0) -> Op:
+    return _op("sticker_overlay", size_frac=size_frac, alpha=alpha)
+
+
+def social(max_side: int, quality: int) -> Chain:
+    """Same result as `AttackSimulator.social_pipeline`, split so the downscale can be shared."""
+    return (downscale(max_side), jpeg(quality), restore_size())
+
+
+@dataclass
+class _Node:
+    op: Optional[Op]
+    children: Dict[Op, "_Node"] = field(default_factory=dict)
+    leaves: List[int] = field(default_factory=list)   # indices of attacks that end here
+
+
+class AttackGraph:
+    """
+    Named attack chains merged into a prefix tree.
+
+    An attack is a chain of primitive ops, e.g. WhatsApp is
+    `(downscale(1280), jpeg(80), restore_size())`. A step shared by several
+    chains (downscale once, then JPEG at five qualities) runs once per input
+    image, and independent branches run on a thread pool (OpenCV releases the
+    GIL).
+
+    Node outputs are computed once and dropped as soon as their children have
+    been scheduled, so memory stays bounded by the number of running branches
+    rather than the number of attacks. Ops must not modify their input in
+    place, because one output feeds every child of its node.
+    """
+
+    def __init__(self, attacks: Mapping[str, Sequence[Op]]):
+        self.names = list(attacks)
+        self.chains: List[Chain] = [tuple(chain) for chain in attacks.values()]
+        self._root = _Node(op=None)
+        self.num_ops = 0
+        for index, chain in enumerate(self.chains):
+            node = self._root
+            for op in chain:
+                child = node.children.get(op)
+                if child is None:
+                    child = node.children[op] = _Node(op=op)
+                    self.num_ops += 1
+                node = child
+            node.leaves.append(index)
+
+    @property
+    def num_chain_ops(self) -> int:
+        """Ops the chains would run without prefix sharing."""
+        return sum(len(chain) for chain in self.chains)
+
+    def run(
+        self,
+        img: np.ndarray,
+        consume: Callable[[str, np.ndarray], Any],
+        workers: int = 1,
+    ) -> List[Any]:
+        """
+        Evaluate every chain on `img` and call `consume(name, attacked)` as soon
+        as each attack's output exists, on the thread that produced it. Returns
+        the consumer results in attack order.
+        """
+        results: List[Any] = [None] * len(self.chains)
+
+        def finish(node: _Node, out: np.ndarray) -> None:
+            for index in node.leaves:
+                results[index] = consume(self.names[index], out)
+
+        def step(node: _Node, parent_out: np.ndarray) -> Tuple[_Node, np.ndarray]:
+            out = node.op.apply(parent_out, img.shape)
+            finish(node, out)
+            return node, out
+
+        finish(self._root, img)
+        if workers <= 1:
+            stack = [(child, img) for child in reversed(list(self._root.children.values()))]
+            while stack:
+                node, out = step(*stack.pop())
+                stack.extend((child, out) for child in reversed(list(node.children.values())))
+            return results
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="attack-graph") as pool:
+            running = {pool.submit(step, child, img) for child in self._root.children.values()}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        node, out = future.result()
+                    except BaseException:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    running |= {pool.submit(step, child, out) for child in node.children.values()}
+        return results
+
+    def evaluate(self, img: np.ndarray, workers: int = 1) -> Dict[str, np.ndarray]:
+        """Every attacked image keyed by name. Holds all outputs; prefer `run` for large sweeps."""
+        outputs = self.run(img, lambda name, out: out, workers=workers)
+        return dict(zip(self.names, outputs))
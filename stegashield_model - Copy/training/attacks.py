@@ -1,7 +1,19 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
 
+@lru_cache(maxsize=64)
+def _gamma_table(gamma: float) -> np.ndarray:
+    inv_gamma = 1.0 / float(gamma)
+    table = (((np.arange(256) / 255.0) ** inv_gamma) * 255).astype("uint8")
+    table.flags.writeable = False
+    return table
+
+
 class AttackSimulator:
     @staticmethod
     def jpeg_compression(img, quality=85):
@@ -61,12 +73,7 @@ class AttackSimulator:
 
     @staticmethod
     def gamma(img, gamma=1.0):
-        inv_gamma = 1.0 / float(gamma)
-        table = np.array([
-            ((i / 255.0) ** inv_gamma) * 255
-            for i in range(256)
-        ]).astype("uint8")
-        return cv2.LUT(img, table)
+        return cv2.LUT(img, _gamma_table(float(gamma)))
 
     @staticmethod
     def text_overlay(img, text="DEMO", alpha=0.8):
@@ -94,61 +101,124 @@ class AttackSimulator:
         return cv2.addWeighted(overlay, float(alpha), img, 1 - float(alpha), 0)
 
     @staticmethod
-    def pipeline_whatsapp(img, max_side=1280, quality=80):
+    def downscale(img, max_side=1280):
         h, w = img.shape[:2]
         scale = min(1.0, max_side / max(h, w))
         new_w = max(1, int(w * scale))
         new_h = max(1, int(h * scale))
-        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        return cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
 
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
-        ok, enc = cv2.imencode(".jpg", resized, encode_param)
-        if not ok:
-            return img
-        dec = cv2.imdecode(enc, cv2.IMREAD_COLOR)
-        return cv2.resize(dec, (w, h), interpolation=cv2.INTER_AREA)
+    @staticmethod
+    def restore_size(img, height, width):
+        return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
 
     @staticmethod
-    def pipeline_instagram(img, max_side=1080, quality=85):
+    def social_pipeline(img, max_side=1280, quality=80):
+        """Platform re-encode: downscale to `max_side`, JPEG at `quality`, scale back."""
         h, w = img.shape[:2]
-        scale = min(1.0, max_side / max(h, w))
-        new_w = max(1, int(w * scale))
-        new_h = max(1, int(h * scale))
-        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        resized = AttackSimulator.downscale(img, max_side)
 
         encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
         ok, enc = cv2.imencode(".jpg", resized, encode_param)
         if not ok:
             return img
         dec = cv2.imdecode(enc, cv2.IMREAD_COLOR)
-        return cv2.resize(dec, (w, h), interpolation=cv2.INTER_AREA)
+        return AttackSimulator.restore_size(dec, h, w)
 
     @staticmethod
-    def pipeline_twitter(img, max_side=1600, quality=85):
-        h, w = img.shape[:2]
-        scale = min(1.0, max_side / max(h, w))
-        new_w = max(1, int(w * scale))
-        new_h = max(1, int(h * scale))
-        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    def pipeline_whatsapp(img, max_side=1280, quality=80):
+        return AttackSimulator.social_pipeline(img, max_side, quality)
 
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
-        ok, enc = cv2.imencode(".jpg", resized, encode_param)
-        if not ok:
-            return img
-        dec = cv2.imdecode(enc, cv2.IMREAD_COLOR)
-        return cv2.resize(dec, (w, h), interpolation=cv2.INTER_AREA)
+    @staticmethod
+    def pipeline_instagram(img, max_side=1080, quality=85):
+        return AttackSimulator.social_pipeline(img, max_side, quality)
+
+    @staticmethod
+    def pipeline_twitter(img, max_side=1600, quality=85):
+        return AttackSimulator.social_pipeline(img, max_side, quality)
 
     @staticmethod
     def pipeline_tiktok(img, max_side=1080, quality=80):
-        h, w = img.shape[:2]
-        scale = min(1.0, max_side / max(h, w))
-        new_w = max(1, int(w * scale))
-        new_h = max(1, int(h * scale))
-        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        return AttackSimulator.social_pipeline(img, max_side, quality)
 
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
-        ok, enc = cv2.imencode(".jpg", resized, encode_param)
-        if not ok:
-            return img
-        dec = cv2.imdecode(enc, cv2.IMREAD_COLOR)
-        return cv2.resize(dec, (w, h), interpolation=cv2.INTER_AREA)
+
+def _as_stack(stack):
+    stack = np.asarray(stack)
+    if stack.ndim != 4 or stack.shape[3] != 3 or stack.dtype != np.uint8:
+        raise ValueError("Expected an (N,H,W,3) uint8 image stack.")
+    return stack
+
+
+class BatchAttackSimulator:
+    """
+    `AttackSimulator` over (N,H,W,3) uint8 stacks of same-size images.
+
+    Pixel-wise attacks run as one call over the whole stack; the others are
+    applied per slice on a thread pool (OpenCV releases the GIL). Every result
+    equals stacking the per-image function's outputs, except `noise`, whose
+    draws come from the Generator passed in.
+    """
+
+    # Elements per noise chunk, so the float32 temporary stays bounded on large stacks
+    NOISE_CHUNK = 1 << 22
+
+    @staticmethod
+    def map(func, stack, workers=None, **params):
+        """Apply a per-image attack to every slice; it must keep the image shape."""
+        stack = _as_stack(stack)
+        out = np.empty_like(stack)
+        workers = workers or os.cpu_count() or 1
+
+        def apply(i):
+            out[i] = func(stack[i], **params)
+
+        if workers <= 1 or len(stack) <= 1:
+            for i in range(len(stack)):
+                apply(i)
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(stack))) as pool:
+                list(pool.map(apply, range(len(stack))))
+        return out
+
+    @staticmethod
+    def noise(stack, noise_level=5.0, rng=None):
+        """
+        Additive Gaussian noise from `rng` (a np.random.Generator, seed it for
+        reproducible sweeps). The result for a given seed does not depend on
+        NOISE_CHUNK, since the chunks consume one continuous stream.
+        """
+        stack = _as_stack(stack)
+        rng = np.random.default_rng() if rng is None else rng
+        out = np.empty_like(stack)
+        per_image = int(np.prod(stack.shape[1:])) or 1
+        step = max(1, BatchAttackSimulator.NOISE_CHUNK // per_image)
+        for start in range(0, len(stack), step):
+            chunk = stack[start:start + step]
+            noisy = rng.standard_normal(chunk.shape, dtype=np.float32)
+            noisy *= noise_level
+            noisy += chunk
+            np.clip(noisy, 0, 255, out=noisy)
+            out[start:start + step] = noisy   # truncating cast, as in AttackSimulator.noise
+        return out
+
+    @staticmethod
+    def brightness_contrast(stack, alpha=1.0, beta=0.0):
+        stack = _as_stack(stack)
+        n, h, w, c = stack.shape
+        flat = np.ascontiguousarray(stack).reshape(n * h, w, c)
+        return cv2.convertScaleAbs(flat, alpha=float(alpha), beta=float(beta)).reshape(stack.shape)
+
+    @staticmethod
+    def gamma(stack, gamma=1.0):
+        stack = _as_stack(stack)
+        n, h, w, c = stack.shape
+        flat = np.ascontiguousarray(stack).reshape(n * h, w, c)
+        return cv2.LUT(flat, _gamma_table(float(gamma))).reshape(stack.shape)
+
+    @staticmethod
+    def blur(stack, kernel_size=3, workers=None):
+        return BatchAttackSimulator.map(AttackSimulator.blur, stack, workers, kernel_size=kernel_size)
+
+    @staticmethod
+    def jpeg_compression(stack, quality=85, workers=None):
+        return BatchAttackSimulator.map(AttackSimulator.jpeg_compression, stack, workers, quality=quality)
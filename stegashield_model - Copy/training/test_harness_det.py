@@ -1,7 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
+import hashlib
 import json
+import os
 
 import csv
 import cv2
@@ -15,15 +18,45 @@ from models.semi_fragile_dwt_svd import (
     SemiFragileVerifierDwtSvd,
     DwtSvdParams,
 )
-from training.attacks import AttackSimulator
+from training import attack_graph as ag
+from training.attack_graph import AttackGraph, Chain
+from utils.frame import DecodedFrame
 from utils.visualization import create_watermark_location_map, triple_view
 
 
+CSV_FIELDS = [
+    "image_id",
+    "layer",
+    "attack",
+    "decode_success",
+    "bit_accuracy",
+    "fragile_match",
+    "verdict",
+]
+
+# What run_single writes to tampered/: every attacked image, only layers whose
+# message did not survive, or nothing. A `persist_sample` share of attacks is
+# saved on top of that either way.
+PERSIST_MODES = ("all", "failures", "none")
+
+
 @dataclass
 class AttackConfig:
     name: str
-    func_name: str
-    params: Dict[str, Any]
+    ops: Chain
+
+
+# Per-process harness for run_batch workers, built once by the pool initializer
+_worker_harness: Optional["TestHarness"] = None
+
+
+def _init_worker(harness_kwargs: Dict[str, Any]) -> None:
+    global _worker_harness
+    _worker_harness = TestHarness(**harness_kwargs)
+
+
+def _run_image_in_worker(image_path: str, attack_threads: int) -> str:
+    return _worker_harness._run_and_checkpoint(image_path, attack_threads)
 
 
 class TestHarness:
@@ -42,15 +75,24 @@ class TestHarness:
         output_dir: str,
         lsb_message: str = "StegaShield_Dataset2025",
         semi_message: str = "StegaShield_SemiFragile",
+        attack_names: Optional[Sequence[str]] = None,
+        persist_attacked: str = "failures",
+        persist_sample: float = 0.0,
     ):
+        if persist_attacked not in PERSIST_MODES:
+            raise ValueError(f"Unknown persist_attacked '{persist_attacked}'. Expected one of {PERSIST_MODES}.")
+        if not 0.0 <= persist_sample <= 1.0:
+            raise ValueError("persist_sample must be between 0 and 1.")
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Create subdirectories
         self.watermarked_dir = self.output_dir / "watermarked"
         self.tampered_dir = self.output_dir / "tampered"
+        self.checkpoint_dir = self.output_dir / "checkpoints"
         self.watermarked_dir.mkdir(exist_ok=True)
         self.tampered_dir.mkdir(exist_ok=True)
+        self.checkpoint_dir.mkdir(exist_ok=True)
 
         self.lsb_embedder = HybridMultiDomainEmbedderDet()
         self.lsb_verifier = HybridMultiDomainVerifierDet()
@@ -61,51 +103,79 @@ class TestHarness:
 
         self.lsb_message = lsb_message
         self.semi_message = semi_message
+        self.persist_attacked = persist_attacked
+        self.persist_sample = persist_sample
 
+        self.attack_names = list(attack_names) if attack_names is not None else None
         self.attacks = self._define_attacks()
+        if self.attack_names is not None:
+            known = {ac.name: ac for ac in self.attacks}
+            unknown = [name for name in self.attack_names if name not in known]
+            if unknown:
+                raise ValueError(f"Unknown attacks: {unknown}")
+            self.attacks = [known[name] for name in self.attack_names]
+        self.attack_graph = AttackGraph({ac.name: ac.ops for ac in self.attacks})
 
     def _define_attacks(self) -> List[AttackConfig]:
-        A = AttackSimulator
         return [
-            AttackConfig("Identity", "jpeg_compression", {"quality": 100}),
-            AttackConfig("JPEG_Q95", "jpeg_compression", {"quality": 95}),
-            AttackConfig("JPEG_Q85", "jpeg_compression", {"quality": 85}),
-            AttackConfig("JPEG_Q70", "jpeg_compression", {"quality": 70}),
-            AttackConfig("JPEG_Q50", "jpeg_compression", {"quality": 50}),
-            AttackConfig("Crop_5pct", "crop", {"crop_percent": 0.05}),
-            AttackConfig("Crop_15pct", "crop", {"crop_percent": 0.15}),
-            AttackConfig("Crop_30pct", "crop", {"crop_percent": 0.30}),
-            AttackConfig("Resize_0.9x", "resize", {"scale": 0.9}),
-            AttackConfig("Resize_0.75x", "resize", {"scale": 0.75}),
-            AttackConfig("Resize_0.5x", "resize", {"scale": 0.5}),
-            AttackConfig("Rotate_5deg", "rotate", {"angle": 5}),
-            AttackConfig("Rotate_15deg", "rotate", {"angle": 15}),
-            AttackConfig("Rotate_45deg", "rotate", {"angle": 45}),
-            AttackConfig("Rotate_90deg", "rotate", {"angle": 90}),
-            AttackConfig("Blur_k3", "blur", {"kernel_size": 3}),
-            AttackConfig("Blur_k5", "blur", {"kernel_size": 5}),
-            AttackConfig("Blur_k7", "blur", {"kernel_size": 7}),
-            AttackConfig("Noise_5", "noise", {"noise_level": 5.0}),
-            AttackConfig("Noise_10", "noise", {"noise_level": 10.0}),
-            AttackConfig("Noise_20", "noise", {"noise_level": 20.0}),
-            AttackConfig("Bright_plus10", "brightness_contrast", {"alpha": 1.0, "beta": 25}),
-            AttackConfig("Bright_minus10", "brightness_contrast", {"alpha": 1.0, "beta": -25}),
-            AttackConfig("Contrast_plus10", "brightness_contrast", {"alpha": 1.1, "beta": 0}),
-            AttackConfig("Contrast_minus10", "brightness_contrast", {"alpha": 0.9, "beta": 0}),
-            AttackConfig("Gamma_0.8", "gamma", {"gamma": 0.8}),
-            AttackConfig("Gamma_1.2", "gamma", {"gamma": 1.2}),
-            AttackConfig("TextOverlay", "text_overlay", {"text": "DEMO", "alpha": 0.8}),
-            AttackConfig("StickerOverlay", "sticker_overlay", {"size_frac": 0.2, "alpha": 1.0}),
-            AttackConfig("WhatsApp_like", "pipeline_whatsapp", {}),
-            AttackConfig("Instagram_like", "pipeline_instagram", {}),
-            AttackConfig("Twitter_like", "pipeline_twitter", {}),
-            AttackConfig("TikTok_like", "pipeline_tiktok", {}),
+            AttackConfig("Identity", (ag.jpeg(100),)),
+            AttackConfig("JPEG_Q95", (ag.jpeg(95),)),
+            AttackConfig("JPEG_Q85", (ag.jpeg(85),)),
+            AttackConfig("JPEG_Q70", (ag.jpeg(70),)),
+            AttackConfig("JPEG_Q50", (ag.jpeg(50),)),
+            AttackConfig("Crop_5pct", (ag.crop(0.05),)),
+            AttackConfig("Crop_15pct", (ag.crop(0.15),)),
+            AttackConfig("Crop_30pct", (ag.crop(0.30),)),
+            AttackConfig("Resize_0.9x", (ag.resize(0.9),)),
+            AttackConfig("Resize_0.75x", (ag.resize(0.75),)),
+            AttackConfig("Resize_0.5x", (ag.resize(0.5),)),
+            AttackConfig("Rotate_5deg", (ag.rotate(5),)),
+            AttackConfig("Rotate_15deg", (ag.rotate(15),)),
+            AttackConfig("Rotate_45deg", (ag.rotate(45),)),
+            AttackConfig("Rotate_90deg", (ag.rotate(90),)),
+            AttackConfig("Blur_k3", (ag.blur(3),)),
+            AttackConfig("Blur_k5", (ag.blur(5),)),
+            AttackConfig("Blur_k7", (ag.blur(7),)),
+            AttackConfig("Noise_5", (ag.noise(5.0),)),
+            AttackConfig("Noise_10", (ag.noise(10.0),)),
+            AttackConfig("Noise_20", (ag.noise(20.0),)),
+            AttackConfig("Bright_plus10", (ag.brightness_contrast(alpha=1.0, beta=25),)),
+            AttackConfig("Bright_minus10", (ag.brightness_contrast(alpha=1.0, beta=-25),)),
+            AttackConfig("Contrast_plus10", (ag.brightness_contrast(alpha=1.1, beta=0),)),
+            AttackConfig("Contrast_minus10", (ag.brightness_contrast(alpha=0.9, beta=0),)),
+            AttackConfig("Gamma_0.8", (ag.gamma(0.8),)),
+            AttackConfig("Gamma_1.2", (ag.gamma(1.2),)),
+            AttackConfig("TextOverlay", (ag.text_overlay("DEMO", alpha=0.8),)),
+            AttackConfig("StickerOverlay", (ag.sticker_overlay(size_frac=0.2, alpha=1.0),)),
+            # Instagram and TikTok share the 1080px downscale
+            AttackConfig("WhatsApp_like", ag.social(max_side=1280, quality=80)),
+            AttackConfig("Instagram_like", ag.social(max_side=1080, quality=85)),
+            AttackConfig("Twitter_like", ag.social(max_side=1600, quality=85)),
+            AttackConfig("TikTok_like", ag.social(max_side=1080, quality=80)),
         ]
 
-    def _get_attack_func(self, func_name: str):
-        return getattr(AttackSimulator, func_name)
+    def _in_sample(self, image_stem: str, attack_name: str) -> bool:
+        # Hash-based, so the sample is the same across runs and worker processes
+        if self.persist_sample <= 0.0:
+            return False
+        digest = hashlib.sha1(f"{image_stem}:{attack_name}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") / 2**32 < self.persist_sample
 
-    def run_single(self, image_path: str) -> List[Dict[str, Any]]:
+    def _should_persist(self, image_stem: str, attack_name: str, failed: bool) -> bool:
+        if self.persist_attacked == "all" or (failed and self.persist_attacked == "failures"):
+            return True
+        return self._in_sample(image_stem, attack_name)
+
+    def run_single(self, image_path: str, attack_threads: int = 1) -> List[Dict[str, Any]]:
+        """
+        Embed both layers into one image and score every attack against them.
+        Attacks are evaluated through `self.attack_graph`, so shared steps run
+        once; with `attack_threads` > 1 independent branches and their scoring
+        run on a thread pool. Rows always come back in attack order.
+
+        Attacked images are verified in memory. They are written to tampered/
+        only as `persist_attacked` and `persist_sample` ask for.
+        """
         image_path = str(image_path)
         img_pil = Image.open(image_path).convert("RGB")
         image_stem = Path(image_path).stem
@@ -118,7 +188,6 @@ class TestHarness:
             metadata_path=str(self.watermarked_dir / f"{image_stem}_lsb_metadata.json"),
         )
         lsb_img_path = lsb_meta["image_path"]
-        lsb_metadata_path = lsb_meta["metadata_path"]
 
         capacity_bytes = self.semi_embedder.estimate_capacity_bytes(img_pil)
         if capacity_bytes == 0:
@@ -170,70 +239,133 @@ class TestHarness:
         loc_map_path = self.watermarked_dir / f"{image_stem}_semi_locations.png"
         location_map.save(loc_map_path)
 
-        results: List[Dict[str, Any]] = []
-
         lsb_base = cv2.imread(lsb_img_path, cv2.IMREAD_COLOR)
         semi_base = cv2.cvtColor(np.array(semi_wm_img), cv2.COLOR_RGB2BGR)
 
-        for ac in self.attacks:
-            func = self._get_attack_func(ac.func_name)
-
-            # Save attacked LSB images to tampered folder
-            attacked_lsb = func(lsb_base.copy(), **ac.params)
-            lsb_attacked_path = str(self.tampered_dir / f"{image_stem}_lsb_{ac.name}.png")
-            cv2.imwrite(lsb_attacked_path, attacked_lsb)
-            lsb_verdict = self.lsb_verifier.verify(lsb_attacked_path, lsb_metadata_path)
-
-            results.append({
+        def score_lsb(name: str, attacked: np.ndarray) -> Dict[str, Any]:
+            verdict = self.lsb_verifier.verify_array(DecodedFrame(attacked), lsb_meta)
+            failed = verdict["decoded_message"] != self.lsb_message
+            if self._should_persist(image_stem, name, failed):
+                cv2.imwrite(str(self.tampered_dir / f"{image_stem}_lsb_{name}.png"), attacked)
+            return {
                 "image_id": Path(image_path).name,
                 "layer": "LSB",
-                "attack": ac.name,
-                "decode_success": lsb_verdict["decode_success"],
+                "attack": name,
+                "decode_success": verdict["decode_success"],
                 "bit_accuracy": None,
-                "fragile_match": lsb_verdict["fragile_match"],
-                "verdict": lsb_verdict["verdict"],
-            })
-
-            # Save attacked semi-fragile images to tampered folder
-            attacked_semi = func(semi_base.copy(), **ac.params)
-            attacked_semi_pil = Image.fromarray(cv2.cvtColor(attacked_semi, cv2.COLOR_BGR2RGB))
-            semi_attacked_path = self.tampered_dir / f"{image_stem}_semi_{ac.name}.png"
-            attacked_semi_pil.save(semi_attacked_path)
-            semi_res = self.semi_verifier.verify(attacked_semi_pil, semi_meta)
-
-            results.append({
+                "fragile_match": verdict["fragile_match"],
+                "verdict": verdict["verdict"],
+            }
+
+        def score_semi(name: str, attacked: np.ndarray) -> Dict[str, Any]:
+            semi_res = self.semi_verifier.verify(DecodedFrame(attacked), semi_meta)
+            failed = semi_res["decoded_message"] != semi_message
+            if self._should_persist(image_stem, name, failed):
+                cv2.imwrite(str(self.tampered_dir / f"{image_stem}_semi_{name}.png"), attacked)
+            return {
                 "image_id": Path(image_path).name,
                 "layer": "SemiFragile",
-                "attack": ac.name,
+                "attack": name,
                 "decode_success": semi_res["decode_success"],
                 "bit_accuracy": semi_res["bit_accuracy"],
                 "fragile_match": None,
                 "verdict": "N/A",
-            })
+            }
 
-        return results
+        # Each attack is scored as soon as the graph produces it, so attacked images are not all held at once
+        lsb_rows = self.attack_graph.run(lsb_base, score_lsb, workers=attack_threads)
+        semi_rows = self.attack_graph.run(semi_base, score_semi, workers=attack_threads)
+        return [row for pair in zip(lsb_rows, semi_rows) for row in pair]
 
-    def run_batch(self, image_paths: List[str], csv_name: str = "results.csv") -> Path:
-        rows: List[Dict[str, Any]] = []
-        for p in image_paths:
-            rows.extend(self.run_single(p))
+    def _checkpoint_settings(self) -> Dict[str, Any]:
+        # Everything that shapes an image's rows or the files written beside them
+        return {
+            "attacks": [ac.name for ac in self.attacks],
+            "lsb_message": self.lsb_message,
+            "semi_message": self.semi_message,
+            "lsb_params": vars(self.lsb_embedder),
+            "semi_params": vars(self.semi_embedder.params),
+            "persist_attacked": self.persist_attacked,
+            "persist_sample": self.persist_sample,
+        }
+
+    def _checkpoint_path(self, image_path: str) -> Path:
+        # Keyed by the resolved path and the run settings, so a rerun with other settings recomputes
+        key = json.dumps([str(Path(image_path).resolve()), self._checkpoint_settings()], sort_keys=True)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.checkpoint_dir / f"{Path(image_path).stem}_{digest}.json"
+
+    def _run_and_checkpoint(self, image_path: str, attack_threads: int = 1) -> str:
+        rows = self.run_single(image_path, attack_threads=attack_threads)
+        path = self._checkpoint_path(image_path)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump({"image_path": str(image_path), "rows": rows}, f)
+        os.replace(tmp, path)  # atomic: a crash never leaves a half-written checkpoint
+        return str(image_path)
+
+    def run_batch(
+        self,
+        image_paths: List[str],
+        csv_name: str = "results.csv",
+        workers: int = 1,
+        attack_threads: int = 1,
+        resume: bool = True,
+    ) -> Path:
+        """
+        Run `run_single` over every image and write one CSV.
+
+        Each finished image is checkpointed under `checkpoints/`; with `resume`
+        a rerun skips images that already have one. Images are sharded over
+        `workers` processes and each image's attacks over `attack_threads`
+        threads. The CSV is assembled from the checkpoints in input order, so
+        it does not depend on scheduling. An image that fails is reported and
+        left without a checkpoint, so the next run retries it.
+        """
+        image_paths = [str(p) for p in image_paths]
+        pending = [p for p in image_paths if not (resume and self._checkpoint_path(p).exists())]
+        if len(pending) < len(image_paths):
+            print(f"↻ Resuming: {len(image_paths) - len(pending)} of {len(image_paths)} images already checkpointed.")
+
+        failed: Dict[str, str] = {}
+        if workers > 1 and len(pending) > 1:
+            harness_kwargs = {
+                "output_dir": str(self.output_dir),
+                "lsb_message": self.lsb_message,
+                "semi_message": self.semi_message,
+                "attack_names": [ac.name for ac in self.attacks],
+                "persist_attacked": self.persist_attacked,
+                "persist_sample": self.persist_sample,
+            }
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(pending)),
+                initializer=_init_worker,
+                initargs=(harness_kwargs,),
+            ) as pool:
+                futures = {pool.submit(_run_image_in_worker, p, attack_threads): p for p in pending}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        failed[futures[future]] = str(exc)
+        else:
+            for p in pending:
+                try:
+                    self._run_and_checkpoint(p, attack_threads)
+                except Exception as exc:
+                    failed[p] = str(exc)
+
+        for p, error in failed.items():
+            print(f"⚠️ {Path(p).name} failed and will be retried on the next run: {error}")
 
         csv_path = self.output_dir / csv_name
         with csv_path.open("w", newline="") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=[
-                    "image_id",
-                    "layer",
-                    "attack",
-                    "decode_success",
-                    "bit_accuracy",
-                    "fragile_match",
-                    "verdict",
-                ],
-            )
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
             writer.writeheader()
-            for r in rows:
-                writer.writerow(r)
+            for p in image_paths:
+                if p in failed:
+                    continue
+                with self._checkpoint_path(p).open() as ckpt:
+                    writer.writerows(json.load(ckpt)["rows"])
 
         return csv_path
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def bytes_to_bits(data: bytes) -> np.ndarray:
+    """Unpack bytes into a uint8 array of bits, most significant bit first."""
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def bits_to_bytes(bits: np.ndarray, length_bytes: int = None) -> bytes:
+    """
+    Pack a bit array (MSB first) back into bytes.
+
+    A trailing partial byte is zero-padded. If `length_bytes` is given the
+    result is truncated or zero-padded to exactly that many bytes.
+    """
+    bits = np.asarray(bits, dtype=np.uint8) & 1
+    if length_bytes is not None:
+        bits = bits[: length_bytes * 8]
+    out = np.packbits(bits).tobytes()
+    if length_bytes is not None and len(out) < length_bytes:
+        out += bytes(length_bytes - len(out))
+    return out
+
+
+def _flat_view(arr: np.ndarray) -> np.ndarray:
+    # reshape(-1) on a non-contiguous array would silently copy and lose in-place writes
+    if not arr.flags.c_contiguous:
+        raise ValueError("LSB access requires a C-contiguous array.")
+    return arr.reshape(-1)
+
+
+def embed_lsb(arr: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """Write `bits` into the LSBs of the first len(bits) elements of uint8 `arr`, in place."""
+    flat = _flat_view(arr)
+    n = bits.size
+    if n > flat.size:
+        raise ValueError(f"Need {n} bits, array holds {flat.size}.")
+    np.bitwise_or(flat[:n] & 0xFE, bits, out=flat[:n])
+    return arr
+
+
+def extract_lsb(arr: np.ndarray, max_bits: int) -> np.ndarray:
+    """Read the LSBs of the first `max_bits` elements of uint8 `arr` without copying the array."""
+    flat = arr.reshape(-1) if arr.flags.c_contiguous else np.ravel(arr)
+    return flat[: min(max_bits, flat.size)] & 1
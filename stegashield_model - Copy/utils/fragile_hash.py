@@ -0,0 +1,38 @@
+import hashlib
+
+import cv2
+import numpy as np
+
+
+# Version 1: SHA-256 over the OpenCV PNG encoding of the BGR frame. Depends on the
+#            OpenCV/zlib build and costs a full zlib pass on every embed and verify.
+# Version 2: BLAKE2b-256 over the raw BGR pixel buffer, prefixed with its shape and
+#            dtype. Encoder independent and roughly memory-bandwidth bound.
+FRAGILE_HASH_PNG_SHA256 = 1
+FRAGILE_HASH_RAW_BLAKE2B = 2
+FRAGILE_HASH_VERSION = FRAGILE_HASH_RAW_BLAKE2B
+
+
+def encode_png(bgr: np.ndarray) -> bytes:
+    ok, buf = cv2.imencode(".png", bgr)
+    if not ok:
+        raise ValueError("Failed to encode image for fragile hash.")
+    return buf.tobytes()
+
+
+def compute_fragile_hash(bgr: np.ndarray, version: int = FRAGILE_HASH_VERSION) -> str:
+    """
+    Hash a BGR uint8 frame with the given fragile-hash scheme version.
+
+    Metadata written before versioning existed has no `fragile_hash_version`
+    and must be checked with version 1.
+    """
+    if version == FRAGILE_HASH_PNG_SHA256:
+        return hashlib.sha256(encode_png(bgr)).hexdigest()
+    if version == FRAGILE_HASH_RAW_BLAKE2B:
+        bgr = np.ascontiguousarray(bgr)
+        h = hashlib.blake2b(digest_size=32)
+        h.update(f"{'x'.join(str(d) for d in bgr.shape)}:{bgr.dtype.str}|".encode("ascii"))
+        h.update(memoryview(bgr).cast("B"))
+        return h.hexdigest()
+    raise ValueError(f"Unsupported fragile_hash_version: {version}")
@@ -0,0 +1,131 @@
+from functools import cached_property
+from pathlib import Path
+from typing import Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils.png_prefix import decode_png_prefix
+from utils.timing import stage
+
+
+class DecodedFrame:
+    """
+    An image decoded at most once, with lazily computed and cached views.
+
+    Both verifier families read from the same frame, so a hybrid verification
+    pays for one decode instead of one per layer. Frames built from encoded
+    bytes do not decode until a full view is first needed, and `y_prefix` can
+    answer from just the leading PNG rows. Views are derived on first access
+    and reused afterwards:
+
+        bgr   - HxWx3 uint8, OpenCV channel order (the decoded buffer itself)
+        rgb   - HxWx3 uint8
+        pil   - RGB PIL image over `rgb`
+        y     - HxW uint8 luma from OpenCV's YCrCb conversion (LSB layer)
+        gray  - HxW float32 luma from PIL's "L" conversion (DWT-SVD layer)
+    """
+
+    def __init__(self, bgr: np.ndarray = None, data: bytes = None, source: str = "image bytes"):
+        if bgr is not None:
+            if bgr.ndim != 3 or bgr.shape[2] != 3 or bgr.dtype != np.uint8:
+                raise ValueError("DecodedFrame expects an HxWx3 uint8 BGR array.")
+            self.__dict__["bgr"] = bgr
+        elif data is None:
+            raise ValueError("DecodedFrame needs either a BGR array or encoded bytes.")
+        self._data = data
+        self._source = source
+        self._y_rows = None   # flat luma of the leading rows y_prefix decoded last
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DecodedFrame":
+        return cls(data=data)
+
+    @classmethod
+    def from_path(cls, image_path: str) -> "DecodedFrame":
+        try:
+            data = Path(image_path).read_bytes()
+        except OSError as exc:
+            raise ValueError(f"Could not load image: {image_path}") from exc
+        return cls(data=data, source=str(image_path))
+
+    @classmethod
+    def from_rgb(cls, rgb: np.ndarray) -> "DecodedFrame":
+        frame = cls(bgr=cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        frame.__dict__["rgb"] = rgb
+        return frame
+
+    @classmethod
+    def from_image(cls, image: Union["DecodedFrame", Image.Image, np.ndarray]) -> "DecodedFrame":
+        """Wrap a PIL image or RGB array; frames are returned unchanged."""
+        if isinstance(image, DecodedFrame):
+            return image
+        if isinstance(image, Image.Image):
+            return cls.from_rgb(np.array(image.convert("RGB"), dtype=np.uint8))
+        return cls.from_rgb(np.ascontiguousarray(image))
+
+    @cached_property
+    def bgr(self) -> np.ndarray:
+        with stage("decode"):
+            bgr = cv2.imdecode(np.frombuffer(self._data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError(f"Could not decode {self._source}.")
+        return bgr
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def decoded_shape(self):
+        """Shape of the full frame if it has been decoded already, else None (never decodes)."""
+        bgr = self.__dict__.get("bgr")
+        return None if bgr is None else bgr.shape
+
+    @cached_property
+    def rgb(self) -> np.ndarray:
+        bgr = self.bgr
+        with stage("color_convert"):
+            return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+    @cached_property
+    def pil(self) -> Image.Image:
+        return Image.fromarray(self.rgb, mode="RGB")
+
+    @cached_property
+    def y(self) -> np.ndarray:
+        bgr = self.bgr
+        with stage("color_convert"):
+            return cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb)[:, :, 0].copy()
+
+    def y_prefix(self, n_pixels: int) -> np.ndarray:
+        """
+        First `n_pixels` luma values in raster order, as a flat uint8 array.
+
+        Only the rows that hold those pixels are colour-converted, and if the
+        frame has not been decoded yet and is a plain PNG, only those rows are
+        decoded. Values are identical to `y.reshape(-1)[:n_pixels]`. The rows are
+        kept, so a later call for no more pixels (the payload read after its
+        length header) decodes nothing.
+        """
+        if "y" in self.__dict__:
+            return self.y.reshape(-1)[:n_pixels]
+        if self._y_rows is not None and self._y_rows.size >= n_pixels:
+            return self._y_rows[:n_pixels]
+        rows = None
+        if "bgr" not in self.__dict__:
+            with stage("decode"):
+                rows = decode_png_prefix(self._data, n_pixels)
+        if rows is None:
+            bgr = self.bgr
+            rows = bgr[: min(bgr.shape[0], -(-max(n_pixels, 1) // bgr.shape[1]))]
+        with stage("color_convert"):
+            self._y_rows = cv2.cvtColor(rows, cv2.COLOR_BGR2YCrCb)[:, :, 0].reshape(-1)
+        return self._y_rows[:n_pixels]
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        pil = self.pil
+        with stage("color_convert"):
+            return np.array(pil.convert("L"), dtype=np.float32)
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+def new_watermark_id() -> str:
+    return uuid.uuid4().hex
+
+
+def payload_digest(payload: Union[str, bytes]) -> str:
+    """SHA-256 of the embedded LSB payload, the key for blind lookups."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class WatermarkNotFound(LookupError):
+    """No metadata record matches the image, or the requested watermark_id."""
+
+
+class WatermarkAmbiguous(WatermarkNotFound):
+    """Several records carry the image's payload and none of them matches its pixels."""
+
+    def __init__(self, message: str, candidates: List[str]):
+        super().__init__(message)
+        self.candidates = candidates
+
+    def __reduce__(self):
+        # Raised in process-pool workers, so it must survive pickling
+        return type(self), (str(self), self.candidates)
+
+
+@dataclass
+class MetadataRecord:
+    """One embed's metadata plus the keys it can be found by."""
+
+    watermark_id: str
+    mode: str
+    metadata: Dict[str, Any]
+    user_key_hash: Optional[str] = None
+    content_sha256: Optional[str] = None   # SHA-256 of the watermarked output file
+    payload_sha256: Optional[str] = None   # payload_digest() of the embedded payload
+    fragile_hash: Optional[str] = None     # version-2 (raw pixel) fragile hash of the output
+    created_at: float = field(default_factory=time.time)
+
+
+class MetadataStore(ABC):
+    """
+    Interface for metadata backends. `put` may be buffered inside `batch()`;
+    everything else reads committed records only.
+    """
+
+    def put(self, record: MetadataRecord) -> None:
+        self.put_many([record])
+
+    @abstractmethod
+    def put_many(self, records: Iterable[MetadataRecord]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, watermark_id: str) -> Optional[MetadataRecord]:
+        ...
+
+    @abstractmethod
+    def find_by_content_hash(self, content_sha256: str) -> List[MetadataRecord]:
+        ...
+
+    @abstractmethod
+    def find_by_user_key_hash(self, user_key_hash: str, limit: int = 100) -> List[MetadataRecord]:
+        ...
+
+    @abstractmethod
+    def find_by_payload_hash(self, payload_sha256: str, limit: int = 100) -> List[MetadataRecord]:
+        ...
+
+    @abstractmethod
+    def find_by_fragile_hash(self, fragile_hash: str, limit: int = 100) -> List[MetadataRecord]:
+        ...
+
+    @contextmanager
+    def batch(self) -> Iterator["MetadataStore"]:
+        yield self
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    watermark_id   TEXT PRIMARY KEY,
+    mode           TEXT NOT NULL,
+    user_key_hash  TEXT,
+    content_sha256 TEXT,
+    created_at     REAL NOT NULL,
+    metadata       TEXT NOT NULL,
+    payload_sha256 TEXT,
+    fragile_hash   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_watermarks_user_key_hash ON watermarks (user_key_hash);
+CREATE INDEX IF NOT EXISTS idx_watermarks_content_sha256 ON watermarks (content_sha256);
+"""
+
+# Indexes on columns that older databases gain through _migrate()
+_LATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_watermarks_payload_sha256 ON watermarks (payload_sha256);
+CREATE INDEX IF NOT EXISTS idx_watermarks_fragile_hash ON watermarks (fragile_hash);
+"""
+
+
+def _statements(script: str) -> List[str]:
+    return [statement.strip() for statement in script.split(";") if statement.strip()]
+
+
+_COLUMNS = "watermark_id, mode, user_key_hash, content_sha256, created_at, metadata, payload_sha256, fragile_hash"
+
+
+class SQLiteMetadataStore(MetadataStore):
+    """
+    Embedded SQLite backend. One connection is shared across threads behind a
+    lock. Inside `with store.batch():` puts from the current thread are
+    buffered and committed in a single transaction when the block exits.
+    """
+
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).expanduser().resolve().parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._lock:
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # One write transaction, so processes opening the same new or older
+            # database at once create and migrate it one after the other
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in _statements(_SCHEMA):
+                    self._conn.execute(statement)
+                self._migrate()
+                for statement in _statements(_LATE_INDEXES):
+                    self._conn.execute(statement)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(watermarks)")}
+        if "payload_sha256" not in columns:
+            self._conn.execute("ALTER TABLE watermarks ADD COLUMN payload_sha256 TEXT")
+        if "fragile_hash" not in columns:
+            self._conn.execute("ALTER TABLE watermarks ADD COLUMN fragile_hash TEXT")
+
+    @staticmethod
+    def _row(record: MetadataRecord) -> tuple:
+        return (
+            record.watermark_id,
+            record.mode,
+            record.user_key_hash,
+            record.content_sha256,
+            record.created_at,
+            json.dumps(record.metadata, separators=(",", ":")),
+            record.payload_sha256,
+            record.fragile_hash,
+        )
+
+    @staticmethod
+    def _record(row: tuple) -> MetadataRecord:
+        watermark_id, mode, user_key_hash, content_sha256, created_at, metadata, payload_sha256, fragile_hash = row
+        return MetadataRecord(
+            watermark_id=watermark_id,
+            mode=mode,
+            metadata=json.loads(metadata),
+            user_key_hash=user_key_hash,
+            content_sha256=content_sha256,
+            payload_sha256=payload_sha256,
+            fragile_hash=fragile_hash,
+            created_at=created_at,
+        )
+
+    def put(self, record: MetadataRecord) -> None:
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending.append(record)
+        else:
+            self.put_many([record])
+
+    def put_many(self, records: Iterable[MetadataRecord]) -> None:
+        rows = [self._row(r) for r in records]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO watermarks ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def batch(self) -> Iterator["SQLiteMetadataStore"]:
+        if getattr(self._local, "pending", None) is not None:
+            # Nested batch: the outermost one commits
+            yield self
+            return
+        self._local.pending = []
+        try:
+            yield self
+            self.put_many(self._local.pending)
+        finally:
+            self._local.pending = None
+
+    def _query(self, sql: str, params: tuple) -> List[MetadataRecord]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def get(self, watermark_id: str) -> Optional[MetadataRecord]:
+        rows = self._query(f"SELECT {_COLUMNS} FROM watermarks WHERE watermark_id = ?", (watermark_id,))
+        return rows[0] if rows else None
+
+    def find_by_content_hash(self, content_sha256: str) -> List[MetadataRecord]:
+        return self._query(
+            f"SELECT {_COLUMNS} FROM watermarks WHERE content_sha256 = ? ORDER BY created_at DESC",
+            (content_sha256,),
+        )
+
+    def find_by_user_key_hash(self, user_key_hash: str, limit: int = 100) -> List[MetadataRecord]:
+        return self._query(
+            f"SELECT {_COLUMNS} FROM watermarks WHERE user_key_hash = ? ORDER BY created_at DESC LIMIT ?",
+            (user_key_hash, limit),
+        )
+
+    def find_by_payload_hash(self, payload_sha256: str, limit: int = 100) -> List[MetadataRecord]:
+        return self._query(
+            f"SELECT {_COLUMNS} FROM watermarks WHERE payload_sha256 = ? ORDER BY created_at DESC LIMIT ?",
+            (payload_sha256, limit),
+        )
+
+    def find_by_fragile_hash(self, fragile_hash: str, limit: int = 100) -> List[MetadataRecord]:
+        return self._query(
+            f"SELECT {_COLUMNS} FROM watermarks WHERE fragile_hash = ? ORDER BY created_at DESC LIMIT ?",
+            (fragile_hash, limit),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared: Dict[Tuple[int, str], SQLiteMetadataStore] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_store(path: Union[str, Path]) -> SQLiteMetadataStore:
+    """
+    The store for a SQLite database path, opened once per process (schema and
+    migrations run then) and kept open for later calls. Keyed by process id as
+    well, so a forked worker never reuses its parent's connection. ":memory:"
+    is not a path: it names one in-memory database shared within the process.
+    """
+    location = str(path)
+    if location != ":memory:":
+        location = str(Path(location).expanduser().resolve())
+    key = (os.getpid(), location)
+    with _shared_lock:
+        store = _shared.get(key)
+        if store is None:
+            store = _shared[key] = SQLiteMetadataStore(key[1])
+    return store
+
+
+def close_shared_stores() -> None:
+    """Close the stores `shared_store` opened in this process."""
+    with _shared_lock:
+        for (pid, _), store in _shared.items():
+            if pid == os.getpid():
+                store.close()
+        _shared.clear()
+
+
+@contextmanager
+def open_store(location: Union[str, Path, MetadataStore, None]) -> Iterator[Optional[MetadataStore]]:
+    """
+    Accept a store instance or a SQLite database path (`None` passes through).
+    Paths resolve to the process's `shared_store`; neither is closed on exit.
+    """
+    if location is None or isinstance(location, MetadataStore):
+        yield location
+        return
+    yield shared_store(location)
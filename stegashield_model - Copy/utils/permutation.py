@@ -0,0 +1,87 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+DEFAULT_PERM_SEED = 0
+
+
+def tenant_perm_seed(tenant_key: Optional[str]) -> int:
+    """
+    Derive a stable block-permutation seed from a tenant key.
+
+    No key maps to the default seed, so untenanted embeds keep the legacy
+    layout. The result fits RandomState's 32-bit seed range.
+    """
+    if not tenant_key:
+        return DEFAULT_PERM_SEED
+    digest = hashlib.sha256(tenant_key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big")
+
+
+class BlockPermutationService:
+    """
+    Thread-safe LRU cache of block permutations keyed by (num_blocks, perm_seed).
+
+    Each permutation is produced by a private RandomState, never the global
+    NumPy RNG, so concurrent requests cannot disturb each other. The result is
+    identical to the legacy `np.random.seed(seed); np.random.shuffle(arange(n))`.
+    Cached arrays are read-only because every caller shares them.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, num_blocks: int, perm_seed: int = DEFAULT_PERM_SEED) -> np.ndarray:
+        key = (int(num_blocks), int(perm_seed))
+        with self._lock:
+            perm = self._cache.get(key)
+            if perm is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return perm
+            self.misses += 1
+
+        # Shuffle outside the lock; a concurrent miss on the same key computes an identical array
+        perm = np.arange(key[0])
+        np.random.RandomState(key[1]).shuffle(perm)
+        perm.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = perm
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return perm
+
+    def cache_info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+default_permutations = BlockPermutationService()
+
+
+def block_permutation(num_blocks: int, perm_seed: int = DEFAULT_PERM_SEED) -> np.ndarray:
+    """Read-only block permutation from the shared process-wide service."""
+    return default_permutations.get(num_blocks, perm_seed)
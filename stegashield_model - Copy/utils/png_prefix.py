@@ -0,0 +1,115 @@
+import struct
+import zlib
+from typing import Optional
+
+import numpy as np
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG colour type -> samples per pixel, for the 8-bit types we can unfilter directly
+_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+
+def _unfilter_row(filter_type: int, raw: bytes, prior: np.ndarray, bpp: int) -> np.ndarray:
+    # uint8 arithmetic wraps modulo 256, exactly like the byte-wise definitions
+    if filter_type == 0:
+        return np.frombuffer(raw, np.uint8)
+    if filter_type == 1:
+        # Each byte adds the decoded byte bpp to its left: a running sum per channel
+        return np.cumsum(np.frombuffer(raw, np.uint8).reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+    if filter_type == 2:
+        return np.frombuffer(raw, np.uint8) + prior
+
+    # Average and Paeth depend non-linearly on the byte just decoded, so they stay sequential
+    row = bytearray(raw)
+    prior = prior.tobytes()
+    n = len(row)
+    if filter_type == 3:
+        for i in range(n):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + prior[i]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for i in range(n):
+            left = row[i - bpp] if i >= bpp else 0
+            upper_left = prior[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + _paeth(left, prior[i], upper_left)) & 0xFF
+    else:
+        raise ValueError(f"Invalid PNG filter type {filter_type}")
+    return np.frombuffer(row, np.uint8)
+
+
+def decode_png_prefix(data: bytes, n_pixels: int) -> Optional[np.ndarray]:
+    """
+    Decode just enough leading rows of a PNG to cover the first `n_pixels`
+    pixels in raster order, returned as an (rows, W, 3) BGR uint8 array.
+
+    Only the IDAT bytes for those rows are inflated; the rest of the file is
+    never touched. Pixels match cv2.imdecode(..., IMREAD_COLOR) for 8-bit,
+    non-interlaced grey/grey+alpha/RGB/RGBA images. Returns None for anything
+    else (palette, 16-bit, interlaced, EXIF-oriented, not a PNG) so callers
+    can fall back to a full decode.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+
+    pos = len(PNG_SIGNATURE)
+    width = height = channels = None
+    stride = needed = 0
+    inflater = zlib.decompressobj()
+    raw = bytearray()
+
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        crc = data[pos + 8 + length:pos + 12 + length]
+        pos += 12 + length
+        if len(body) != length or len(crc) != 4:
+            return None
+        if zlib.crc32(ctype + body) != struct.unpack(">I", crc)[0]:
+            return None
+
+        if ctype == b"IHDR":
+            width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", body)
+            if depth != 8 or interlace != 0 or color_type not in _CHANNELS:
+                return None
+            channels = _CHANNELS[color_type]
+            stride = 1 + width * channels
+            rows = min(height, -(-max(n_pixels, 1) // width))
+            needed = rows * stride
+        elif ctype == b"eXIf":
+            # OpenCV applies EXIF orientation; leave that to the full decoder
+            return None
+        elif ctype == b"IDAT":
+            if channels is None:
+                return None
+            raw += inflater.decompress(body, needed - len(raw))
+            if len(raw) >= needed:
+                break
+        elif ctype == b"IEND":
+            break
+
+    if channels is None or len(raw) < needed:
+        return None
+
+    bpp = channels
+    prior = np.zeros(width * channels, dtype=np.uint8)
+    out = np.empty((needed // stride, width * channels), dtype=np.uint8)
+    for r in range(out.shape[0]):
+        line = raw[r * stride:(r + 1) * stride]
+        prior = out[r] = _unfilter_row(line[0], line[1:], prior, bpp)
+
+    pixels = out.reshape(out.shape[0], width, channels)
+    if channels in (1, 2):
+        return np.repeat(pixels[:, :, :1], 3, axis=2)
+    return np.ascontiguousarray(pixels[:, :, 2::-1])
@@ -0,0 +1,130 @@
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class StageTimer:
+    """
+    Exclusive wall time per named stage for one embed or verify call.
+
+    A stage nested inside another is only charged to the inner one, so the
+    stages add up to at most the total; the remainder is reported as `other`.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.megapixels: Optional[float] = None
+        self._nested: List[float] = []
+        self._started = time.perf_counter()
+
+    def note_shape(self, shape) -> None:
+        if self.megapixels is None:
+            self.megapixels = round(shape[0] * shape[1] / 1e6, 3)
+
+    def report(self) -> Dict[str, Any]:
+        total = time.perf_counter() - self._started
+        stages = {name: round(seconds, 6) for name, seconds in self.stages.items()}
+        stages["other"] = round(max(0.0, total - sum(self.stages.values())), 6)
+        return {"total_s": round(total, 6), "megapixels": self.megapixels, "stages": stages}
+
+
+_current: ContextVar[Optional[StageTimer]] = ContextVar("stegashield_stage_timer", default=None)
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "started")
+
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer._nested.append(0.0)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        timer = self.timer
+        nested = timer._nested.pop()
+        timer.stages[self.name] = timer.stages.get(self.name, 0.0) + elapsed - nested
+        if timer._nested:
+            timer._nested[-1] += elapsed
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """
+    `with stage("dwt"): ...` charges the block to `name` on the active timer.
+    Without one (the default) it costs a context-variable lookup and nothing else.
+    """
+    timer = _current.get()
+    return _NO_STAGE if timer is None else _Stage(timer, name)
+
+
+def note_shape(shape) -> None:
+    """Record the image size on the active timer, for size-bucketed metrics."""
+    timer = _current.get()
+    if timer is not None:
+        timer.note_shape(shape)
+
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimer]:
+    """Activate a timer for the current context; an already active one is reused."""
+    timer = _current.get()
+    if timer is not None:
+        yield timer
+        return
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def with_timings(fn: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    For functions taking a `timings: bool = False` argument and returning a dict:
+    when it is true (passed by keyword or position), the call runs under a fresh
+    timer and the dict gains a `timings` block ({total_s, megapixels, stages}).
+    """
+    params = inspect.signature(fn).parameters
+    param = params["timings"]
+    default = param.default is not inspect.Parameter.empty and param.default
+    position = None
+    if param.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD:
+        position = list(params).index("timings")
+
+    def requested(args, kwargs) -> bool:
+        if "timings" in kwargs:
+            return bool(kwargs["timings"])
+        if position is not None and len(args) > position:
+            return bool(args[position])
+        return bool(default)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not requested(args, kwargs) or _current.get() is not None:
+            return fn(*args, **kwargs)
+        with collect_timings() as timer:
+            result = fn(*args, **kwargs)
+        result["timings"] = timer.report()
+        return result
+
+    return wrapper
@@ -3,6 +3,8 @@ from PIL import Image
 import cv2
 from typing import Tuple, Dict, Any
 
+from utils.permutation import DEFAULT_PERM_SEED, block_permutation
+
 
 def _to_rgb(img: Image.Image) -> Image.Image:
     """Ensure PIL image is in RGB mode."""
@@ -109,9 +111,7 @@ def create_watermark_location_map(
     message_bits = message_len_bytes * 8
     
     # Recreate the same random permutation
-    block_indices = np.arange(num_blocks)
-    np.random.seed(params.get("perm_seed", 0))
-    np.random.shuffle(block_indices)
+    block_indices = block_permutation(num_blocks, params.get("perm_seed", DEFAULT_PERM_SEED))
     
     # Find which blocks are used
     used_blocks = set()